@@ -0,0 +1,348 @@
+"""
+Escrita de AtividadeUsuario com um único upsert.
+
+Requisito R04: Avaliações
+Requisito R08: Favoritos
+Requisito R09: Ver Mais Tarde
+Requisito RNF-01: Performance e Tempo de Resposta
+
+upsert_activities aplica as alterações de um utilizador a um ou vários
+filmes numa só instrução SQL, que também valida os filmes e, quando pedido,
+devolve os agregados de avaliações:
+
+    WITH v AS (VALUES ...),                    -- alterações pedidas por filme
+         antes AS (SELECT ... FOR UPDATE),     -- estado anterior (bloqueado)
+         escrita AS (INSERT ... SELECT v ⟕ antes [WHERE condição]
+                     ON CONFLICT (usuario_id, filme_id) DO UPDATE ...
+                         WHERE a linha está em antes
+                     RETURNING ..., xmax = 0)
+    SELECT v ⨝ filme ⟕ escrita ⟕ antes [⟕ agregados dos outros utilizadores]
+
+O DO UPDATE junta os campos enviados com a linha em conflito (e não com o
+estado lido em antes). Uma linha inserida por outra transação ainda não
+confirmada quando a instrução começou não aparece em antes: o INSERT espera
+pelo commit dessa transação e a linha fica por escrever; upsert_activities
+repete então a instrução para esses filmes, que já vê (e bloqueia) a linha,
+pelo que nenhum campo da outra escrita se perde e criado/antes refletem a
+linha realmente alterada.
+
+As datas seguem as regras de AtividadeUsuario.save() (data_visualizacao e
+data_adicao_favoritos). Como a escrita não passa pelo save() nem pelos
+sinais, os efeitos derivados (cache e perfil de gosto das recomendações,
+tendências, coocorrências, MinHash) são aplicados por
+propagate_activity_changes uma única vez por filme; write_activity e
+write_activities fazem as duas coisas na mesma transação e invalidam as
+respostas públicas em cache dos reviews alterados.
+"""
+
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import AtividadeUsuario, Filme
+from .recommender.cache import register_activity_change
+from .recommender.cowatch import update_cowatch_many
+from .recommender.minhash import update_signatures
+from .recommender.taste import apply_activity_changes
+from .recommender.trending import activity_points, record_events
+from .response_cache import invalidate_public_responses
+
+
+# Campos que podem ser alterados por upsert_activities
+CAMPOS_ESCRITA = ('rating', 'favorito', 'visto', 'ver_mais_tarde', 'review')
+
+# Tipo SQL de cada campo na lista VALUES
+_TIPOS = {
+    'rating': 'smallint',
+    'favorito': 'boolean',
+    'visto': 'boolean',
+    'ver_mais_tarde': 'boolean',
+    'review': 'text',
+}
+
+# Condições sobre a atividade existente (parâmetro exigir)
+CONDICOES = {
+    'atividade': 'a.filme_id IS NOT NULL',
+    'rating': 'a.rating IS NOT NULL',
+    'favorito': 'COALESCE(a.favorito, FALSE)',
+    'review': "COALESCE(a.review, '') <> ''",
+}
+
+ResultadoAtividade = namedtuple(
+    'ResultadoAtividade',
+    ['filme_id', 'nome', 'escrito', 'criado', 'rating', 'favorito', 'visto',
+     'ver_mais_tarde', 'review', 'data_adicao_favoritos', 'updated_at',
+     'antes', 'review_anterior', 'total_avaliacoes', 'rating_medio'],
+)
+ResultadoAtividade.__doc__ = """
+Estado de uma atividade depois do upsert.
+
+Attributes:
+    nome: Título do filme
+    escrito: False se a condição exigida não se verificou (nada foi escrito)
+    criado: True se a linha não existia antes da escrita
+    antes: Estado monitorizado anterior (rating, favorito, visto,
+        ver_mais_tarde) ou None
+    total_avaliacoes / rating_medio: Agregados do filme depois da escrita
+        (None quando não foram pedidos)
+"""
+
+
+# Tentativas de upsert_activities para filmes cuja primeira escrita
+# concorreu com outra transação
+MAX_TENTATIVAS = 3
+
+
+def _novo_valor(campo, padrao='NULL', origem='a'):
+    """Expressão SQL: valor pedido se o campo foi enviado, senão o anterior."""
+    return f"CASE WHEN v.set_{campo} THEN v.{campo} ELSE COALESCE({origem}.{campo}, {padrao}) END"
+
+
+def _valores_escrita(origem, agora):
+    """
+    Expressões SQL das colunas escritas, a partir de v e do estado anterior.
+
+    Args:
+        origem: Alias da linha anterior ("a" no INSERT, "t" no DO UPDATE)
+        agora: Expressão SQL do instante da escrita
+    """
+    favorito = _novo_valor('favorito', 'FALSE', origem)
+    visto = _novo_valor('visto', 'FALSE', origem)
+    return [
+        _novo_valor('rating', origem=origem),
+        favorito,
+        visto,
+        _novo_valor('ver_mais_tarde', 'FALSE', origem),
+        _novo_valor('review', origem=origem),
+        f"""CASE WHEN {visto} THEN COALESCE({origem}.data_visualizacao, {agora})
+                 ELSE {origem}.data_visualizacao END""",
+        f"CASE WHEN {favorito} THEN COALESCE({origem}.data_adicao_favoritos, {agora}) END",
+    ]
+
+
+def _resultado(linha, agregados):
+    filme_id, nome, escrito, inserido, sem_atividade = linha[:5]
+    anterior = linha[12:19]
+    # Quando nada foi escrito, o estado atual é o anterior
+    atual = linha[5:12] if escrito else anterior
+    rating = atual[0]
+
+    total, rating_medio = None, None
+    if agregados:
+        total = linha[19] + (rating is not None)
+        soma = (linha[20] or 0) + (rating or 0)
+        rating_medio = round(soma / total, 2) if total else None
+
+    return ResultadoAtividade(
+        filme_id, nome, escrito, escrito and inserido, *atual,
+        antes=None if sem_atividade else tuple(anterior[:4]),
+        review_anterior=anterior[4],
+        total_avaliacoes=total,
+        rating_medio=rating_medio,
+    )
+
+
+def upsert_activities(usuario_id, alteracoes, exigir=None, agregados=False, agora=None):
+    """
+    Aplica alterações a atividades de um utilizador numa só instrução.
+
+    Args:
+        usuario_id: ID do utilizador
+        alteracoes: Dict {filme_id: {campo: valor}} com campos de
+            CAMPOS_ESCRITA; os campos omitidos mantêm o valor atual (ou o
+            valor por omissão, se a atividade ainda não existe)
+        exigir: Chave de CONDICOES que a atividade existente tem de cumprir
+            para ser alterada (None cria a atividade se não existir)
+        agregados: Devolve também o número de avaliações e o rating médio
+            do filme depois da escrita
+        agora: Instante da escrita (por omissão, agora)
+
+    Returns:
+        list: ResultadoAtividade de cada filme existente (os filmes que não
+        existem não aparecem)
+    """
+    if not alteracoes:
+        return []
+
+    agora = agora or timezone.now()
+    resultados = {}
+    pendentes = alteracoes
+    for _ in range(MAX_TENTATIVAS):
+        for resultado in _upsert(usuario_id, pendentes, exigir, agregados, agora):
+            resultados[resultado.filme_id] = resultado
+        if exigir is not None:
+            break
+        # Sem condição, só não se escreve quando a linha foi inserida por
+        # outra transação depois do início da instrução
+        pendentes = {
+            filme_id: alteracoes[filme_id]
+            for filme_id, resultado in resultados.items()
+            if not resultado.escrito
+        }
+        if not pendentes:
+            break
+
+    return list(resultados.values())
+
+
+def _upsert(usuario_id, alteracoes, exigir, agregados, agora):
+    """Uma execução da instrução de upsert_activities."""
+    tabela = connection.ops.quote_name(AtividadeUsuario._meta.db_table)
+    tabela_filmes = connection.ops.quote_name(Filme._meta.db_table)
+
+    colunas = ['filme_id']
+    for campo in CAMPOS_ESCRITA:
+        colunas.extend([campo, f'set_{campo}'])
+    linha = '(%s::bigint, ' + ', '.join(
+        f'%s::{_TIPOS[campo]}, %s::boolean' for campo in CAMPOS_ESCRITA
+    ) + ')'
+
+    params = []
+    for filme_id, campos in alteracoes.items():
+        params.append(filme_id)
+        for campo in CAMPOS_ESCRITA:
+            params.extend([campos.get(campo), campo in campos])
+
+    condicao = f'WHERE {CONDICOES[exigir]}' if exigir else ''
+
+    colunas_agregados, juncao_agregados = '', ''
+    if agregados:
+        colunas_agregados = ', outros.total, outros.soma'
+        juncao_agregados = f"""
+        LEFT JOIN LATERAL (
+            SELECT COUNT(o.rating) AS total, SUM(o.rating) AS soma
+            FROM {tabela} o
+            WHERE o.filme_id = v.filme_id AND o.usuario_id <> %s
+        ) outros ON TRUE"""
+
+    sql = f"""
+        WITH v ({', '.join(colunas)}) AS (
+            VALUES {', '.join([linha] * len(alteracoes))}
+        ),
+        antes AS (
+            SELECT a.filme_id, a.rating, a.favorito, a.visto, a.ver_mais_tarde,
+                   a.review, a.data_visualizacao, a.data_adicao_favoritos, a.updated_at
+            FROM {tabela} a
+            WHERE a.usuario_id = %s AND a.filme_id IN (SELECT filme_id FROM v)
+            FOR UPDATE
+        ),
+        escrita AS (
+            INSERT INTO {tabela} AS t (
+                usuario_id, filme_id, rating, favorito, visto, ver_mais_tarde, review,
+                data_visualizacao, data_adicao_favoritos, created_at, updated_at
+            )
+            SELECT
+                %s,
+                v.filme_id,
+                {', '.join(_valores_escrita('a', '%s::timestamptz'))},
+                %s,
+                %s
+            FROM v
+            JOIN {tabela_filmes} f ON f.id = v.filme_id
+            LEFT JOIN antes a ON a.filme_id = v.filme_id
+            {condicao}
+            ON CONFLICT (usuario_id, filme_id) DO UPDATE SET
+                (rating, favorito, visto, ver_mais_tarde, review,
+                 data_visualizacao, data_adicao_favoritos, updated_at) = (
+                    SELECT {', '.join(_valores_escrita('t', 'EXCLUDED.updated_at'))},
+                           EXCLUDED.updated_at
+                    FROM v
+                    WHERE v.filme_id = EXCLUDED.filme_id
+                )
+            WHERE t.filme_id IN (SELECT filme_id FROM antes)
+            RETURNING t.filme_id, t.rating, t.favorito, t.visto, t.ver_mais_tarde, t.review,
+                      t.data_adicao_favoritos, t.updated_at, t.xmax = 0 AS inserido
+        )
+        SELECT
+            v.filme_id, f.nome, e.filme_id IS NOT NULL, COALESCE(e.inserido, FALSE),
+            a.filme_id IS NULL,
+            e.rating, e.favorito, e.visto, e.ver_mais_tarde, e.review,
+            e.data_adicao_favoritos, e.updated_at,
+            a.rating, a.favorito, a.visto, a.ver_mais_tarde, a.review,
+            a.data_adicao_favoritos, a.updated_at
+            {colunas_agregados}
+        FROM v
+        JOIN {tabela_filmes} f ON f.id = v.filme_id
+        LEFT JOIN escrita e ON e.filme_id = v.filme_id
+        LEFT JOIN antes a ON a.filme_id = v.filme_id
+        {juncao_agregados}
+    """
+    params.extend([usuario_id, usuario_id, agora, agora, agora, agora])
+    if agregados:
+        params.append(usuario_id)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        linhas = cursor.fetchall()
+
+    return [_resultado(linha, agregados) for linha in linhas]
+
+
+def write_activities(usuario_id, alteracoes, exigir=None, agregados=False):
+    """
+    Escreve as alterações (upsert_activities) e propaga-as na mesma transação.
+
+    Returns:
+        list: ResultadoAtividade de cada filme existente
+    """
+    with transaction.atomic():
+        resultados = upsert_activities(usuario_id, alteracoes, exigir=exigir, agregados=agregados)
+        propagate_activity_changes(usuario_id, [
+            (r.filme_id, r.antes, (r.rating, r.favorito, r.visto, r.ver_mais_tarde))
+            for r in resultados
+            if r.escrito
+        ])
+        invalidate_public_responses(*(
+            f'reviews:{r.filme_id}'
+            for r in resultados
+            if r.escrito and (r.review or r.review_anterior)
+        ))
+    return resultados
+
+
+def write_activity(usuario_id, filme_id, campos, exigir=None, agregados=False):
+    """
+    Escreve a atividade de um filme (ver write_activities).
+
+    Returns:
+        ResultadoAtividade, ou None se o filme não existe
+    """
+    resultados = write_activities(
+        usuario_id, {filme_id: campos}, exigir=exigir, agregados=agregados
+    )
+    return resultados[0] if resultados else None
+
+
+def propagate_activity_changes(usuario_id, mudancas):
+    """
+    Aplica alterações de atividade às recomendações e às tendências; o grafo
+    de coocorrência e a assinatura MinHash são atualizados após o commit.
+
+    Usado pelos sinais de AtividadeUsuario (uma alteração) e pelas escritas
+    em lote (uma chamada por lote, cada filme considerado uma única vez).
+
+    Args:
+        usuario_id: ID do utilizador
+        mudancas: Tuplos (filme_id, antes, depois) com os estados monitorizados
+            (rating, favorito, visto, ver_mais_tarde), None quando não existe
+    """
+    mudancas = [(f, antes, depois) for f, antes, depois in mudancas if antes != depois]
+    if not mudancas:
+        return
+
+    recomendacao = [
+        (f, antes[:3] if antes else None, depois[:3] if depois else None)
+        for f, antes, depois in mudancas
+    ]
+    recomendacao = [(f, antes, depois) for f, antes, depois in recomendacao if antes != depois]
+    if recomendacao:
+        register_activity_change(usuario_id, len(recomendacao))
+        apply_activity_changes(usuario_id, recomendacao)
+
+    record_events({f: activity_points(antes, depois) for f, antes, depois in mudancas})
+
+    # robust: um erro destes efeitos é registado e não transforma uma
+    # escrita já confirmada numa resposta de erro
+    transaction.on_commit(lambda: update_cowatch_many(usuario_id, mudancas), robust=True)
+    transaction.on_commit(lambda: update_signatures(usuario_id, mudancas), robust=True)
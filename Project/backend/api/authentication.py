@@ -1,6 +1,145 @@
+"""
+Autenticação JWT dos utilizadores da API.
+
+Requisito R01: Gestão de Utilizadores
+Requisito RNF-01: Performance e Tempo de Resposta
+
+CustomJWTAuthentication guarda a linha do utilizador na memória do
+processo (LRU com AUTH_USER_CACHE_MAX_ENTRIES entradas e TTL curto
+AUTH_USER_CACHE_TTL), com a chave <user_id>:<jti> do token, evitando a
+query ao utilizador em cada pedido. Cada pedido recebe uma instância nova
+de Usuario, pelo que as alterações de uma view não chegam à cache.
+
+Invalidação: gravar ou remover um utilizador (user_me_update,
+UpdateProfile, admin) publica "usuario:<id>" e o logout publica
+"usuario:<id>:<jti>" no barramento de invalidação (api.invalidation), que
+remove as entradas em todos os workers. Sem listener no processo, a cache
+não é usada.
+
+Modo sem estado (AUTH_STATELESS): o utilizador é construído a partir dos
+claims do token (nome, email, created_at, updated_at, acrescentados no
+login por add_user_claims), sem qualquer query; só password_hash fica
+diferido. Alterações ao perfil só aparecem nos tokens emitidos depois
+delas. Tokens sem esses claims usam o caminho normal.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from rest_framework import exceptions
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from api import invalidation
 from api.models import Usuario
-from rest_framework import exceptions
+
+
+# Campos do utilizador copiados para os tokens (modo sem estado)
+CLAIMS_UTILIZADOR = ('nome', 'email', 'created_at', 'updated_at')
+CLAIMS_DATAS = ('created_at', 'updated_at')
+
+
+class UserCache:
+    """
+    LRU por processo das linhas de utilizador ({chave: (expira, db, valores)}).
+
+    Attributes:
+        max_entries: Número máximo de entradas
+        ttl: TTL das entradas (segundos)
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entradas = OrderedDict()
+        self._epoca = 0
+        self._lock = threading.Lock()
+
+    def epoch(self):
+        """Época atual (muda a cada invalidação)."""
+        return self._epoca
+
+    def get(self, chave):
+        """Nova instância de Usuario da entrada, ou None."""
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+            expira, db, valores = entrada
+            if expira < time.monotonic():
+                del self._entradas[chave]
+                return None
+            self._entradas.move_to_end(chave)
+        campos = [campo.attname for campo in Usuario._meta.concrete_fields]
+        return Usuario.from_db(db, campos, valores)
+
+    def set(self, chave, usuario, epoca):
+        """Guarda o utilizador, exceto se houve uma invalidação desde epoca."""
+        valores = tuple(getattr(usuario, campo.attname) for campo in Usuario._meta.concrete_fields)
+        with self._lock:
+            if epoca != self._epoca:
+                return
+            self._entradas[chave] = (time.monotonic() + self.ttl, usuario._state.db, valores)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entries:
+                self._entradas.popitem(last=False)
+
+    def evict(self, idents=None):
+        """
+        Remove entradas.
+
+        Args:
+            idents: IDs de utilizador ("12", todos os tokens) ou chaves
+                "12:<jti>" (um token); None esvazia a cache
+        """
+        with self._lock:
+            self._epoca += 1
+            if idents is None:
+                self._entradas.clear()
+                return
+            for chave in [
+                chave for chave in self._entradas
+                if chave in idents or chave.partition(':')[0] in idents
+            ]:
+                del self._entradas[chave]
+
+
+user_cache = UserCache(settings.AUTH_USER_CACHE_MAX_ENTRIES, settings.AUTH_USER_CACHE_TTL)
+
+invalidation.subscribe('usuario', user_cache.evict)
+
+
+def invalidate_cached_user(user_id, jti=None):
+    """Remove o utilizador (ou apenas um token) da cache de todos os workers."""
+    invalidation.publish(f'usuario:{user_id}' if jti is None else f'usuario:{user_id}:{jti}')
+
+
+def add_user_claims(token, usuario):
+    """Acrescenta ao token os claims do modo sem estado."""
+    for campo in CLAIMS_UTILIZADOR:
+        valor = getattr(usuario, campo)
+        token[campo] = valor.isoformat() if campo in CLAIMS_DATAS and valor else valor
+    return token
+
+
+def user_from_claims(validated_token):
+    """
+    Usuario construído a partir dos claims do token, sem queries.
+
+    Returns:
+        Usuario, ou None se o token não tem os claims do modo sem estado
+    """
+    if any(campo not in validated_token for campo in CLAIMS_UTILIZADOR):
+        return None
+    valores = {'id': validated_token['user_id']}
+    for campo in CLAIMS_UTILIZADOR:
+        valor = validated_token[campo]
+        valores[campo] = parse_datetime(valor) if campo in CLAIMS_DATAS and valor else valor
+    return Usuario.from_db('default', list(valores), list(valores.values()))
+
 
 class CustomJWTAuthentication(JWTAuthentication):
     def get_user(self, validated_token):
@@ -8,9 +147,26 @@ class CustomJWTAuthentication(JWTAuthentication):
             user_id = validated_token["user_id"]
         except KeyError:
             raise exceptions.AuthenticationFailed("Token inválido")
+
+        if settings.AUTH_STATELESS:
+            user = user_from_claims(validated_token)
+            if user is not None:
+                return user
+
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        chave = f'{user_id}:{jti}'
+        usar_cache = settings.AUTH_USER_CACHE_TTL > 0 and jti is not None and invalidation.sync()
+        if usar_cache:
+            user = user_cache.get(chave)
+            if user is not None:
+                return user
+            epoca = user_cache.epoch()
+
         try:
             user = Usuario.objects.get(id=user_id)
         except Usuario.DoesNotExist:
             raise exceptions.AuthenticationFailed("Usuário não registado")
 
+        if usar_cache:
+            user_cache.set(chave, user, epoca)
         return user
@@ -0,0 +1,329 @@
+"""
+Cartões de filme das listas (favoritos, avaliados, ver mais tarde, recomendações).
+
+Requisito RNF-01: Performance e Tempo de Resposta
+
+movie_cards lê apenas as colunas usadas nos cartões (nunca a capa binária),
+os géneros de todos os filmes numa única query à tabela de associação e,
+quando pedido, a média das avaliações numa única query agregada. Os
+cartões são dicts construídos a partir de .values(), sem instanciar
+modelos, pelo que o número de queries não depende do número de filmes.
+
+Os parâmetros ?fields= (sparse fieldsets) e ?overview_chars= reduzem o
+payload: a projeção na base de dados segue os campos pedidos (as queries
+de géneros e de médias só correm quando esses campos são pedidos) e a
+sinopse é truncada pela própria base de dados.
+
+Cache de fragmentos: o cartão completo de cada filme (sem campos do
+utilizador) fica na cache de dois níveis card_cache (LRU do processo e
+tabela partilhada pelos workers) com a chave cartao:<id>:<updated_at>,
+pelo que qualquer alteração ao filme muda a chave. As listas já leem o
+updated_at dos filmes na mesma query das atividades e obtêm todos os
+cartões com um único get_many; só os filmes em falta são lidos da base de
+dados. Os sinais de Filme apagam o fragmento ao gravar ou remover e as
+alterações aos géneros atualizam o updated_at do filme; em ambos os casos
+os outros workers removem as versões antigas do seu L1 (barramento de
+invalidação, mensagem "filme:<id>"). Os campos pedidos
+e a truncagem são aplicados ao cartão em cache; com MOVIE_CARD_CACHE_TTL=0
+a cache é desativada e a projeção volta a seguir os campos pedidos.
+"""
+
+from django.conf import settings
+from django.db.models import Avg
+from django.db.models.functions import Left
+from django.utils import timezone
+
+from .invalidation import publish, subscribe
+from .models import AtividadeUsuario, Filme
+from .tiered_cache import TwoTierCache
+
+
+# Colunas de Filme lidas para cada campo do cartão (id é sempre lido)
+CAMPOS_CARTAO = {
+    'id': (),
+    'title': ('nome',),
+    'overview': ('descricao',),
+    'genres': (),
+    'poster_path': ('poster_path',),
+    'poster_url': ('poster_path',),
+    'tmdb_rating': ('rating_tmdb',),
+    'release_date': ('ano_lancamento',),
+}
+
+# Limite de ?overview_chars=
+MAX_OVERVIEW_CHARS = 1000
+
+POSTER_BASE_URL = "https://image.tmdb.org/t/p/w500"
+
+CARD_CACHE_KEY = 'cartao:{id}:{versao}'
+
+card_cache = TwoTierCache(
+    'cartoes',
+    l1_max_entries=settings.TIERED_CACHE_L1_MAX_ENTRIES,
+    l1_ttl=settings.TIERED_CACHE_L1_TTL,
+    ttl=settings.MOVIE_CARD_CACHE_TTL,
+)
+
+
+def poster_url(poster_path):
+    """URL completo do poster TMDB (None se o filme não tem poster)."""
+    return f"{POSTER_BASE_URL}{poster_path}" if poster_path else None
+
+
+def sparse_params(request, campos_validos):
+    """
+    Lê os parâmetros ?fields= e ?overview_chars= de um pedido de lista.
+
+    Args:
+        request: Pedido DRF
+        campos_validos: Campos que o endpoint devolve
+
+    Returns:
+        tuple: (conjunto de campos pedidos ou None para todos,
+        número máximo de caracteres da sinopse ou None)
+
+    Raises:
+        ValueError: Campo desconhecido ou overview_chars inválido
+    """
+    campos = None
+    fields = request.query_params.get('fields')
+    if fields is not None:
+        campos = {c.strip() for c in fields.split(',') if c.strip()}
+        desconhecidos = sorted(campos - set(campos_validos))
+        if not campos or desconhecidos:
+            raise ValueError(
+                "Parâmetro 'fields' inválido"
+                + (f": campos desconhecidos {', '.join(desconhecidos)}" if desconhecidos else "")
+            )
+
+    overview_chars = request.query_params.get('overview_chars')
+    if overview_chars is not None:
+        try:
+            overview_chars = int(overview_chars)
+        except ValueError:
+            overview_chars = -1
+        if not 0 <= overview_chars <= MAX_OVERVIEW_CHARS:
+            raise ValueError(
+                f"Parâmetro 'overview_chars' deve ser um inteiro entre 0 e {MAX_OVERVIEW_CHARS}"
+            )
+
+    return campos, overview_chars
+
+
+def truncate_overview(texto, overview_chars):
+    """Trunca a sinopse a overview_chars caracteres (com reticências)."""
+    if texto is None or overview_chars is None or len(texto) <= overview_chars:
+        return texto
+    return texto[:overview_chars].rstrip() + "…"
+
+
+def select_fields(item, campos):
+    """Mantém apenas os campos pedidos de um item (None mantém todos)."""
+    if campos is None:
+        return item
+    return {chave: valor for chave, valor in item.items() if chave in campos}
+
+
+def card_fields(campos, aliases=None):
+    """
+    Campos do cartão necessários para os campos pedidos de uma lista.
+
+    Args:
+        campos: Campos pedidos (None para todos)
+        aliases: Dict {campo da lista: campo do cartão} dos campos que
+            repetem um campo do cartão
+
+    Returns:
+        set ou None: Campos a passar a movie_cards
+    """
+    if campos is None:
+        return None
+    aliases = aliases or {}
+    return {aliases.get(campo, campo) for campo in campos} & set(CAMPOS_CARTAO)
+
+
+def card_cache_key(filme_id, updated_at):
+    """Chave do fragmento de um filme na versão dada (updated_at)."""
+    versao = int(updated_at.timestamp() * 1_000_000) if updated_at else 0
+    return CARD_CACHE_KEY.format(id=filme_id, versao=versao)
+
+
+def invalidate_movie_card(filme):
+    """
+    Apaga o fragmento da versão atual de um filme e avisa os outros workers
+    (mensagem "filme:<id>"), que removem do L1 todas as versões do filme.
+    """
+    card_cache.delete(card_cache_key(filme.id, filme.updated_at))
+    publish(f'filme:{filme.id}')
+
+
+def _evict_cards(filme_ids):
+    """Subscritor de "filme": remove do L1 os fragmentos dos filmes."""
+    card_cache.evict_local(
+        None if filme_ids is None
+        else [CARD_CACHE_KEY.format(id=filme_id, versao='') for filme_id in filme_ids]
+    )
+
+
+subscribe('filme', _evict_cards)
+
+
+def touch_movies(filme_ids):
+    """
+    Atualiza o updated_at dos filmes (nova versão dos fragmentos).
+
+    Usado quando muda algo do cartão que não passa por Filme.save(), como
+    os géneros.
+    """
+    filme_ids = list(filme_ids)
+    Filme.objects.filter(id__in=filme_ids).update(updated_at=timezone.now())
+    publish(*(f'filme:{filme_id}' for filme_id in filme_ids))
+
+
+def _build_cards(ids, campos=None, overview_chars=None):
+    """
+    Lê os cartões da base de dados (sem user_rating_average).
+
+    Args:
+        ids: IDs dos filmes
+        campos: Campos do cartão a construir (None constrói todos)
+        overview_chars: Trunca a sinopse na própria query
+
+    Returns:
+        dict: {filme_id: cartão}
+    """
+    campos = set(CAMPOS_CARTAO) if campos is None else campos
+
+    colunas = ['id']
+    for campo in CAMPOS_CARTAO:
+        if campo in campos:
+            colunas.extend(c for c in CAMPOS_CARTAO[campo] if c not in colunas)
+
+    filmes = Filme.objects.filter(id__in=ids).order_by()
+    if 'descricao' in colunas and overview_chars is not None:
+        # A base de dados devolve apenas o início da sinopse (+1 carácter
+        # para saber se foi truncada)
+        colunas.remove('descricao')
+        filmes = filmes.annotate(descricao_curta=Left('descricao', overview_chars + 1))
+        colunas.append('descricao_curta')
+
+    generos = {}
+    if 'genres' in campos:
+        for filme_id, genero in (
+            Filme.generos.through.objects
+            .filter(filme_id__in=ids)
+            .order_by('genero_id')
+            .values_list('filme_id', 'genero_id')
+        ):
+            generos.setdefault(filme_id, []).append(genero)
+
+    cartoes = {}
+    for filme in filmes.values(*colunas):
+        descricao = filme.get('descricao')
+        if 'descricao_curta' in filme:
+            descricao = truncate_overview(filme['descricao_curta'], overview_chars)
+        cartao = {
+            "id": filme['id'],
+            "title": filme.get('nome'),
+            "overview": descricao,
+            "genres": generos.get(filme['id'], []),
+            "poster_path": filme.get('poster_path'),
+            "poster_url": poster_url(filme.get('poster_path')),
+            "tmdb_rating": filme.get('rating_tmdb'),
+            "release_date": filme.get('ano_lancamento'),
+        }
+        cartoes[filme['id']] = select_fields(cartao, campos)
+
+    return cartoes
+
+
+def _cached_cards(ids, versoes):
+    """
+    Cartões completos a partir da cache de fragmentos (L1 e um get_many ao
+    L2); os filmes em falta são lidos da base de dados e guardados (um
+    set_many).
+
+    Args:
+        ids: IDs dos filmes
+        versoes: Dict {filme_id: updated_at}; filmes sem versão não existem
+    """
+    chaves = {
+        filme_id: card_cache_key(filme_id, versoes[filme_id])
+        for filme_id in ids
+        if filme_id in versoes
+    }
+    if not chaves:
+        return {}
+
+    em_cache = card_cache.get_many(chaves.values())
+    cartoes = {filme_id: em_cache[chave] for filme_id, chave in chaves.items() if chave in em_cache}
+
+    em_falta = [filme_id for filme_id in chaves if filme_id not in cartoes]
+    if em_falta:
+        novos = _build_cards(em_falta)
+        card_cache.set_many({chaves[filme_id]: cartao for filme_id, cartao in novos.items()})
+        cartoes.update(novos)
+
+    return cartoes
+
+
+def movie_cards(filme_ids, rating_medio=False, campos=None, overview_chars=None, versoes=None):
+    """
+    Cartões de vários filmes.
+
+    Args:
+        filme_ids: IDs dos filmes (os inexistentes são ignorados)
+        rating_medio: Inclui "user_rating_average" (média das avaliações
+            dos utilizadores, uma query agregada para todos os filmes)
+        campos: Campos do cartão a devolver (None devolve todos)
+        overview_chars: Trunca a sinopse a este número de caracteres
+        versoes: Dict {filme_id: updated_at} já lido (por exemplo, na query
+            das atividades); lido numa query quando omitido
+
+    Returns:
+        dict: {filme_id: cartão} com id, title, overview, genres,
+        poster_path, poster_url, tmdb_rating e release_date
+    """
+    ids = list(dict.fromkeys(filme_ids))
+    if not ids:
+        return {}
+
+    if campos is None:
+        campos = set(CAMPOS_CARTAO) | ({'user_rating_average'} if rating_medio else set())
+    else:
+        campos = set(campos)
+        rating_medio = rating_medio and 'user_rating_average' in campos
+
+    if settings.MOVIE_CARD_CACHE_TTL > 0:
+        if versoes is None:
+            versoes = dict(Filme.objects.filter(id__in=ids).order_by().values_list('id', 'updated_at'))
+        base = _cached_cards(ids, versoes)
+        if overview_chars is not None:
+            base = {
+                filme_id: {**cartao, "overview": truncate_overview(cartao["overview"], overview_chars)}
+                for filme_id, cartao in base.items()
+            }
+    else:
+        base = _build_cards(ids, campos, overview_chars)
+
+    medias = {}
+    if rating_medio:
+        medias = {
+            filme_id: round(media, 2)
+            for filme_id, media in (
+                AtividadeUsuario.objects
+                .filter(filme_id__in=ids, rating__isnull=False)
+                .order_by()
+                .values('filme_id')
+                .annotate(media=Avg('rating'))
+                .values_list('filme_id', 'media')
+            )
+        }
+
+    cartoes = {}
+    for filme_id, cartao in base.items():
+        if rating_medio:
+            cartao = {**cartao, "user_rating_average": medias.get(filme_id)}
+        cartoes[filme_id] = select_fields(cartao, campos)
+
+    return cartoes
@@ -0,0 +1,80 @@
+"""
+Pedidos condicionais (ETag / Last-Modified).
+
+Requisito RNF-01: Performance e Tempo de Resposta
+
+Os endpoints de leitura calculam os validadores a partir das colunas
+updated_at (no máximo uma query barata) antes de construir a resposta.
+Quando o cliente envia If-None-Match / If-Modified-Since e nada mudou,
+respondem 304 Not Modified sem ler nem serializar o corpo.
+
+As respostas levam Cache-Control: no-cache, para que o browser guarde o
+corpo e revalide sempre; as que dependem do utilizador autenticado são
+private, levam Vary: Authorization e o ETag inclui o ID do utilizador.
+"""
+
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def _timestamp(valor):
+    """Segundos inteiros (Last-Modified) de um datetime, ou None."""
+    return int(valor.timestamp()) if valor else None
+
+
+def make_etag(*partes):
+    """
+    ETag a partir das partes que determinam o corpo da resposta.
+
+    Os datetimes entram com precisão de microssegundos.
+    """
+    texto = '|'.join(
+        str(int(p.timestamp() * 1_000_000)) if hasattr(p, 'timestamp') else str(p)
+        for p in partes
+    )
+    return hashlib.md5(texto.encode()).hexdigest()
+
+
+def set_validators(response, etag=None, last_modified=None, por_utilizador=False):
+    """
+    Acrescenta ETag, Last-Modified, Cache-Control e Vary a uma resposta.
+
+    Args:
+        response: Resposta (200 ou 304)
+        etag: Valor de make_etag (sem aspas)
+        last_modified: datetime da última alteração
+        por_utilizador: A resposta depende do utilizador autenticado
+    """
+    if etag is not None:
+        response.headers['ETag'] = quote_etag(etag)
+    if last_modified is not None:
+        response.headers['Last-Modified'] = http_date(_timestamp(last_modified))
+    if por_utilizador:
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Authorization'])
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+def not_modified(request, etag=None, last_modified=None, por_utilizador=False):
+    """
+    Resposta 304 (ou 412) se os validadores do pedido coincidem.
+
+    Args:
+        request: Pedido DRF (ou HttpRequest)
+        etag / last_modified / por_utilizador: Ver set_validators
+
+    Returns:
+        HttpResponse 304/412, ou None se a resposta tem de ser construída
+    """
+    resposta = get_conditional_response(
+        request,
+        etag=quote_etag(etag) if etag is not None else None,
+        last_modified=_timestamp(last_modified),
+    )
+    if resposta is None:
+        return None
+    return set_validators(resposta, etag, last_modified, por_utilizador)
@@ -0,0 +1,236 @@
+"""
+Barramento de invalidação entre workers (Postgres LISTEN/NOTIFY).
+
+Requisito RNF-01: Performance e Tempo de Resposta
+
+Os dados guardados na memória de um processo (L1 dos cartões, contadores
+de geração das respostas públicas) ficam desatualizados quando outro
+worker grava uma alteração. publish() envia, após o commit, mensagens
+compactas "<tipo>:<id>" (por exemplo "filme:12" ou "geracao:reviews:12")
+num único NOTIFY por chamada; cada worker corre um thread listener
+(start_listener, chamado em config/wsgi.py e config/asgi.py) que junta
+as mensagens recebidas durante INVALIDATION_BATCH_WINDOW, elimina as
+repetidas e entrega cada tipo às funções registadas com subscribe().
+
+Contador de geração: cada publicação incrementa a sequência
+invalidacao_geracao (migração 0016). Enquanto o listener está desligado
+(a religar-se com espera exponencial), sync() compara a sequência com o
+último valor visto e, se mudou, esvazia todo o estado local; ao religar,
+o listener esvazia-o também, porque pode ter perdido mensagens.
+
+Processos sem listener (comandos de gestão, testes) não recebem as
+mensagens dos outros: sync() devolve False e o estado em memória que
+dependa delas não deve ser usado.
+"""
+
+import logging
+import os
+import select
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+
+
+logger = logging.getLogger('api.cache')
+
+CANAL = 'api_invalidacao'
+SEQUENCIA = 'invalidacao_geracao'
+
+# Mensagem que invalida todo o estado local
+TUDO = '*'
+SEPARADOR = '\n'
+
+# Tamanho máximo de cada NOTIFY (o Postgres aceita até 8000 bytes)
+MAX_PAYLOAD_BYTES = 7900
+
+# Estados do listener
+PARADO = 'parado'
+ESCUTA = 'escuta'
+DESLIGADO = 'desligado'
+
+_subscritores = {}
+_estado = {'modo': PARADO, 'pid': None, 'geracao': None}
+_lock = threading.RLock()
+
+
+def subscribe(tipo, funcao):
+    """
+    Regista uma função para as mensagens de um tipo.
+
+    Args:
+        tipo: Prefixo das mensagens (por exemplo "filme" para "filme:12")
+        funcao: Chamada com o conjunto de IDs do lote, ou com None quando
+            todo o estado local tem de ser esvaziado
+    """
+    _subscritores.setdefault(tipo, []).append(funcao)
+
+
+def dispatch(chaves):
+    """Aplica um lote de mensagens ao estado local deste processo."""
+    por_tipo = {}
+    for chave in chaves:
+        if chave == TUDO:
+            _clear_all()
+            return
+        tipo, _, ident = chave.partition(':')
+        por_tipo.setdefault(tipo, set()).add(ident)
+
+    for tipo, ids in por_tipo.items():
+        for funcao in _subscritores.get(tipo, ()):
+            funcao(ids)
+
+
+def _clear_all():
+    for funcoes in _subscritores.values():
+        for funcao in funcoes:
+            funcao(None)
+
+
+def _payloads(chaves):
+    """Divide as mensagens em payloads de NOTIFY dentro do limite."""
+    lote, tamanho = [], 0
+    for chave in chaves:
+        bytes_chave = len(chave.encode()) + 1
+        if lote and tamanho + bytes_chave > MAX_PAYLOAD_BYTES:
+            yield SEPARADOR.join(lote)
+            lote, tamanho = [], 0
+        lote.append(chave)
+        tamanho += bytes_chave
+    if lote:
+        yield SEPARADOR.join(lote)
+
+
+def _send(chaves):
+    dispatch(chaves)
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        for payload in _payloads(chaves):
+            cursor.execute(
+                "SELECT nextval(%s), pg_notify(%s, %s)", [SEQUENCIA, CANAL, payload]
+            )
+
+
+def publish(*chaves):
+    """
+    Publica mensagens de invalidação após o commit da transação atual.
+
+    O processo atual aplica-as de imediato; os restantes workers recebem-nas
+    pelo listener. Mais de INVALIDATION_MAX_KEYS chaves são substituídas
+    pela mensagem "invalida tudo".
+    """
+    chaves = list(dict.fromkeys(chaves))
+    if not chaves:
+        return
+    if len(chaves) > settings.INVALIDATION_MAX_KEYS:
+        chaves = [TUDO]
+    transaction.on_commit(lambda: _send(chaves))
+
+
+def _current_generation():
+    # is_called distingue o valor inicial do primeiro nextval()
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT last_value, is_called FROM {SEQUENCIA}")
+        return cursor.fetchone()
+
+
+def sync():
+    """
+    Garante que o estado local reflete as invalidações publicadas.
+
+    Com o listener ligado não faz queries. Com o listener desligado, lê o
+    contador de geração (uma query) e esvazia o estado local se mudou.
+
+    Returns:
+        bool: True se o estado em memória dependente do barramento pode ser
+        usado; False se este processo não tem listener
+    """
+    if _estado['pid'] is not None and _estado['pid'] != os.getpid():
+        # Processo criado por fork depois de iniciar o listener
+        start_listener()
+    if _estado['modo'] == ESCUTA:
+        return True
+    if _estado['modo'] == PARADO:
+        return False
+
+    geracao = _current_generation()
+    with _lock:
+        if geracao != _estado['geracao']:
+            _clear_all()
+            _estado['geracao'] = geracao
+    return True
+
+
+def start_listener():
+    """Inicia o thread listener deste processo (uma vez por processo)."""
+    if not settings.INVALIDATION_LISTENER or connection.vendor != 'postgresql':
+        return
+    with _lock:
+        if _estado['pid'] == os.getpid():
+            return
+        _estado.update(pid=os.getpid(), modo=DESLIGADO, geracao=None)
+    threading.Thread(target=_listen, name='invalidation-listener', daemon=True).start()
+
+
+def _listen():
+    pid = os.getpid()
+    espera = 1
+    while _estado['pid'] == pid:
+        conexao = None
+        try:
+            ligacao = connections['default']
+            conexao = ligacao.get_new_connection(ligacao.get_connection_params())
+            conexao.autocommit = True
+            with conexao.cursor() as cursor:
+                cursor.execute(f"LISTEN {CANAL}")
+            with _lock:
+                # As mensagens publicadas enquanto estava desligado perderam-se
+                _clear_all()
+                _estado['modo'] = ESCUTA
+            espera = 1
+            _receive(conexao)
+        except Exception:
+            logger.warning(
+                "Listener de invalidação desligado; a usar o contador de geração",
+                exc_info=True,
+            )
+        finally:
+            with _lock:
+                _estado.update(modo=DESLIGADO, geracao=None)
+            if conexao is not None:
+                try:
+                    conexao.close()
+                except Exception:
+                    pass
+        time.sleep(espera)
+        espera = min(espera * 2, settings.INVALIDATION_RECONNECT_MAX_DELAY)
+
+
+def _receive(conexao):
+    """Recebe os NOTIFY e entrega-os em lotes sem mensagens repetidas."""
+    while True:
+        if select.select([conexao], [], [], settings.INVALIDATION_HEALTHCHECK_INTERVAL)[0]:
+            conexao.poll()
+        else:
+            # Deteta ligações perdidas sem tráfego
+            with conexao.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        if not conexao.notifies:
+            continue
+
+        # Junta as mensagens que chegam durante a janela num único lote
+        fim = time.monotonic() + settings.INVALIDATION_BATCH_WINDOW
+        while (resto := fim - time.monotonic()) > 0:
+            if select.select([conexao], [], [], resto)[0]:
+                conexao.poll()
+
+        chaves = set()
+        for notificacao in conexao.notifies:
+            chaves.update(notificacao.payload.split(SEPARADOR))
+        conexao.notifies.clear()
+        try:
+            dispatch(chaves)
+        except Exception:
+            logger.exception("Erro ao aplicar %d mensagens de invalidação", len(chaves))
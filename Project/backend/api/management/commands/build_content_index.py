@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.recommender.content import artifact_path, update_content_index
+
+
+class Command(BaseCommand):
+    help = "Atualiza o índice de conteúdo (TF-IDF) usado em /api/movies/<id>/similar/."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Reconstrói o índice de raiz em vez de acrescentar apenas os filmes novos",
+        )
+        parser.add_argument(
+            "--k",
+            type=int,
+            default=settings.RECOMMENDER_CONTENT_NEIGHBOURS,
+            help="Número de vizinhos guardados por filme (apenas com --full)",
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+
+        self.stdout.write("➡ A atualizar índice de conteúdo...")
+        index, adicionados = update_content_index(full=options["full"], k=options["k"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{adicionados} filmes indexados ({index.film_ids.size} no total) em "
+                f"{artifact_path()} ({time.perf_counter() - inicio:.1f}s)."
+            )
+        )
@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.recommender.cowatch import rebuild_cowatch
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói o grafo de coocorrência de filmes (\"também gostaram de\", RF-10). "
+        "Só é necessário na carga inicial: os eventos atualizam-no incrementalmente."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-fan-out",
+            type=int,
+            default=settings.COWATCH_MAX_FAN_OUT,
+            help="Número máximo de filmes positivos (mais recentes) por utilizador",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=settings.COWATCH_TOP_N,
+            help="Número de filmes guardados no top de cada filme",
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+
+        self.stdout.write("➡ A calcular coocorrências...")
+        num_pares, num_filmes = rebuild_cowatch(
+            max_fan_out=options["max_fan_out"],
+            top_n=options["top"],
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{num_pares} pares e {num_filmes} tops guardados "
+                f"({time.perf_counter() - inicio:.1f}s)."
+            )
+        )
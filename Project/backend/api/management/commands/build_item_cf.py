@@ -0,0 +1,52 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.recommender.interactions import build_interaction_matrix
+from api.recommender.item_cf import ItemNeighbours, artifact_path
+
+
+class Command(BaseCommand):
+    help = "Calcula offline os vizinhos item-item (cosseno) usados nas recomendações (RF-10)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--k",
+            type=int,
+            default=settings.RECOMMENDER_ITEM_CF_NEIGHBOURS,
+            help="Número de vizinhos guardados por filme",
+        )
+        parser.add_argument(
+            "--block-size",
+            type=int,
+            default=1024,
+            help="Número de filmes processados por bloco",
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+
+        self.stdout.write("➡ A construir matriz utilizador × filme...")
+        interactions = build_interaction_matrix()
+        n_users, n_items = interactions.shape
+        self.stdout.write(
+            f"   {n_users} utilizadores, {n_items} filmes, {interactions.matrix.nnz} interações"
+        )
+
+        self.stdout.write(f"➡ A calcular os {options['k']} vizinhos de cada filme...")
+        modelo = ItemNeighbours.build(
+            interactions,
+            k=options["k"],
+            block_size=options["block_size"],
+        )
+
+        settings.RECOMMENDER_ARTIFACTS_DIR.mkdir(parents=True, exist_ok=True)
+        path = artifact_path()
+        modelo.save(path)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Vizinhos guardados em {path} ({time.perf_counter() - inicio:.1f}s)."
+            )
+        )
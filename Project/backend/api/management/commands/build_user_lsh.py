@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.recommender.minhash import rebuild_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula as assinaturas MinHash e os buckets LSH de todos os utilizadores (RF-10). "
+        "Só é necessário na carga inicial ou ao mudar MINHASH_PERMUTACOES/MINHASH_BANDAS."
+    )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+
+        self.stdout.write("➡ A calcular assinaturas MinHash...")
+        num_usuarios = rebuild_index()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{num_usuarios} utilizadores indexados ({time.perf_counter() - inicio:.1f}s)."
+            )
+        )
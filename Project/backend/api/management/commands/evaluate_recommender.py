@@ -0,0 +1,56 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.recommender.evaluation import VARIANTES, run_evaluation
+
+
+class Command(BaseCommand):
+    help = (
+        "Avalia offline as variantes do motor de recomendações (RF-10) numa divisão "
+        "temporal (precision/recall/NDCG@K, cobertura, latência, queries por chamada) "
+        "e escreve um relatório JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", choices=["db", "synthetic"], default="db",
+                            help="AtividadeUsuario da BD ou conjunto sintético")
+        parser.add_argument("--k", type=int, default=10, help="Tamanho das listas avaliadas")
+        parser.add_argument("--test-fraction", type=float, default=0.2,
+                            help="Fração mais recente das interações usada como teste")
+        parser.add_argument("--synthetic-users", type=int, default=500)
+        parser.add_argument("--synthetic-interactions", type=int, default=30,
+                            help="Interações por utilizador sintético")
+        parser.add_argument("--max-users", type=int, default=None,
+                            help="Limita o número de utilizadores avaliados")
+        parser.add_argument("--live-users", type=int, default=0,
+                            help="Mede também o caminho real para N utilizadores (só --source db)")
+        parser.add_argument("--variants", default=",".join(VARIANTES),
+                            help="Variantes a avaliar, separadas por vírgulas")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", default=None,
+                            help="Ficheiro JSON de saída (por omissão, stdout)")
+
+    def handle(self, *args, **options):
+        try:
+            relatorio = run_evaluation(
+                source=options["source"],
+                k=options["k"],
+                test_fraction=options["test_fraction"],
+                synthetic_users=options["synthetic_users"],
+                synthetic_interactions=options["synthetic_interactions"],
+                max_users=options["max_users"],
+                live_users=options["live_users"],
+                variants=[v.strip() for v in options["variants"].split(",") if v.strip()],
+                seed=options["seed"],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        texto = json.dumps(relatorio, indent=2, sort_keys=True)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(texto + "\n")
+            self.stderr.write(self.style.SUCCESS(f"Relatório escrito em {options['output']}."))
+        else:
+            self.stdout.write(texto)
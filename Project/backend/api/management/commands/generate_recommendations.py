@@ -0,0 +1,169 @@
+import json
+import multiprocessing
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from api.models import AtividadeUsuario, RecomendacaoUsuario
+from api.recommender.batch import generate_for_users, warm_up
+
+
+def _init_worker():
+    """Inicialização de cada worker (necessária quando não há fork)."""
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+def _process_chunk(args):
+    usuario_ids, limit = args
+    return generate_for_users(usuario_ids, limit=limit)
+
+
+class Command(BaseCommand):
+    help = (
+        "Pré-calcula as recomendações (RF-10) de todos os utilizadores ativos "
+        "num pool de processos, com progresso e retoma."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Número de processos (1 = sem pool)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=200,
+            help="Utilizadores por bloco (uma leitura e uma escrita por bloco)",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=20,
+            help="Número de filmes recomendados por utilizador",
+        )
+        parser.add_argument(
+            "--active-days",
+            type=int,
+            default=30,
+            help="Só utilizadores com atividade nos últimos N dias (0 = todos com atividade)",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Retoma a última execução interrompida (salta os utilizadores já processados)",
+        )
+        parser.add_argument(
+            "--state-file",
+            default=str(settings.RECOMMENDER_ARTIFACTS_DIR / "generate_recommendations.json"),
+            help="Ficheiro com o estado da execução (para --resume)",
+        )
+
+    def _read_state(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_state(self, path, state):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, path)
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        state_file = options["state_file"]
+
+        state = self._read_state(state_file) if options["resume"] else None
+        if state is None:
+            state = {"started_at": timezone.now().isoformat()}
+            self._write_state(state_file, state)
+        else:
+            self.stdout.write(f"➡ A retomar a execução iniciada em {state['started_at']}")
+        started_at = parse_datetime(state["started_at"])
+
+        # ====================================================================
+        # Utilizadores a processar
+        # ====================================================================
+
+        atividade = AtividadeUsuario.objects.all()
+        if options["active_days"] > 0:
+            atividade = atividade.filter(
+                updated_at__gte=timezone.now() - timedelta(days=options["active_days"])
+            )
+        usuarios = set(atividade.order_by().values_list("usuario_id", flat=True).distinct())
+
+        # Retoma: saltar quem já foi gravado depois do início da execução
+        usuarios -= set(
+            RecomendacaoUsuario.objects
+            .filter(calculado_em__gte=started_at)
+            .values_list("usuario_id", flat=True)
+        )
+        usuarios = sorted(usuarios)
+
+        tamanho = options["chunk_size"]
+        blocos = [
+            (usuarios[i:i + tamanho], options["limit"])
+            for i in range(0, len(usuarios), tamanho)
+        ]
+        self.stdout.write(f"➡ {len(usuarios)} utilizadores em {len(blocos)} blocos")
+
+        # ====================================================================
+        # Geração
+        # ====================================================================
+
+        self.stdout.write("➡ A carregar catálogo e modelos...")
+        warm_up()
+
+        processados = 0
+        inicio_geracao = time.perf_counter()
+
+        def progresso(n):
+            nonlocal processados
+            processados += n
+            decorrido = time.perf_counter() - inicio_geracao
+            self.stdout.write(
+                f"   {processados}/{len(usuarios)} utilizadores "
+                f"({processados / decorrido if decorrido else 0:.1f} utilizadores/s)"
+            )
+
+        workers = max(1, options["workers"])
+        if workers == 1 or len(blocos) <= 1:
+            for bloco in blocos:
+                progresso(_process_chunk(bloco))
+        else:
+            # Os workers herdam catálogo e modelos por fork; as ligações à BD
+            # não podem ser partilhadas, pelo que são fechadas antes.
+            connections.close_all()
+            metodos = multiprocessing.get_all_start_methods()
+            contexto = multiprocessing.get_context("fork" if "fork" in metodos else None)
+            with contexto.Pool(workers, initializer=_init_worker) as pool:
+                for n in pool.imap_unordered(_process_chunk, blocos):
+                    progresso(n)
+
+        try:
+            os.remove(state_file)
+        except FileNotFoundError:
+            pass
+
+        decorrido = time.perf_counter() - inicio_geracao
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{processados} utilizadores em {time.perf_counter() - inicio:.1f}s "
+                f"({processados / decorrido if decorrido else 0:.1f} utilizadores/s)."
+            )
+        )
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from api.models import Filme, Genero
+from api.recommender.content import update_content_index
 from django.conf import settings
 import requests
 import time
@@ -105,3 +106,7 @@ class Command(BaseCommand):
                 f"🎉 Foram guardados {filmes_guardados} filmes (rating > 0 e com poster)."
             )
         )
+
+        # Indexar os filmes novos para /api/movies/<id>/similar/
+        _, indexados = update_content_index()
+        self.stdout.write(f"➡ Índice de conteúdo atualizado ({indexados} filmes novos).")
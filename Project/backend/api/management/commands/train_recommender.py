@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.recommender.als import build_als_matrices, save_version, train_als
+
+
+class Command(BaseCommand):
+    help = "Treina offline os fatores ALS das recomendações (RF-10) e publica uma nova versão."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--factors", type=int, default=32, help="Dimensão dos fatores latentes")
+        parser.add_argument("--iterations", type=int, default=10, help="Número de iterações ALS")
+        parser.add_argument("--regularization", type=float, default=0.1, help="Regularização L2 (λ)")
+        parser.add_argument("--alpha", type=float, default=20.0, help="Escala da confiança")
+        parser.add_argument("--keep", type=int, default=3, help="Número de versões a manter em disco")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+
+        self.stdout.write("➡ A ler atividade dos utilizadores...")
+        pref, conf, user_ids, item_ids = build_als_matrices()
+        self.stdout.write(
+            f"   {len(user_ids)} utilizadores, {len(item_ids)} filmes, {pref.nnz} interações"
+        )
+
+        if pref.nnz == 0:
+            self.stdout.write(self.style.WARNING("Sem interações para treinar."))
+            return
+
+        params = {
+            "factors": options["factors"],
+            "iterations": options["iterations"],
+            "regularization": options["regularization"],
+            "alpha": options["alpha"],
+        }
+
+        self.stdout.write(f"➡ A treinar ALS ({params['factors']} fatores, {params['iterations']} iterações)...")
+        user_factors, item_factors = train_als(pref, conf, **params)
+
+        versao = save_version(
+            user_factors, item_factors, user_ids, item_ids,
+            params=params,
+            keep=options["keep"],
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Versão {versao} publicada ({time.perf_counter() - inicio:.1f}s)."
+            )
+        )
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:43
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_avaliacao_favorito_historicovisualizacao_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecomendacaoUsuario',
+            fields=[
+                ('usuario', models.OneToOneField(help_text='Utilizador a quem se destinam as recomendações', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recomendacoes', serialize=False, to='api.usuario')),
+                ('filme_ids', models.JSONField(default=list, help_text='IDs dos filmes recomendados, por ordem')),
+                ('motor', models.CharField(help_text='Motor que gerou a lista (als, item_cf, genres, popular)', max_length=32)),
+                ('num_avaliacoes_positivas', models.IntegerField(default=0, help_text='Número de avaliações > 7.5 no momento do cálculo')),
+                ('eventos_pendentes', models.IntegerField(default=0, help_text='Alterações de atividade desde o último cálculo')),
+                ('calculado_em', models.DateTimeField(default=django.utils.timezone.now, help_text='Data e hora do último cálculo')),
+            ],
+            options={
+                'verbose_name': 'Recomendação de Utilizador',
+                'verbose_name_plural': 'Recomendações de Utilizadores',
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_recomendacaousuario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerfilGosto',
+            fields=[
+                ('usuario', models.OneToOneField(help_text='Utilizador a quem pertence o perfil', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='perfil_gosto', serialize=False, to='api.usuario')),
+                ('generos', models.JSONField(default=dict, help_text='Afinidade por género ({nome: peso})')),
+                ('decadas', models.JSONField(default=dict, help_text="Preferência por década ({'1990': peso})")),
+                ('num_interacoes', models.IntegerField(default=0, help_text='Número de filmes com interação relevante')),
+                ('atualizado_em', models.DateTimeField(auto_now=True, help_text='Data e hora da última atualização')),
+            ],
+            options={
+                'verbose_name': 'Perfil de Gosto',
+                'verbose_name_plural': 'Perfis de Gosto',
+            },
+        ),
+    ]
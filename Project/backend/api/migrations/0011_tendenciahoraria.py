@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_perfilgosto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TendenciaHoraria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hora', models.DateTimeField(help_text='Início da hora do bucket')),
+                ('pontos', models.FloatField(default=0.0, help_text='Soma dos pontos dos eventos nesta hora')),
+                ('filme', models.ForeignKey(help_text='Filme a que o contador pertence', on_delete=django.db.models.deletion.CASCADE, related_name='tendencia_horaria', to='api.filme')),
+            ],
+            options={
+                'verbose_name': 'Tendência Horária',
+                'verbose_name_plural': 'Tendências Horárias',
+                'indexes': [models.Index(fields=['hora'], name='api_tendenc_hora_d79209_idx')],
+                'unique_together': {('filme', 'hora')},
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_tendenciahoraria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopCoocorrencia',
+            fields=[
+                ('filme', models.OneToOneField(help_text='Filme de referência', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='top_coocorrencia', serialize=False, to='api.filme')),
+                ('filme_ids', models.JSONField(default=list, help_text='IDs dos filmes por contagem descendente')),
+                ('contagens', models.JSONField(default=list, help_text='Contagem de cada filme em filme_ids')),
+                ('atualizado_em', models.DateTimeField(auto_now=True, help_text='Data e hora da última atualização')),
+            ],
+            options={
+                'verbose_name': 'Top de Coocorrências',
+                'verbose_name_plural': 'Tops de Coocorrências',
+            },
+        ),
+        migrations.CreateModel(
+            name='CoocorrenciaFilmes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('contagem', models.IntegerField(default=0, help_text='Número de utilizadores em comum')),
+                ('filme', models.ForeignKey(help_text='Filme de referência', on_delete=django.db.models.deletion.CASCADE, related_name='coocorrencias', to='api.filme')),
+                ('outro_filme', models.ForeignKey(help_text='Filme visto/gostado pelos mesmos utilizadores', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.filme')),
+            ],
+            options={
+                'verbose_name': 'Coocorrência de Filmes',
+                'verbose_name_plural': 'Coocorrências de Filmes',
+                'indexes': [models.Index(fields=['filme', '-contagem'], name='api_coocorr_filme_i_cf7c0d_idx')],
+                'unique_together': {('filme', 'outro_filme')},
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_coocorrencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssinaturaUsuario',
+            fields=[
+                ('usuario', models.OneToOneField(help_text='Utilizador a quem pertence a assinatura', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='assinatura_minhash', serialize=False, to='api.usuario')),
+                ('assinatura', models.BinaryField(help_text='Mínimos MinHash (uint32, little-endian)')),
+                ('num_filmes', models.IntegerField(default=0, help_text='Tamanho do conjunto de filmes favoritos/vistos')),
+                ('atualizado_em', models.DateTimeField(auto_now=True, help_text='Data e hora da última atualização')),
+            ],
+            options={
+                'verbose_name': 'Assinatura MinHash',
+                'verbose_name_plural': 'Assinaturas MinHash',
+            },
+        ),
+        migrations.CreateModel(
+            name='BucketLSH',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('banda', models.SmallIntegerField(help_text='Índice da banda')),
+                ('chave', models.BigIntegerField(help_text='Hash das linhas da assinatura nesta banda')),
+                ('usuario', models.ForeignKey(help_text='Utilizador', on_delete=django.db.models.deletion.CASCADE, related_name='buckets_lsh', to='api.usuario')),
+            ],
+            options={
+                'verbose_name': 'Bucket LSH',
+                'verbose_name_plural': 'Buckets LSH',
+                'indexes': [models.Index(fields=['banda', 'chave'], name='api_bucketl_banda_aeb350_idx')],
+                'unique_together': {('usuario', 'banda')},
+            },
+        ),
+    ]
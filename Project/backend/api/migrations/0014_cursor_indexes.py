@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:09
+
+from django.db import migrations, models
+
+
+def preencher_data_favoritos(apps, schema_editor):
+    """Favoritos antigos sem data de adição passam a usar updated_at (chave do cursor)."""
+    AtividadeUsuario = apps.get_model('api', 'AtividadeUsuario')
+    AtividadeUsuario.objects.filter(favorito=True, data_adicao_favoritos__isnull=True).update(
+        data_adicao_favoritos=models.F('updated_at')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_minhash_lsh'),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher_data_favoritos, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='atividadeusuario',
+            index=models.Index(condition=models.Q(('rating__isnull', False)), fields=['usuario', '-updated_at', '-id'], name='atividade_avaliados_cursor'),
+        ),
+        migrations.AddIndex(
+            model_name='atividadeusuario',
+            index=models.Index(condition=models.Q(('ver_mais_tarde', True)), fields=['usuario', '-updated_at', '-id'], name='atividade_ver_tarde_cursor'),
+        ),
+        migrations.AddIndex(
+            model_name='atividadeusuario',
+            index=models.Index(condition=models.Q(('favorito', True)), fields=['usuario', '-data_adicao_favoritos', '-id'], name='atividade_favoritos_cursor'),
+        ),
+        migrations.AddIndex(
+            model_name='atividadeusuario',
+            index=models.Index(condition=models.Q(('review__isnull', False)), fields=['filme', '-updated_at', '-id'], name='atividade_reviews_cursor'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Tabela UNLOGGED do segundo nível da cache (api.tiered_cache): partilhada
+    pelos workers, sem escrita no WAL; o conteúdo perde-se num crash do
+    Postgres, o que para uma cache é aceitável.
+    """
+
+    dependencies = [
+        ('api', '0014_cursor_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            """
+            CREATE UNLOGGED TABLE cache_partilhada (
+                chave varchar(255) PRIMARY KEY,
+                valor bytea NOT NULL,
+                expira_em timestamp with time zone NOT NULL
+            );
+            CREATE INDEX cache_partilhada_expira_em ON cache_partilhada (expira_em);
+            """,
+            "DROP TABLE IF EXISTS cache_partilhada;",
+        ),
+    ]
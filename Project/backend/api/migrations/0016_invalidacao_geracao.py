@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Contador de geração do barramento de invalidação (api.invalidation):
+    incrementado a cada publicação, é consultado pelos workers cujo
+    listener perdeu a ligação. Uma sequência não é transacional nem gera
+    contenção entre escritores.
+    """
+
+    dependencies = [
+        ('api', '0015_cache_partilhada'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE SEQUENCE invalidacao_geracao;",
+            "DROP SEQUENCE IF EXISTS invalidacao_geracao;",
+        ),
+    ]
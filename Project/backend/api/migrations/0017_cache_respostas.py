@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Tabela da cache das respostas públicas (RESPONSE_CACHE_ALIAS com o
+    DatabaseCache), com o esquema de "manage.py createcachetable", para que
+    um simples migrate baste; IF NOT EXISTS mantém compatíveis as bases de
+    dados onde o comando já foi executado.
+    """
+
+    dependencies = [
+        ('api', '0016_invalidacao_geracao'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            """
+            CREATE TABLE IF NOT EXISTS cache_respostas (
+                cache_key varchar(255) NOT NULL PRIMARY KEY,
+                value text NOT NULL,
+                expires timestamp with time zone NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS cache_respostas_expires ON cache_respostas (expires);
+            """,
+            "DROP TABLE IF EXISTS cache_respostas;",
+        ),
+    ]
@@ -315,8 +315,50 @@ class AtividadeUsuario(models.Model):
             models.Index(fields=['usuario', 'ver_mais_tarde']),
             models.Index(fields=['filme', 'rating']),
             models.Index(fields=['-updated_at']),
+            # Paginação por cursor das listas pessoais e dos reviews (RNF-01)
+            models.Index(
+                fields=['usuario', '-updated_at', '-id'],
+                condition=models.Q(rating__isnull=False),
+                name='atividade_avaliados_cursor',
+            ),
+            models.Index(
+                fields=['usuario', '-updated_at', '-id'],
+                condition=models.Q(ver_mais_tarde=True),
+                name='atividade_ver_tarde_cursor',
+            ),
+            models.Index(
+                fields=['usuario', '-data_adicao_favoritos', '-id'],
+                condition=models.Q(favorito=True),
+                name='atividade_favoritos_cursor',
+            ),
+            models.Index(
+                fields=['filme', '-updated_at', '-id'],
+                condition=models.Q(review__isnull=False),
+                name='atividade_reviews_cursor',
+            ),
         ]
     
+    # Campos cujas alterações são propagadas pelos sinais (recomendações, tendências)
+    CAMPOS_MONITORIZADOS = ('rating', 'favorito', 'visto', 'ver_mais_tarde')
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Guarda o estado lido da BD para os sinais calcularem a diferença.
+        """
+        instance = super().from_db(db, field_names, values)
+        if all(campo in field_names for campo in cls.CAMPOS_MONITORIZADOS):
+            instance._estado_original = instance.estado_monitorizado()
+        if 'review' in field_names:
+            instance._review_original = instance.review
+        return instance
+    
+    def estado_monitorizado(self):
+        """
+        Estado dos campos monitorizados: (rating, favorito, visto, ver_mais_tarde).
+        """
+        return (self.rating, self.favorito, self.visto, self.ver_mais_tarde)
+    
     def save(self, *args, **kwargs):
         """
         Override do save para atualizar timestamps automáticos.
@@ -482,4 +524,287 @@ class Avaliacao(models.Model):
         ]
     
     def __str__(self):
-        return f"{self.usuario.nome} deu {self.rating}/10 a {self.filme.nome}"
\ No newline at end of file
+        return f"{self.usuario.nome} deu {self.rating}/10 a {self.filme.nome}"
+
+class RecomendacaoUsuario(models.Model):
+    """
+    Lista de recomendações pré-calculada por utilizador.
+    
+    Requisito RF-10: Motor de Recomendação
+    Requisito RNF-01: Performance e Tempo de Resposta
+    
+    - Servida diretamente enquanto não estiver desatualizada
+    - eventos_pendentes conta as alterações de rating/favorito/visto feitas
+      desde o cálculo; a lista é recalculada ao atingir o limiar configurado
+      (RECOMMENDATION_CACHE_EVENT_THRESHOLD) ou a idade máxima
+      (RECOMMENDATION_CACHE_MAX_AGE)
+    """
+    usuario = models.OneToOneField(
+        Usuario,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='recomendacoes',
+        help_text="Utilizador a quem se destinam as recomendações"
+    )
+    filme_ids = models.JSONField(
+        default=list,
+        help_text="IDs dos filmes recomendados, por ordem"
+    )
+    motor = models.CharField(
+        max_length=32,
+        help_text="Motor que gerou a lista (als, item_cf, genres, popular)"
+    )
+    num_avaliacoes_positivas = models.IntegerField(
+        default=0,
+        help_text="Número de avaliações > 7.5 no momento do cálculo"
+    )
+    eventos_pendentes = models.IntegerField(
+        default=0,
+        help_text="Alterações de atividade desde o último cálculo"
+    )
+    calculado_em = models.DateTimeField(
+        default=timezone.now,
+        help_text="Data e hora do último cálculo"
+    )
+    
+    class Meta:
+        verbose_name = "Recomendação de Utilizador"
+        verbose_name_plural = "Recomendações de Utilizadores"
+    
+    def __str__(self):
+        return f"{self.usuario_id} → {len(self.filme_ids)} filmes ({self.motor})"
+
+
+class PerfilGosto(models.Model):
+    """
+    Perfil de gosto do utilizador (afinidade por género e por década).
+    
+    Requisito RF-10: Motor de Recomendação
+    Requisito RNF-01: Performance e Tempo de Resposta
+    
+    - Atualizado incrementalmente a cada alteração de rating, favorito ou
+      visto (apenas a diferença de peso da interação é aplicada)
+    - Guarda somas de pesos por género e por década em JSON compacto
+    - Usado para pontuar candidatos com um único produto pela matriz
+      filme × género do catálogo
+    """
+    usuario = models.OneToOneField(
+        Usuario,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='perfil_gosto',
+        help_text="Utilizador a quem pertence o perfil"
+    )
+    generos = models.JSONField(
+        default=dict,
+        help_text="Afinidade por género ({nome: peso})"
+    )
+    decadas = models.JSONField(
+        default=dict,
+        help_text="Preferência por década ({'1990': peso})"
+    )
+    num_interacoes = models.IntegerField(
+        default=0,
+        help_text="Número de filmes com interação relevante"
+    )
+    atualizado_em = models.DateTimeField(
+        auto_now=True,
+        help_text="Data e hora da última atualização"
+    )
+    
+    class Meta:
+        verbose_name = "Perfil de Gosto"
+        verbose_name_plural = "Perfis de Gosto"
+    
+    def __str__(self):
+        return f"Perfil de gosto de {self.usuario_id}"
+
+
+class TendenciaHoraria(models.Model):
+    """
+    Contador horário de atividade por filme (tendências locais).
+    
+    Requisito RF-11: Tendências/Populares
+    Requisito RNF-01: Performance e Tempo de Resposta
+    
+    - Uma linha por (filme, hora) com a soma dos pontos dos eventos
+      (avaliações, favoritos, ver mais tarde, visualizações) dessa hora
+    - O decaimento exponencial é aplicado na leitura, por bucket
+    - Buckets fora da janela mais longa são removidos ao abrir novos
+    """
+    filme = models.ForeignKey(
+        Filme,
+        on_delete=models.CASCADE,
+        related_name='tendencia_horaria',
+        help_text="Filme a que o contador pertence"
+    )
+    hora = models.DateTimeField(
+        help_text="Início da hora do bucket"
+    )
+    pontos = models.FloatField(
+        default=0.0,
+        help_text="Soma dos pontos dos eventos nesta hora"
+    )
+    
+    class Meta:
+        verbose_name = "Tendência Horária"
+        verbose_name_plural = "Tendências Horárias"
+        unique_together = ('filme', 'hora')
+        indexes = [
+            models.Index(fields=['hora']),
+        ]
+    
+    def __str__(self):
+        return f"{self.filme_id} @ {self.hora:%Y-%m-%d %H}h: {self.pontos:.1f}"
+
+
+class CoocorrenciaFilmes(models.Model):
+    """
+    Número de utilizadores que reagiram positivamente a dois filmes.
+    
+    Requisito RF-10: Motor de Recomendação ("quem viu isto também gostou de")
+    
+    - Atividade positiva: visto, favorito ou rating >= 7
+    - Guardada nos dois sentidos (A, B) e (B, A) para que o top de um filme
+      seja uma leitura pelo índice (filme, -contagem)
+    - Atualizada incrementalmente a cada evento, com um único upsert por lote
+    """
+    filme = models.ForeignKey(
+        Filme,
+        on_delete=models.CASCADE,
+        related_name='coocorrencias',
+        help_text="Filme de referência"
+    )
+    outro_filme = models.ForeignKey(
+        Filme,
+        on_delete=models.CASCADE,
+        related_name='+',
+        help_text="Filme visto/gostado pelos mesmos utilizadores"
+    )
+    contagem = models.IntegerField(
+        default=0,
+        help_text="Número de utilizadores em comum"
+    )
+    
+    class Meta:
+        verbose_name = "Coocorrência de Filmes"
+        verbose_name_plural = "Coocorrências de Filmes"
+        unique_together = ('filme', 'outro_filme')
+        indexes = [
+            models.Index(fields=['filme', '-contagem']),
+        ]
+    
+    def __str__(self):
+        return f"{self.filme_id} ↔ {self.outro_filme_id}: {self.contagem}"
+
+
+class TopCoocorrencia(models.Model):
+    """
+    Lista pré-calculada dos filmes com mais coocorrências de cada filme.
+    
+    Requisito RF-10: Motor de Recomendação
+    Requisito RNF-01: Performance e Tempo de Resposta
+    
+    Mantida a par de CoocorrenciaFilmes para que a página do filme leia o
+    "também gostaram de" com uma única query pela chave primária.
+    """
+    filme = models.OneToOneField(
+        Filme,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='top_coocorrencia',
+        help_text="Filme de referência"
+    )
+    filme_ids = models.JSONField(
+        default=list,
+        help_text="IDs dos filmes por contagem descendente"
+    )
+    contagens = models.JSONField(
+        default=list,
+        help_text="Contagem de cada filme em filme_ids"
+    )
+    atualizado_em = models.DateTimeField(
+        auto_now=True,
+        help_text="Data e hora da última atualização"
+    )
+    
+    class Meta:
+        verbose_name = "Top de Coocorrências"
+        verbose_name_plural = "Tops de Coocorrências"
+    
+    def __str__(self):
+        return f"{self.filme_id} → {len(self.filme_ids)} filmes"
+
+
+class AssinaturaUsuario(models.Model):
+    """
+    Assinatura MinHash do conjunto de filmes favoritos/vistos do utilizador.
+    
+    Requisito RF-10: Motor de Recomendação (utilizadores com gostos semelhantes)
+    Requisito RNF-01: Performance e Tempo de Resposta
+    
+    - Vetor de MINHASH_PERMUTACOES mínimos (uint32) guardado em binário
+    - Atualizada incrementalmente quando um filme entra no conjunto e
+      recalculada quando sai
+    - As bandas da assinatura são indexadas em BucketLSH
+    """
+    usuario = models.OneToOneField(
+        Usuario,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='assinatura_minhash',
+        help_text="Utilizador a quem pertence a assinatura"
+    )
+    assinatura = models.BinaryField(
+        help_text="Mínimos MinHash (uint32, little-endian)"
+    )
+    num_filmes = models.IntegerField(
+        default=0,
+        help_text="Tamanho do conjunto de filmes favoritos/vistos"
+    )
+    atualizado_em = models.DateTimeField(
+        auto_now=True,
+        help_text="Data e hora da última atualização"
+    )
+    
+    class Meta:
+        verbose_name = "Assinatura MinHash"
+        verbose_name_plural = "Assinaturas MinHash"
+    
+    def __str__(self):
+        return f"Assinatura de {self.usuario_id} ({self.num_filmes} filmes)"
+
+
+class BucketLSH(models.Model):
+    """
+    Bucket LSH de uma banda da assinatura MinHash de um utilizador.
+    
+    Requisito RF-10: Motor de Recomendação
+    Requisito RNF-01: Performance e Tempo de Resposta
+    
+    Utilizadores com a mesma chave numa banda são candidatos a vizinhos;
+    a procura lê apenas os buckets do utilizador pelo índice (banda, chave).
+    """
+    usuario = models.ForeignKey(
+        Usuario,
+        on_delete=models.CASCADE,
+        related_name='buckets_lsh',
+        help_text="Utilizador"
+    )
+    banda = models.SmallIntegerField(
+        help_text="Índice da banda"
+    )
+    chave = models.BigIntegerField(
+        help_text="Hash das linhas da assinatura nesta banda"
+    )
+    
+    class Meta:
+        verbose_name = "Bucket LSH"
+        verbose_name_plural = "Buckets LSH"
+        unique_together = ('usuario', 'banda')
+        indexes = [
+            models.Index(fields=['banda', 'chave']),
+        ]
+    
+    def __str__(self):
+        return f"{self.usuario_id} banda {self.banda}: {self.chave}"
@@ -0,0 +1,10 @@
+"""
+Motor de recomendações de filmes.
+
+Requisito RF-10: Motor de Recomendação
+Requisito RNF-01: Performance e Tempo de Resposta
+
+Os modelos são treinados offline (comandos de gestão) a partir de
+AtividadeUsuario e guardados em RECOMMENDER_ARTIFACTS_DIR; as views apenas
+carregam os artefactos e pontuam o histórico do utilizador.
+"""
@@ -0,0 +1,372 @@
+"""
+Fatorização de matrizes por ALS (Alternating Least Squares).
+
+Requisito RF-10: Motor de Recomendação
+Requisito RNF-01: Performance e Tempo de Resposta
+
+Treino (comando train_recommender): ALS implícito (Hu, Koren & Volinsky)
+em que cada interação de AtividadeUsuario gera uma preferência (0/1) e uma
+confiança que pondera rating, favorito, ver mais tarde e visto. As matrizes
+de fatores são gravadas em ficheiros .npy versionados:
+
+    RECOMMENDER_ARTIFACTS_DIR/als/<versão>/{user,item}_{factors,ids}.npy
+    RECOMMENDER_ARTIFACTS_DIR/als/CURRENT   (nome da versão ativa)
+
+Serviço: os fatores são abertos com mmap_mode='r', pelo que as páginas são
+partilhadas pelo sistema operativo entre todos os workers; cada pedido é um
+único produto matriz-vetor seguido de np.argpartition.
+"""
+
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from scipy import sparse
+
+from api.models import AtividadeUsuario
+
+from .interactions import _columns, index_of
+
+
+# Pesos de cada sinal na confiança c = 1 + alpha * força
+PESO_RATING = 1.0
+PESO_FAVORITO = 1.0
+PESO_VER_MAIS_TARDE = 0.5
+PESO_VISTO = 0.5
+
+# Ratings abaixo deste valor contam como preferência negativa
+RATING_NEGATIVO = 5
+
+COLUNAS_ALS = ('usuario_id', 'filme_id', 'rating', 'favorito', 'visto', 'ver_mais_tarde')
+
+# Colunas do histórico de um utilizador (fold-in), sem usuario_id
+COLUNAS_HISTORICO = COLUNAS_ALS[1:]
+
+CURRENT_FILE = 'CURRENT'
+
+
+def build_als_matrices(queryset=None):
+    """
+    Constrói as matrizes de preferência e confiança a partir de AtividadeUsuario.
+
+    Returns:
+        tuple: (preferências csr, força csr, user_ids, item_ids)
+    """
+    if queryset is None:
+        queryset = AtividadeUsuario.objects.all()
+    rows = queryset.order_by().values_list(*COLUNAS_ALS).iterator(chunk_size=10000)
+    return als_matrices_from_rows(rows)
+
+
+def als_weights(ratings, favoritos, vistos, ver_mais_tarde):
+    """
+    Preferência e força de várias interações (vetorizado).
+
+    Usado no treino e no fold-in, para que os utilizadores projetados sejam
+    resolvidos contra o mesmo objetivo com que os fatores foram treinados.
+
+    Returns:
+        tuple: (preferências 0/1, forças float32; 0 quando não há sinal)
+    """
+    ratings = np.asarray(ratings, dtype=np.float64)
+    avaliado = ~np.isnan(ratings)
+
+    # Ratings extremos (muito altos ou muito baixos) dão mais confiança
+    forca = (
+        PESO_RATING * np.where(avaliado, 0.5 + np.abs(np.nan_to_num(ratings) - 5.0) / 10.0, 0.0)
+        + PESO_FAVORITO * np.asarray(favoritos, dtype=np.float32)
+        + PESO_VER_MAIS_TARDE * np.asarray(ver_mais_tarde, dtype=np.float32)
+        + PESO_VISTO * np.asarray(vistos, dtype=np.float32)
+    ).astype(np.float32)
+    preferencia = np.where(avaliado & (np.nan_to_num(ratings) < RATING_NEGATIVO), 0.0, 1.0)
+    return preferencia.astype(np.float32), forca
+
+
+def als_history(rows):
+    """
+    Converte o histórico de um utilizador para o fold-in.
+
+    Args:
+        rows: Iterável de tuplos com as COLUNAS_HISTORICO
+
+    Returns:
+        tuple: (filme_ids int64, preferências, forças), um por linha
+    """
+    colunas = _columns(rows, rating_pos=1)
+    if colunas is None:
+        vazio = np.empty(0, dtype=np.float32)
+        return np.empty(0, dtype=np.int64), vazio, vazio
+    filme_ids, ratings, favoritos, vistos, ver_mais_tarde = colunas
+    return (filme_ids.astype(np.int64), *als_weights(ratings, favoritos, vistos, ver_mais_tarde))
+
+
+def als_matrices_from_rows(rows):
+    """
+    Constrói as matrizes de preferência e confiança a partir de tuplos com
+    as COLUNAS_ALS (ver build_als_matrices).
+    """
+    colunas = _columns(rows, rating_pos=2)
+
+    if colunas is None:
+        vazio = np.empty(0, dtype=np.int64)
+        matriz = sparse.csr_matrix((0, 0), dtype=np.float32)
+        return matriz, matriz, vazio, vazio
+
+    usuario_ids, filme_ids, ratings, favoritos, vistos, ver_mais_tarde = colunas
+    preferencia, forca = als_weights(ratings, favoritos, vistos, ver_mais_tarde)
+
+    mask = forca > 0
+    user_ids, linhas = np.unique(usuario_ids[mask].astype(np.int64), return_inverse=True)
+    item_ids, cols = np.unique(filme_ids[mask].astype(np.int64), return_inverse=True)
+    shape = (len(user_ids), len(item_ids))
+
+    # Preferências a zero são guardadas explicitamente (valor mínimo positivo
+    # evita que o SciPy as remova); o treino usa apenas o padrão de esparsidade.
+    pref = sparse.csr_matrix(
+        (np.maximum(preferencia[mask], 1e-8).astype(np.float32), (linhas, cols)),
+        shape=shape,
+    )
+    conf = sparse.csr_matrix((forca[mask], (linhas, cols)), shape=shape)
+    return pref, conf, user_ids, item_ids
+
+
+def _solve_row(YtY, Y, p, c, reg):
+    """
+    Sistema ALS de uma linha contra os fatores fixos Y das suas interações.
+
+    (YᵀY + Yᵀ(Cᵤ − I)Y + λI) xᵤ = YᵀCᵤpᵤ
+    """
+    A = YtY + (Y.T * (c - 1.0)) @ Y + reg
+    return np.linalg.solve(A, (Y.T * c) @ p)
+
+
+def _solve_rows(fixos, pref, conf, alpha, regularization):
+    """Resolve, para cada linha de `pref`, o sistema ALS contra os fatores fixos."""
+    n_linhas = pref.shape[0]
+    n_fatores = fixos.shape[1]
+    YtY = fixos.T @ fixos
+    reg = regularization * np.eye(n_fatores, dtype=np.float32)
+    resultado = np.zeros((n_linhas, n_fatores), dtype=np.float32)
+
+    for u in range(n_linhas):
+        a, b = pref.indptr[u], pref.indptr[u + 1]
+        if a == b:
+            continue
+        p = np.where(pref.data[a:b] >= 0.5, 1.0, 0.0).astype(np.float32)
+        c = 1.0 + alpha * conf.data[a:b]
+        resultado[u] = _solve_row(YtY, fixos[pref.indices[a:b]], p, c, reg)
+
+    return resultado
+
+
+def train_als(pref, conf, factors=32, iterations=10, regularization=0.1, alpha=20.0, seed=42):
+    """
+    Treina fatores ALS implícitos.
+
+    Args:
+        pref: csr utilizador × filme com as preferências
+        conf: csr utilizador × filme com a força de cada interação
+        factors: Dimensão dos fatores latentes
+        iterations: Número de alternâncias utilizador/filme
+        regularization: Termo λ de regularização L2
+        alpha: Escala da confiança
+        seed: Semente do gerador aleatório
+
+    Returns:
+        tuple: (user_factors, item_factors) float32
+    """
+    n_users, n_items = pref.shape
+    rng = np.random.default_rng(seed)
+    user_factors = (rng.standard_normal((n_users, factors)) * 0.01).astype(np.float32)
+    item_factors = (rng.standard_normal((n_items, factors)) * 0.01).astype(np.float32)
+
+    pref_t = pref.T.tocsr()
+    conf_t = conf.T.tocsr()
+
+    for _ in range(iterations):
+        user_factors = _solve_rows(item_factors, pref, conf, alpha, regularization)
+        item_factors = _solve_rows(user_factors, pref_t, conf_t, alpha, regularization)
+
+    return user_factors, item_factors
+
+
+def als_dir():
+    """Diretório base dos artefactos ALS."""
+    return settings.RECOMMENDER_ARTIFACTS_DIR / 'als'
+
+
+def save_version(user_factors, item_factors, user_ids, item_ids, params, keep=3):
+    """
+    Grava uma nova versão dos fatores e ativa-a (CURRENT).
+
+    Args:
+        params: Dict com os hiperparâmetros do treino (gravado em meta.json)
+        keep: Número de versões antigas a manter em disco
+
+    Returns:
+        str: Nome da versão gravada
+    """
+    base = als_dir()
+    # Com microssegundos: duas versões no mesmo segundo não se sobrepõem
+    versao = timezone.now().strftime('%Y%m%d%H%M%S%f')
+    destino = base / versao
+    destino.mkdir(parents=True, exist_ok=True)
+
+    arrays = {
+        'user_factors': user_factors,
+        'item_factors': item_factors,
+        'user_ids': user_ids,
+        'item_ids': item_ids,
+    }
+    for nome, array in arrays.items():
+        np.save(destino / f'{nome}.npy', np.ascontiguousarray(array))
+    (destino / 'meta.json').write_text(json.dumps(params))
+
+    tmp = base / (CURRENT_FILE + '.tmp')
+    tmp.write_text(versao)
+    os.replace(tmp, base / CURRENT_FILE)
+
+    versoes = sorted(p for p in base.iterdir() if p.is_dir())
+    for antiga in versoes[:-keep] if keep > 0 else []:
+        shutil.rmtree(antiga, ignore_errors=True)
+
+    return versao
+
+
+class ALSModel:
+    """
+    Fatores ALS em memória (mmap) para servir recomendações.
+
+    Attributes:
+        version: Nome da versão carregada
+        user_factors / item_factors: np.memmap float32
+        user_ids / item_ids: np.ndarray int64 ordenados
+    """
+
+    def __init__(self, version, user_factors, item_factors, user_ids, item_ids,
+                 regularization=0.1, alpha=20.0):
+        self.version = version
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+        self.user_ids = user_ids
+        self.item_ids = item_ids
+        self.regularization = regularization
+        self.alpha = alpha
+        self._YtY = None
+
+    @classmethod
+    def load(cls, version):
+        pasta = als_dir() / version
+        params = json.loads((pasta / 'meta.json').read_text())
+        return cls(
+            version,
+            np.load(pasta / 'user_factors.npy', mmap_mode='r'),
+            np.load(pasta / 'item_factors.npy', mmap_mode='r'),
+            np.load(pasta / 'user_ids.npy'),
+            np.load(pasta / 'item_ids.npy'),
+            regularization=params.get('regularization', 0.1),
+            alpha=params.get('alpha', 20.0),
+        )
+
+    def fold_in(self, historico):
+        """
+        Projeta um histórico nos fatores dos filmes ("fold-in"): uma única
+        resolução f × f com a preferência e a confiança do treino.
+
+        Args:
+            historico: (filme_ids, preferências, forças) de als_history
+
+        Returns:
+            np.ndarray float32, ou None se nenhum filme do histórico é conhecido
+        """
+        filme_ids, preferencias, forcas = historico
+        idx = index_of(self.item_ids, filme_ids)
+        validos = (idx >= 0) & (forcas > 0)
+        if not validos.any():
+            return None
+
+        if self._YtY is None:
+            Y = np.asarray(self.item_factors)
+            self._YtY = Y.T @ Y
+
+        Y = np.asarray(self.item_factors[idx[validos]])
+        p = (preferencias[validos] >= 0.5).astype(np.float32)
+        c = 1.0 + self.alpha * forcas[validos]
+        reg = self.regularization * np.eye(Y.shape[1], dtype=np.float32)
+        return _solve_row(self._YtY, Y, p, c, reg).astype(np.float32)
+
+    def user_vector(self, usuario_id, historico):
+        """
+        Vetor latente do utilizador: o do treino ou, para utilizadores
+        criados depois dele, o fold-in do histórico.
+        """
+        pos = index_of(self.user_ids, [usuario_id])[0]
+        if pos >= 0:
+            return np.asarray(self.user_factors[pos])
+        return self.fold_in(historico)
+
+    def recommend(self, usuario_id, historico, limit=20):
+        """
+        Top-K filmes para o utilizador (um produto matriz-vetor + argpartition).
+
+        Os filmes do histórico são excluídos.
+
+        Args:
+            usuario_id: ID do utilizador
+            historico: (filme_ids, preferências, forças) de als_history
+            limit: Número máximo de filmes
+
+        Returns:
+            list: IDs dos filmes por pontuação descendente
+        """
+        history_ids = historico[0]
+        vetor = self.user_vector(usuario_id, historico)
+        if vetor is None or self.item_ids.size == 0:
+            return []
+
+        scores = np.asarray(self.item_factors @ vetor)
+
+        vistos = index_of(self.item_ids, history_ids)
+        scores[vistos[vistos >= 0]] = -np.inf
+
+        k = min(limit, self.item_ids.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.isfinite(scores[top])]
+        top = top[np.argsort(-scores[top])]
+        return self.item_ids[top].tolist()
+
+
+_lock = threading.Lock()
+_cache = {'version': None, 'model': None}
+
+
+def current_version():
+    """Nome da versão ativa (None se ainda não houver treino)."""
+    try:
+        return (als_dir() / CURRENT_FILE).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def get_als_model():
+    """
+    Devolve o modelo ALS ativo (None se não existir).
+
+    Quando o treino publica uma nova versão, o próximo pedido troca de modelo.
+    """
+    versao = current_version()
+    if versao is None:
+        return None
+
+    with _lock:
+        if _cache['version'] != versao:
+            try:
+                _cache['model'] = ALSModel.load(versao)
+            except FileNotFoundError:
+                return _cache['model']
+            _cache['version'] = versao
+        return _cache['model']
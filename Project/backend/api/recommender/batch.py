@@ -0,0 +1,82 @@
+"""
+Geração de recomendações em lote (comando generate_recommendations).
+
+Requisito RF-10: Motor de Recomendação
+Requisito RNF-01: Performance e Tempo de Resposta
+
+Cada bloco de utilizadores é processado com duas leituras (atividade e
+perfis de gosto de todo o bloco) e uma única escrita
+(INSERT ... ON CONFLICT em RecomendacaoUsuario).
+"""
+
+from collections import defaultdict
+
+from django.utils import timezone
+
+from api.models import AtividadeUsuario, PerfilGosto, RecomendacaoUsuario
+
+from .als import COLUNAS_HISTORICO, get_als_model
+from .cache import CAMPOS_ATUALIZADOS
+from .catalogue import get_catalogue
+from .engine import compute_recommendations
+from .item_cf import get_item_neighbours
+from .sampler import get_candidate_pools
+
+
+def warm_up():
+    """
+    Carrega catálogo, pools e modelos offline no processo atual.
+
+    Chamado antes de criar os workers para que estes herdem as estruturas
+    (fork com copy-on-write) em vez de as carregarem cada um.
+    """
+    get_catalogue()
+    get_candidate_pools()
+    get_als_model()
+    get_item_neighbours()
+
+
+def generate_for_users(usuario_ids, limit=20):
+    """
+    Calcula e grava as recomendações de um bloco de utilizadores.
+
+    Returns:
+        int: Número de utilizadores processados
+    """
+    atividades = defaultdict(list)
+    linhas = (
+        AtividadeUsuario.objects
+        .filter(usuario_id__in=usuario_ids)
+        .order_by()
+        .values_list('usuario_id', *COLUNAS_HISTORICO)
+    )
+    for usuario_id, *atividade in linhas:
+        atividades[usuario_id].append(tuple(atividade))
+
+    perfis = PerfilGosto.objects.in_bulk(usuario_ids)
+
+    agora = timezone.now()
+    registos = []
+    for usuario_id in usuario_ids:
+        filme_ids, motor, num_positivas = compute_recommendations(
+            usuario_id,
+            limit=limit,
+            atividades=atividades.get(usuario_id, []),
+            perfil=perfis.get(usuario_id),
+        )
+        registos.append(RecomendacaoUsuario(
+            usuario_id=usuario_id,
+            filme_ids=filme_ids,
+            motor=motor,
+            num_avaliacoes_positivas=num_positivas,
+            eventos_pendentes=0,
+            calculado_em=agora,
+        ))
+
+    RecomendacaoUsuario.objects.bulk_create(
+        registos,
+        update_conflicts=True,
+        unique_fields=['usuario'],
+        update_fields=CAMPOS_ATUALIZADOS,
+    )
+    return len(registos)
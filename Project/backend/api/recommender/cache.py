@@ -0,0 +1,127 @@
+"""
+Cache por utilizador das listas de recomendações.
+
+Requisito RF-10: Motor de Recomendação
+Requisito RNF-01: Performance e Tempo de Resposta
+
+A lista calculada fica em RecomendacaoUsuario e é servida diretamente até
+acumular RECOMMENDATION_CACHE_EVENT_THRESHOLD alterações de rating,
+favorito ou visto (contadas pelos sinais de AtividadeUsuario) ou até passar
+RECOMMENDATION_CACHE_MAX_AGE segundos, o que limita a desatualização.
+Utilizadores sem qualquer atividade recebem a lista de populares, partilhada
+por todos através da cache do Django.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from api.models import AtividadeUsuario, RecomendacaoUsuario
+
+from .engine import compute_recommendations, popular_recommendations
+
+
+POPULARES_CACHE_KEY = 'recomendacoes:populares:{limit}'
+
+# Campos reescritos quando a lista de um utilizador já existe
+CAMPOS_ATUALIZADOS = [
+    'filme_ids', 'motor', 'num_avaliacoes_positivas', 'eventos_pendentes', 'calculado_em',
+]
+
+
+def is_stale(recomendacao, agora=None):
+    """Indica se a lista tem de ser recalculada."""
+    agora = agora or timezone.now()
+    idade_maxima = timedelta(seconds=settings.RECOMMENDATION_CACHE_MAX_AGE)
+    return (
+        recomendacao.eventos_pendentes >= settings.RECOMMENDATION_CACHE_EVENT_THRESHOLD
+        or agora - recomendacao.calculado_em > idade_maxima
+    )
+
+
+def popular_for_new_users(limit=20):
+    """
+    Lista de populares partilhada por todos os utilizadores sem atividade.
+
+    Returns:
+        RecomendacaoUsuario: Instância não gravada com a lista
+    """
+    chave = POPULARES_CACHE_KEY.format(limit=limit)
+    em_cache = cache.get(chave)
+    if em_cache is None:
+        em_cache = {
+            'filme_ids': popular_recommendations(limit=limit),
+            'calculado_em': timezone.now(),
+        }
+        cache.set(chave, em_cache, settings.RECOMMENDATION_CACHE_MAX_AGE)
+
+    return RecomendacaoUsuario(
+        filme_ids=em_cache['filme_ids'],
+        motor='popular',
+        num_avaliacoes_positivas=0,
+        calculado_em=em_cache['calculado_em'],
+    )
+
+
+def refresh_recommendations(usuario_id, limit=20):
+    """
+    Recalcula e grava a lista de um utilizador.
+
+    A gravação é um INSERT ... ON CONFLICT: dois pedidos concorrentes para um
+    utilizador ainda sem lista não colidem na chave primária.
+
+    Returns:
+        RecomendacaoUsuario
+    """
+    filme_ids, motor, num_positivas = compute_recommendations(usuario_id, limit=limit)
+    recomendacao = RecomendacaoUsuario(
+        usuario_id=usuario_id,
+        filme_ids=filme_ids,
+        motor=motor,
+        num_avaliacoes_positivas=num_positivas,
+        eventos_pendentes=0,
+        calculado_em=timezone.now(),
+    )
+    RecomendacaoUsuario.objects.bulk_create(
+        [recomendacao],
+        update_conflicts=True,
+        unique_fields=['usuario'],
+        update_fields=CAMPOS_ATUALIZADOS,
+    )
+    return recomendacao
+
+
+def get_recommendations(usuario_id, limit=20):
+    """
+    Devolve a lista de recomendações do utilizador, recalculando-a se necessário.
+
+    Returns:
+        RecomendacaoUsuario
+    """
+    recomendacao = RecomendacaoUsuario.objects.filter(usuario_id=usuario_id).first()
+
+    if recomendacao is not None and not is_stale(recomendacao):
+        return recomendacao
+
+    if recomendacao is None and not AtividadeUsuario.objects.filter(usuario_id=usuario_id).exists():
+        return popular_for_new_users(limit=limit)
+
+    return refresh_recommendations(usuario_id, limit=limit)
+
+
+def register_activity_change(usuario_id, eventos=1):
+    """
+    Conta alterações de atividade relevantes para as recomendações.
+
+    Uma única query UPDATE; não faz nada se o utilizador ainda não tem lista.
+
+    Args:
+        usuario_id: ID do utilizador
+        eventos: Número de alterações a contar (escritas em lote)
+    """
+    RecomendacaoUsuario.objects.filter(usuario_id=usuario_id).update(
+        eventos_pendentes=F('eventos_pendentes') + eventos
+    )
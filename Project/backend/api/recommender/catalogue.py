@@ -0,0 +1,122 @@
+"""
+Instantâneo do catálogo em memória (arrays NumPy).
+
+Requisito RF-10: Motor de Recomendação
+Requisito RNF-01: Performance e Tempo de Resposta
+
+Carrega IDs, rating TMDB, ano e géneros de todos os filmes em duas queries e
+guarda-os em arrays alinhados, incluindo a matriz esparsa filme × género.
+O instantâneo é partilhado por todos os pedidos do processo e recarregado
+a cada RECOMMENDER_CATALOGUE_TTL segundos.
+"""
+
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from scipy import sparse
+
+from api.models import Filme
+
+from .interactions import index_of
+
+
+class Catalogue:
+    """
+    Catálogo de filmes em arrays alinhados por posição.
+
+    Attributes:
+        film_ids: np.ndarray int64 ordenado
+        ratings: np.ndarray float32 com o rating TMDB (NaN quando não existe)
+        years: np.ndarray int32 com o ano de lançamento (0 quando não existe)
+        genres: Lista com o nome de cada coluna de genre_matrix
+        genre_matrix: csr float32 (n_filmes × n_géneros) com 1 por associação
+    """
+
+    def __init__(self, film_ids, ratings, years, genres, genre_matrix):
+        self.film_ids = film_ids
+        self.ratings = ratings
+        self.years = years
+        self.genres = genres
+        self.genre_matrix = genre_matrix
+        self._genre_pos = {nome: i for i, nome in enumerate(genres)}
+
+    @classmethod
+    def load(cls):
+        """Lê o catálogo da base de dados (duas queries, sem instanciar modelos)."""
+        filmes = list(
+            Filme.objects
+            .order_by('id')
+            .values_list('id', 'rating_tmdb', 'ano_lancamento')
+        )
+        film_ids = np.array([f[0] for f in filmes], dtype=np.int64)
+        ratings = np.array(
+            [np.nan if f[1] is None else f[1] for f in filmes],
+            dtype=np.float32,
+        )
+        years = np.array([f[2] or 0 for f in filmes], dtype=np.int32)
+
+        associacoes = list(Filme.generos.through.objects.values_list('filme_id', 'genero_id'))
+        genres = sorted({g for _, g in associacoes})
+        genre_pos = {nome: i for i, nome in enumerate(genres)}
+
+        if associacoes:
+            linhas = index_of(film_ids, [a[0] for a in associacoes])
+            colunas = np.array([genre_pos[a[1]] for a in associacoes], dtype=np.int64)
+            validos = linhas >= 0
+            genre_matrix = sparse.csr_matrix(
+                (np.ones(validos.sum(), dtype=np.float32), (linhas[validos], colunas[validos])),
+                shape=(film_ids.size, len(genres)),
+            )
+        else:
+            genre_matrix = sparse.csr_matrix((film_ids.size, 0), dtype=np.float32)
+
+        return cls(film_ids, ratings, years, genres, genre_matrix)
+
+    def positions(self, filme_ids):
+        """Posições dos filmes no catálogo (-1 quando não existem)."""
+        return index_of(self.film_ids, filme_ids)
+
+    def genre_positions(self, nomes):
+        """Colunas dos géneros dados (os desconhecidos são ignorados)."""
+        return np.array(
+            [self._genre_pos[n] for n in nomes if n in self._genre_pos],
+            dtype=np.int64,
+        )
+
+    def genre_vector(self, pesos):
+        """Vetor (n_géneros) com os pesos de um dict {género: peso}."""
+        vetor = np.zeros(len(self.genres), dtype=np.float32)
+        for nome, peso in pesos.items():
+            pos = self._genre_pos.get(nome)
+            if pos is not None:
+                vetor[pos] = peso
+        return vetor
+
+    def genres_of(self, filme_ids):
+        """Colunas dos géneros associados a um conjunto de filmes."""
+        pos = self.positions(filme_ids)
+        pos = pos[pos >= 0]
+        if pos.size == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(self.genre_matrix[pos].indices).astype(np.int64)
+
+
+_lock = threading.Lock()
+_cache = {'loaded_at': 0.0, 'catalogue': None}
+
+
+def get_catalogue():
+    """
+    Devolve o instantâneo do catálogo, recarregando-o quando expira.
+    """
+    agora = time.monotonic()
+    with _lock:
+        if (
+            _cache['catalogue'] is None
+            or agora - _cache['loaded_at'] > settings.RECOMMENDER_CATALOGUE_TTL
+        ):
+            _cache['catalogue'] = Catalogue.load()
+            _cache['loaded_at'] = agora
+        return _cache['catalogue']
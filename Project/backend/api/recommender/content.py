@@ -0,0 +1,379 @@
+"""
+Índice de conteúdo (TF-IDF sobre n-gramas com hashing) para filmes semelhantes.
+
+Requisito RF-10: Motor de Recomendação
+Requisito RNF-01: Performance e Tempo de Resposta
+
+Cada filme é representado pelo título, sinopse (Filme.descricao) e géneros,
+tokenizados em unigramas e bigramas e projetados num espaço de dimensão fixa
+por hashing (crc32, estável entre processos). O índice guarda as contagens e
+a frequência de documentos de cada coluna, pelo que novos filmes podem ser
+acrescentados sem reconstruir tudo: calculam-se apenas os vizinhos dos novos
+filmes e fundem-se os novos candidatos nas listas top-K existentes.
+"""
+
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+from django.conf import settings
+from scipy import sparse
+
+from api.models import Filme
+
+from .interactions import index_of
+
+
+ARTIFACT_NAME = 'content_index.npz'
+
+N_FEATURES = 2 ** 18
+PESO_GENERO = 3.0
+PESO_TITULO = 2.0
+
+_TOKEN_RE = re.compile(r'[^\W\d_]{2,}', re.UNICODE)
+
+
+def _hash(termo):
+    return zlib.crc32(termo.encode('utf-8')) % N_FEATURES
+
+
+def tokenize(nome, descricao, generos):
+    """
+    Gera os termos ponderados de um filme.
+
+    Returns:
+        dict: {coluna: peso} antes da ponderação IDF
+    """
+    termos = {}
+
+    def adicionar(texto, peso):
+        palavras = _TOKEN_RE.findall((texto or '').lower())
+        for i, palavra in enumerate(palavras):
+            col = _hash(palavra)
+            termos[col] = termos.get(col, 0.0) + peso
+            if i > 0:
+                col = _hash(palavras[i - 1] + ' ' + palavra)
+                termos[col] = termos.get(col, 0.0) + peso
+
+    adicionar(nome, PESO_TITULO)
+    adicionar(descricao, 1.0)
+    for genero in generos:
+        col = _hash('g:' + genero.lower())
+        termos[col] = termos.get(col, 0.0) + PESO_GENERO
+
+    return termos
+
+
+def load_documents(filme_ids=None):
+    """
+    Lê título, sinopse e géneros dos filmes em duas queries.
+
+    Returns:
+        list: Tuplos (filme_id, nome, descricao, [géneros])
+    """
+    filmes = Filme.objects.order_by('id')
+    if filme_ids is not None:
+        filmes = filmes.filter(id__in=list(filme_ids))
+    filmes = list(filmes.values_list('id', 'nome', 'descricao'))
+
+    generos = {}
+    through = Filme.generos.through.objects.all()
+    if filme_ids is not None:
+        through = through.filter(filme_id__in=[f[0] for f in filmes])
+    for filme_id, genero in through.values_list('filme_id', 'genero_id'):
+        generos.setdefault(filme_id, []).append(genero)
+
+    return [(fid, nome, descricao, generos.get(fid, [])) for fid, nome, descricao in filmes]
+
+
+def vectorize(documentos):
+    """
+    Converte documentos numa matriz CSR de contagens sublineares (1 + log tf).
+    """
+    data, indices, indptr = [], [], [0]
+    for _, nome, descricao, generos in documentos:
+        termos = tokenize(nome, descricao, generos)
+        cols = np.fromiter(termos.keys(), dtype=np.int32, count=len(termos))
+        vals = np.fromiter(termos.values(), dtype=np.float32, count=len(termos))
+        ordem = np.argsort(cols)
+        indices.append(cols[ordem])
+        data.append(1.0 + np.log(vals[ordem]))
+        indptr.append(indptr[-1] + len(termos))
+
+    n = len(documentos)
+    if n == 0:
+        return sparse.csr_matrix((0, N_FEATURES), dtype=np.float32)
+    return sparse.csr_matrix(
+        (np.concatenate(data).astype(np.float32), np.concatenate(indices), np.array(indptr)),
+        shape=(n, N_FEATURES),
+    )
+
+
+def _top_k(sim, k, excluir_diagonal_offset=None):
+    """
+    Top-K por linha de uma matriz de semelhanças esparsa.
+
+    Returns:
+        tuple: (índices int32, pontuações float16) com forma (n × k)
+    """
+    sim = sim.tocsr()
+    n = sim.shape[0]
+    vizinhos = np.full((n, k), -1, dtype=np.int32)
+    scores = np.zeros((n, k), dtype=np.float16)
+
+    for i in range(n):
+        a, b = sim.indptr[i], sim.indptr[i + 1]
+        idx, val = sim.indices[a:b], sim.data[a:b]
+        mask = val > 0
+        if excluir_diagonal_offset is not None:
+            mask &= idx != i + excluir_diagonal_offset
+        idx, val = idx[mask], val[mask]
+        if idx.size > k:
+            top = np.argpartition(-val, k - 1)[:k]
+            idx, val = idx[top], val[top]
+        ordem = np.argsort(-val)
+        vizinhos[i, :ordem.size] = idx[ordem]
+        scores[i, :ordem.size] = val[ordem]
+
+    return vizinhos, scores
+
+
+class ContentIndex:
+    """
+    Índice TF-IDF incremental com os K vizinhos de cada filme.
+
+    Attributes:
+        film_ids: np.ndarray int64 (ordem de inserção)
+        counts: csr (n_filmes × N_FEATURES) com tf sublinear
+        df: np.ndarray int32 com a frequência de documentos por coluna
+        neighbours: np.ndarray int32 (n_filmes × K) com posições em film_ids
+        scores: np.ndarray float16 (n_filmes × K)
+    """
+
+    def __init__(self, film_ids, counts, df, neighbours, scores):
+        self.film_ids = film_ids
+        self.counts = counts
+        self.df = df
+        self.neighbours = neighbours
+        self.scores = scores
+        self._reindex()
+
+    def _reindex(self):
+        self._X = None
+        self._ordem = np.argsort(self.film_ids, kind='stable')
+        self._sorted_ids = self.film_ids[self._ordem]
+
+    def positions(self, filme_ids):
+        """Posições dos filmes no índice (-1 quando não indexados)."""
+        pos = index_of(self._sorted_ids, filme_ids)
+        if self._ordem.size == 0:
+            return pos
+        return np.where(pos >= 0, self._ordem[np.maximum(pos, 0)], -1)
+
+    @property
+    def k(self):
+        return self.neighbours.shape[1]
+
+    def idf(self):
+        n = self.film_ids.size
+        return (np.log((1.0 + n) / (1.0 + self.df)) + 1.0).astype(np.float32)
+
+    def tfidf(self, counts=None):
+        """Matriz TF-IDF normalizada (L2) das contagens dadas (default: todas)."""
+        counts = self.counts if counts is None else counts
+        X = (counts @ sparse.diags(self.idf())).tocsr()
+        norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sparse.diags(1.0 / norms) @ X
+
+    @classmethod
+    def empty(cls, k):
+        return cls(
+            np.empty(0, dtype=np.int64),
+            sparse.csr_matrix((0, N_FEATURES), dtype=np.float32),
+            np.zeros(N_FEATURES, dtype=np.int32),
+            np.empty((0, k), dtype=np.int32),
+            np.empty((0, k), dtype=np.float16),
+        )
+
+    def add(self, documentos, block_size=1024):
+        """
+        Acrescenta filmes ao índice de forma incremental.
+
+        Os vizinhos dos novos filmes são calculados contra todo o índice e as
+        listas dos filmes existentes só são atualizadas quando um novo filme
+        entra no seu top-K. As pontuações antigas mantêm o IDF da altura em que
+        foram calculadas (uma reconstrução completa volta a alinhá-las).
+
+        Returns:
+            int: Número de filmes acrescentados
+        """
+        conhecidos = self.positions([d[0] for d in documentos]) >= 0
+        documentos = [d for d, existe in zip(documentos, conhecidos) if not existe]
+        if not documentos:
+            return 0
+
+        novos = vectorize(documentos)
+        n_antigos = self.film_ids.size
+        k = self.k
+
+        self.film_ids = np.concatenate([
+            self.film_ids,
+            np.array([d[0] for d in documentos], dtype=np.int64),
+        ])
+        self.counts = sparse.vstack([self.counts, novos], format='csr')
+        self.df = self.df + np.bincount(novos.indices, minlength=N_FEATURES).astype(np.int32)
+        self._reindex()
+
+        X = self._X = self.tfidf()
+        XT = X.T.tocsc()
+        n_total = self.film_ids.size
+
+        self.neighbours = np.vstack([self.neighbours, np.full((n_total - n_antigos, k), -1, dtype=np.int32)])
+        self.scores = np.vstack([self.scores, np.zeros((n_total - n_antigos, k), dtype=np.float16)])
+
+        for inicio in range(n_antigos, n_total, block_size):
+            fim = min(inicio + block_size, n_total)
+            sim = X[inicio:fim] @ XT
+            viz, sc = _top_k(sim, k, excluir_diagonal_offset=inicio)
+            self.neighbours[inicio:fim] = viz
+            self.scores[inicio:fim] = sc
+
+            if n_antigos:
+                self._merge_into_old(sim[:, :n_antigos].T.tocsr(), inicio)
+
+        return len(documentos)
+
+    def _merge_into_old(self, sim_antigos, offset):
+        """Funde os novos filmes (colunas offset...) nas listas top-K antigas."""
+        k = self.k
+        for i in np.flatnonzero(np.diff(sim_antigos.indptr)):
+            a, b = sim_antigos.indptr[i], sim_antigos.indptr[i + 1]
+            idx = sim_antigos.indices[a:b] + offset
+            val = sim_antigos.data[a:b]
+
+            atuais = self.neighbours[i]
+            validos = atuais >= 0
+            cand_idx = np.concatenate([atuais[validos], idx.astype(np.int32)])
+            cand_val = np.concatenate([self.scores[i][validos].astype(np.float32), val])
+
+            ordem = np.argsort(-cand_val)[:k]
+            self.neighbours[i] = -1
+            self.scores[i] = 0
+            self.neighbours[i, :ordem.size] = cand_idx[ordem]
+            self.scores[i, :ordem.size] = cand_val[ordem]
+
+    def similar(self, filme_id, limit=10):
+        """
+        Filmes mais semelhantes a um filme indexado.
+
+        Returns:
+            list: Tuplos (filme_id, semelhança) por ordem descendente
+        """
+        pos = self.positions([filme_id])[0]
+        if pos < 0:
+            return []
+        viz = self.neighbours[pos]
+        validos = viz >= 0
+        viz, sc = viz[validos][:limit], self.scores[pos][validos][:limit]
+        return list(zip(self.film_ids[viz].tolist(), sc.astype(float).round(4).tolist()))
+
+    def similar_to_document(self, documento, limit=10):
+        """
+        Semelhança de um filme ainda não indexado contra todo o índice.
+        """
+        if self.film_ids.size == 0:
+            return []
+        if self._X is None:
+            self._X = self.tfidf()
+        q = self.tfidf(vectorize([documento]))
+        sim = np.asarray((self._X @ q.T).todense()).ravel()
+        k = min(limit, sim.size)
+        top = np.argpartition(-sim, k - 1)[:k]
+        top = top[sim[top] > 0]
+        top = top[np.argsort(-sim[top])]
+        return list(zip(self.film_ids[top].tolist(), sim[top].astype(float).round(4).tolist()))
+
+    def save(self, path):
+        """Guarda o índice num ficheiro .npz (escrita atómica)."""
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'wb') as f:
+            np.savez(
+                f,
+                film_ids=self.film_ids,
+                counts_data=self.counts.data,
+                counts_indices=self.counts.indices,
+                counts_indptr=self.counts.indptr,
+                df=self.df,
+                neighbours=self.neighbours,
+                scores=self.scores,
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """Carrega o índice a partir de um ficheiro .npz."""
+        with np.load(path) as data:
+            counts = sparse.csr_matrix(
+                (data['counts_data'], data['counts_indices'], data['counts_indptr']),
+                shape=(data['film_ids'].size, N_FEATURES),
+            )
+            return cls(data['film_ids'], counts, data['df'], data['neighbours'], data['scores'])
+
+
+def artifact_path():
+    """Caminho do ficheiro do índice de conteúdo."""
+    return settings.RECOMMENDER_ARTIFACTS_DIR / ARTIFACT_NAME
+
+
+def update_content_index(full=False, k=None):
+    """
+    Acrescenta ao índice os filmes do catálogo que ainda não estão indexados.
+
+    Args:
+        full: Reconstrói o índice de raiz (realinha o IDF de todos os filmes)
+        k: Número de vizinhos por filme (apenas em reconstruções completas)
+
+    Returns:
+        tuple: (ContentIndex, número de filmes acrescentados)
+    """
+    k = k or settings.RECOMMENDER_CONTENT_NEIGHBOURS
+    path = artifact_path()
+
+    if full or not path.exists():
+        index = ContentIndex.empty(k)
+    else:
+        index = ContentIndex.load(path)
+
+    todos = np.fromiter(Filme.objects.values_list('id', flat=True), dtype=np.int64)
+    em_falta = todos[index.positions(todos) < 0]
+    if em_falta.size == 0 and path.exists():
+        return index, 0
+
+    adicionados = index.add(load_documents(em_falta.tolist()))
+    settings.RECOMMENDER_ARTIFACTS_DIR.mkdir(parents=True, exist_ok=True)
+    index.save(path)
+    return index, adicionados
+
+
+_lock = threading.Lock()
+_cache = {'mtime': None, 'index': None}
+
+
+def get_content_index():
+    """
+    Devolve o índice de conteúdo carregado em memória (None se não existir).
+    """
+    path = artifact_path()
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+
+    with _lock:
+        if _cache['mtime'] != mtime:
+            _cache['index'] = ContentIndex.load(path)
+            _cache['mtime'] = mtime
+        return _cache['index']
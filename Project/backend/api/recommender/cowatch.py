@@ -0,0 +1,372 @@
+"""
+Grafo de coocorrência de filmes ("quem viu isto também gostou de").
+
+Requisito RF-10: Motor de Recomendação
+Requisito RNF-01: Performance e Tempo de Resposta
+
+Quando um filme passa a ser positivo para um utilizador (visto, favorito ou
+rating >= 7), a contagem de cada par (filme, outro filme positivo do mesmo
+utilizador) é incrementada num único INSERT ... ON CONFLICT; quando deixa
+de o ser, as contagens são decrementadas. Cada evento emparelha no máximo
+COWATCH_MAX_FAN_OUT filmes (os mais recentes), para que utilizadores com
+históricos muito grandes não façam explodir o número de pares.
+
+O top de cada filme é guardado em TopCoocorrencia: o do filme do evento é
+relido pelo índice (filme, -contagem) e os dos parceiros recebem apenas a
+nova contagem. Quando um par é decrementado para fora do top de um
+parceiro, o lugar vago só é preenchido no próximo evento desse filme (ou
+no comando build_cowatch).
+
+Cada evento bloqueia primeiro, por ordem de (filme, outro filme), os pares
+e os tops que vai alterar, para que eventos concorrentes com os mesmos
+filmes não entrem em deadlock.
+"""
+
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from scipy import sparse
+
+from api.models import AtividadeUsuario, CoocorrenciaFilmes, TopCoocorrencia
+
+
+# Rating a partir do qual uma avaliação conta como positiva
+RATING_POSITIVO = 7
+
+FILTRO_POSITIVO = Q(visto=True) | Q(favorito=True) | Q(rating__gte=RATING_POSITIVO)
+
+
+def is_positive(estado):
+    """
+    Indica se um estado (rating, favorito, visto, ver_mais_tarde) é positivo.
+    """
+    if estado is None:
+        return False
+    rating, favorito, visto, _ = estado
+    return bool(visto or favorito or (rating is not None and rating >= RATING_POSITIVO))
+
+
+def _partners(usuario_id, excluidos, max_fan_out):
+    """Filmes positivos mais recentes do utilizador, exceto os dos eventos."""
+    return list(
+        AtividadeUsuario.objects
+        .filter(FILTRO_POSITIVO, usuario_id=usuario_id)
+        .exclude(filme_id__in=excluidos)
+        .order_by('-updated_at')
+        .values_list('filme_id', flat=True)[:max_fan_out]
+    )
+
+
+def _symmetric(pares):
+    """
+    Parâmetros (a, b, b, a, ...) dos pares nos dois sentidos, ordenados por
+    (filme, outro filme): transações concorrentes bloqueiam as linhas pela
+    mesma ordem e não entram em deadlock.
+    """
+    params = []
+    for a, b in sorted({(a, b) for a, b in pares} | {(b, a) for a, b in pares}):
+        params.extend([a, b])
+    return params
+
+
+def _lock_rows(pares):
+    """
+    Bloqueia, por ordem, as linhas de pares e de tops que a transação vai
+    alterar (as que já existem). O UPDATE dos decrementos, o upsert dos
+    incrementos e os tops bloqueiam linhas por ordens diferentes; com este
+    bloqueio prévio, todas as transações os obtêm pela mesma ordem.
+    """
+    tabela = connection.ops.quote_name(CoocorrenciaFilmes._meta.db_table)
+    params = _symmetric(pares)
+    valores = ', '.join(['(%s::bigint, %s::bigint)'] * (len(params) // 2))
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT 1 FROM {tabela}
+            WHERE (filme_id, outro_filme_id) IN (VALUES {valores})
+            ORDER BY filme_id, outro_filme_id
+            FOR UPDATE
+            """,
+            params,
+        )
+    list(
+        TopCoocorrencia.objects
+        .select_for_update()
+        .filter(filme_id__in=sorted({f for par in pares for f in par}))
+        .order_by('filme_id')
+        .values_list('filme_id', flat=True)
+    )
+
+
+def _increment_pairs(pares):
+    """
+    Incrementa os pares nos dois sentidos num único upsert.
+
+    Returns:
+        dict: {(filme, outro filme): nova contagem}
+    """
+    tabela = connection.ops.quote_name(CoocorrenciaFilmes._meta.db_table)
+    params = _symmetric(pares)
+    valores = ', '.join(['(%s, %s, 1)'] * (len(params) // 2))
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {tabela} (filme_id, outro_filme_id, contagem)
+            VALUES {valores}
+            ON CONFLICT (filme_id, outro_filme_id)
+            DO UPDATE SET contagem = {tabela}.contagem + EXCLUDED.contagem
+            RETURNING filme_id, outro_filme_id, contagem
+            """,
+            params,
+        )
+        linhas = cursor.fetchall()
+
+    return {(a, b): contagem for a, b, contagem in linhas}
+
+
+def _decrement_pairs(pares):
+    """
+    Decrementa os pares existentes nos dois sentidos e remove os que chegam a 0.
+
+    Returns:
+        dict: {(filme, outro filme): nova contagem}
+    """
+    tabela = connection.ops.quote_name(CoocorrenciaFilmes._meta.db_table)
+    params = _symmetric(pares)
+    valores = ', '.join(['(%s::bigint, %s::bigint)'] * (len(params) // 2))
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {tabela} SET contagem = contagem - 1
+            WHERE contagem > 0 AND (filme_id, outro_filme_id) IN (VALUES {valores})
+            RETURNING filme_id, outro_filme_id, contagem
+            """,
+            params,
+        )
+        linhas = cursor.fetchall()
+        cursor.execute(
+            f"""
+            DELETE FROM {tabela}
+            WHERE contagem <= 0 AND (filme_id, outro_filme_id) IN (VALUES {valores})
+            """,
+            params,
+        )
+
+    return {(a, b): contagem for a, b, contagem in linhas}
+
+
+def _ranked(contagens, top_n):
+    ordenados = sorted(contagens.items(), key=lambda par: (-par[1], par[0]))[:top_n]
+    return [f for f, _ in ordenados], [c for _, c in ordenados]
+
+
+def refresh_top(filme_id, top_n):
+    """Relê o top de um filme pelo índice (filme, -contagem)."""
+    linhas = list(
+        CoocorrenciaFilmes.objects
+        .filter(filme_id=filme_id, contagem__gt=0)
+        .order_by('-contagem', 'outro_filme_id')
+        .values_list('outro_filme_id', 'contagem')[:top_n]
+    )
+    if not linhas:
+        TopCoocorrencia.objects.filter(filme_id=filme_id).delete()
+        return
+
+    TopCoocorrencia.objects.update_or_create(
+        filme_id=filme_id,
+        defaults={
+            'filme_ids': [f for f, _ in linhas],
+            'contagens': [c for _, c in linhas],
+        },
+    )
+
+
+def _merge_partner_tops(novas_contagens, top_n):
+    """
+    Atualiza o top de cada filme com as novas contagens dos seus pares
+    (um SELECT ... FOR UPDATE e um bulk_update/bulk_create).
+
+    Args:
+        novas_contagens: Dict {(filme, outro filme): nova contagem}
+    """
+    por_filme = {}
+    for (filme_id, outro_filme_id), contagem in novas_contagens.items():
+        por_filme.setdefault(filme_id, {})[outro_filme_id] = contagem
+    if not por_filme:
+        return
+
+    tops = {
+        top.filme_id: top
+        for top in (
+            TopCoocorrencia.objects
+            .select_for_update()
+            .filter(filme_id__in=list(por_filme))
+            .order_by('filme_id')
+        )
+    }
+
+    agora = timezone.now()
+    alterados, novos = [], []
+    for filme_id, pares in por_filme.items():
+        top = tops.get(filme_id)
+        contagens = dict(zip(top.filme_ids, top.contagens)) if top else {}
+
+        mudou = False
+        for outro_filme_id, contagem in pares.items():
+            if contagem > 0:
+                contagens[outro_filme_id] = contagem
+                mudou = True
+            elif outro_filme_id in contagens:
+                del contagens[outro_filme_id]
+                mudou = True
+        if not mudou:
+            continue
+
+        filme_ids, valores = _ranked(contagens, top_n)
+        if top is None:
+            novos.append(TopCoocorrencia(
+                filme_id=filme_id, filme_ids=filme_ids, contagens=valores, atualizado_em=agora
+            ))
+        elif filme_ids != top.filme_ids or valores != top.contagens:
+            top.filme_ids, top.contagens, top.atualizado_em = filme_ids, valores, agora
+            alterados.append(top)
+
+    if alterados:
+        TopCoocorrencia.objects.bulk_update(alterados, ['filme_ids', 'contagens', 'atualizado_em'])
+    if novos:
+        TopCoocorrencia.objects.bulk_create(novos, ignore_conflicts=True)
+
+
+def update_cowatch(usuario_id, filme_id, antes, depois):
+    """
+    Aplica ao grafo uma alteração de AtividadeUsuario.
+
+    Args:
+        antes / depois: Estados (rating, favorito, visto, ver_mais_tarde) ou None
+    """
+    update_cowatch_many(usuario_id, [(filme_id, antes, depois)])
+
+
+def update_cowatch_many(usuario_id, mudancas):
+    """
+    Aplica ao grafo várias alterações de AtividadeUsuario do mesmo utilizador.
+
+    O resultado é o mesmo de aplicar as alterações uma a uma: cada filme que
+    deixa de ser positivo é decrementado contra os positivos que se mantêm e
+    as perdas seguintes; cada filme que passa a positivo é incrementado
+    contra os que se mantêm e os ganhos anteriores. Todos os pares vão num
+    único upsert (e num único UPDATE para os decrementos).
+
+    Args:
+        mudancas: Tuplos (filme_id, antes, depois) como em update_cowatch
+    """
+    ganhos, perdas = [], []
+    for filme_id, antes, depois in mudancas:
+        positivo_antes, positivo_depois = is_positive(antes), is_positive(depois)
+        if positivo_antes != positivo_depois:
+            (ganhos if positivo_depois else perdas).append(filme_id)
+    if not ganhos and not perdas:
+        return
+
+    base = _partners(usuario_id, ganhos + perdas, settings.COWATCH_MAX_FAN_OUT)
+    incrementos = [(g, p) for i, g in enumerate(ganhos) for p in base + ganhos[:i]]
+    decrementos = [(d, p) for i, d in enumerate(perdas) for p in base + perdas[i + 1:]]
+    if not incrementos and not decrementos:
+        return
+
+    with transaction.atomic():
+        _lock_rows(decrementos + incrementos)
+        novas_contagens = {}
+        if decrementos:
+            novas_contagens.update(_decrement_pairs(decrementos))
+        if incrementos:
+            novas_contagens.update(_increment_pairs(incrementos))
+
+        eventos = set(ganhos + perdas)
+        _merge_partner_tops(
+            {par: c for par, c in novas_contagens.items() if par[0] not in eventos},
+            settings.COWATCH_TOP_N,
+        )
+        for filme_id in sorted(eventos):
+            refresh_top(filme_id, settings.COWATCH_TOP_N)
+
+
+def rebuild_cowatch(max_fan_out=None, top_n=None, batch_size=5000):
+    """
+    Reconstrói o grafo completo a partir de AtividadeUsuario (C = XᵀX).
+
+    Cada utilizador contribui com os seus max_fan_out filmes positivos mais
+    recentes. Usado para a carga inicial; o dia a dia é incremental.
+
+    Returns:
+        tuple: (número de pares guardados, número de filmes com top)
+    """
+    max_fan_out = max_fan_out or settings.COWATCH_MAX_FAN_OUT
+    top_n = top_n or settings.COWATCH_TOP_N
+
+    # Lidas em blocos para arrays NumPy, sem materializar os tuplos todos
+    linhas = (
+        AtividadeUsuario.objects
+        .filter(FILTRO_POSITIVO)
+        .order_by('usuario_id', '-updated_at')
+        .values_list('usuario_id', 'filme_id')
+        .iterator(chunk_size=batch_size)
+    )
+    blocos = [np.empty((0, 2), dtype=np.int64)]
+    while bloco := list(islice(linhas, batch_size)):
+        blocos.append(np.array(bloco, dtype=np.int64))
+    usuarios, filmes = np.concatenate(blocos).T
+
+    # Mantém os max_fan_out filmes mais recentes de cada utilizador
+    inicio_usuario = np.r_[0, np.flatnonzero(np.diff(usuarios)) + 1]
+    tamanhos = np.diff(np.r_[inicio_usuario, usuarios.size])
+    posicao = np.arange(usuarios.size) - np.repeat(inicio_usuario, tamanhos)
+    manter = posicao < max_fan_out
+    usuarios, filmes = usuarios[manter], filmes[manter]
+
+    _, linhas_x = np.unique(usuarios, return_inverse=True)
+    filme_ids, colunas_x = np.unique(filmes, return_inverse=True)
+    X = sparse.csr_matrix(
+        (np.ones(usuarios.size, dtype=np.int32), (linhas_x, colunas_x)),
+        shape=(linhas_x.max() + 1 if usuarios.size else 0, filme_ids.size),
+    )
+    C = (X.T @ X).tocsr()
+    C.setdiag(0)
+    C.eliminate_zeros()
+
+    with transaction.atomic():
+        CoocorrenciaFilmes.objects.all().delete()
+        TopCoocorrencia.objects.all().delete()
+
+        pares, tops = [], []
+        for i in range(C.shape[0]):
+            a, b = C.indptr[i], C.indptr[i + 1]
+            if a == b:
+                continue
+            filme_id = int(filme_ids[i])
+            outros, contagens = filme_ids[C.indices[a:b]], C.data[a:b]
+            pares.extend(
+                CoocorrenciaFilmes(filme_id=filme_id, outro_filme_id=o, contagem=c)
+                for o, c in zip(outros.tolist(), contagens.tolist())
+            )
+            ordem = np.lexsort((outros, -contagens))[:top_n]
+            tops.append(TopCoocorrencia(
+                filme_id=filme_id,
+                filme_ids=outros[ordem].tolist(),
+                contagens=contagens[ordem].tolist(),
+            ))
+            if len(pares) >= batch_size:
+                CoocorrenciaFilmes.objects.bulk_create(pares, batch_size=batch_size)
+                pares = []
+
+        CoocorrenciaFilmes.objects.bulk_create(pares, batch_size=batch_size)
+        TopCoocorrencia.objects.bulk_create(tops, batch_size=batch_size)
+
+    return int(C.nnz), len(tops)
@@ -0,0 +1,128 @@
+"""
+Ponto de entrada do motor de recomendações usado pelas views.
+
+Requisito RF-10: Motor de Recomendação
+
+Percorre os motores de RECOMMENDER_ENGINES por ordem e usa o primeiro
+modelo offline disponível que consiga pontuar o utilizador; quando nenhum
+consegue, recorre ao perfil de gosto (afinidade por género/década) ou aos
+filmes populares.
+"""
+
+from django.conf import settings
+
+from api.models import AtividadeUsuario, PerfilGosto
+
+from .als import COLUNAS_HISTORICO, als_history, get_als_model
+from .interactions import history_weights
+from .item_cf import get_item_neighbours
+from .sampler import get_candidate_pools
+from .taste import rebuild_profile, taste_recommendations
+
+
+def load_user_history(usuario_id):
+    """
+    Lê o histórico do utilizador numa única query (sem instanciar modelos).
+
+    Returns:
+        list: Tuplos com as COLUNAS_HISTORICO
+    """
+    return list(
+        AtividadeUsuario.objects
+        .filter(usuario_id=usuario_id)
+        .order_by()
+        .values_list(*COLUNAS_HISTORICO)
+    )
+
+
+def recommend(usuario_id, limit=20, atividades=None):
+    """
+    Gera recomendações personalizadas a partir dos modelos offline.
+
+    Args:
+        usuario_id: ID do utilizador
+        limit: Número máximo de filmes
+        atividades: Tuplos com as COLUNAS_HISTORICO já lidos; lidos da BD
+            quando omitidos
+
+    Returns:
+        tuple: (lista de filme_ids, nome do motor) ou ([], None)
+    """
+    for motor in settings.RECOMMENDER_ENGINES:
+        if motor == 'als':
+            modelo = get_als_model()
+        elif motor == 'item_cf':
+            modelo = get_item_neighbours()
+        else:
+            continue
+
+        if modelo is None:
+            continue
+
+        if atividades is None:
+            atividades = load_user_history(usuario_id)
+        if not atividades:
+            return [], None
+
+        if motor == 'als':
+            # Mesma preferência e confiança do treino (fold-in)
+            recomendados = modelo.recommend(usuario_id, als_history(atividades), limit=limit)
+        else:
+            filme_ids, pesos = history_weights(atividades)
+            recomendados = modelo.recommend(filme_ids, pesos, limit=limit)
+
+        if recomendados:
+            return recomendados, motor
+
+    return [], None
+
+
+# Rating a partir do qual uma avaliação conta como positiva (R05)
+RATING_POSITIVO = 7.5
+
+
+def popular_recommendations(exclude_ids=(), limit=20):
+    """
+    Amostra ponderada dos filmes populares (melhor rating TMDB).
+
+    Returns:
+        list: IDs dos filmes
+    """
+    return get_candidate_pools().sample(exclude_ids=list(exclude_ids), limit=limit)
+
+
+def compute_recommendations(usuario_id, limit=20, atividades=None, perfil=None):
+    """
+    Calcula a lista de recomendações de um utilizador.
+
+    Ordem: motores offline -> perfil de gosto -> populares.
+
+    Args:
+        usuario_id: ID do utilizador
+        limit: Número máximo de filmes
+        atividades: Tuplos com as COLUNAS_HISTORICO já lidos (geração em
+            lote); lidos numa única query quando omitidos
+        perfil: PerfilGosto já lido; lido (ou construído) quando omitido
+
+    Returns:
+        tuple: (lista de filme_ids, motor, número de avaliações positivas)
+    """
+    if atividades is None:
+        atividades = load_user_history(usuario_id)
+    historico_ids = [linha[0] for linha in atividades]
+    num_positivas = sum(1 for linha in atividades if linha[1] is not None and linha[1] > RATING_POSITIVO)
+
+    recomendados, motor = recommend(usuario_id, limit=limit, atividades=atividades)
+    if recomendados:
+        return recomendados, motor, num_positivas
+
+    if historico_ids:
+        if perfil is None:
+            perfil = PerfilGosto.objects.filter(usuario_id=usuario_id).first()
+        if perfil is None:
+            perfil = rebuild_profile(usuario_id)
+        recomendados = taste_recommendations(perfil, exclude_ids=historico_ids, limit=limit)
+        if recomendados:
+            return recomendados, 'genres', num_positivas
+
+    return popular_recommendations(historico_ids, limit=limit), 'popular', num_positivas
@@ -0,0 +1,387 @@
+"""
+Avaliação offline do motor de recomendações e medição de latência.
+
+Requisito RF-10: Motor de Recomendação
+Requisito RNF-01: Performance e Tempo de Resposta
+
+Fluxo (comando evaluate_recommender):
+
+1. Dados: AtividadeUsuario da base de dados ou um conjunto sintético sobre
+   o catálogo atual (utilizadores com 2 géneros preferidos).
+2. Divisão temporal: as interações anteriores ao quantil (1 - test_fraction)
+   dos timestamps são treino; as posteriores com rating >= 7 ou favorito
+   são os filmes relevantes de cada utilizador.
+3. Cada variante (als, item_cf, genres, popular e pipeline, que encadeia
+   as anteriores como compute_recommendations) é treinada só com o treino
+   e avaliada com precision@K, recall@K, NDCG@K e cobertura do catálogo,
+   medindo também a latência (p50/p95/p99) e as queries de cada chamada.
+4. Opcionalmente mede o caminho real (compute_recommendations e a view
+   get_movie_recommendations) para uma amostra de utilizadores.
+
+O resultado é um dicionário serializável em JSON, comparável entre commits.
+"""
+
+import math
+import subprocess
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.models import AtividadeUsuario, PerfilGosto
+
+from .als import ALSModel, als_history, als_matrices_from_rows, train_als
+from .catalogue import get_catalogue
+from .interactions import InteractionMatrix, history_weights
+from .item_cf import ItemNeighbours
+from .sampler import get_candidate_pools
+from .taste import profile_from_history, taste_recommendations
+
+
+# Linhas do conjunto de dados:
+# (usuario_id, filme_id, rating, favorito, visto, ver_mais_tarde, timestamp)
+COLUNAS_DATASET = ('usuario_id', 'filme_id', 'rating', 'favorito', 'visto', 'ver_mais_tarde', 'updated_at')
+
+RATING_RELEVANTE = 7
+
+VARIANTES = ('als', 'item_cf', 'genres', 'popular', 'pipeline')
+
+# IDs dos utilizadores sintéticos (fora do intervalo dos utilizadores reais)
+BASE_USUARIO_SINTETICO = 10 ** 12
+
+
+# ============================================================================
+# Conjuntos de dados
+# ============================================================================
+
+def load_dataset():
+    """Lê AtividadeUsuario com o timestamp em segundos (epoch)."""
+    return [
+        (*linha[:-1], linha[-1].timestamp())
+        for linha in (
+            AtividadeUsuario.objects
+            .order_by()
+            .values_list(*COLUNAS_DATASET)
+            .iterator(chunk_size=10000)
+        )
+    ]
+
+
+def synthetic_dataset(catalogue, num_users=500, interactions=30, seed=42, dias=90):
+    """
+    Gera interações sintéticas sobre o catálogo.
+
+    Cada utilizador tem dois géneros preferidos: 80% das interações são
+    com filmes desses géneros (ratings altos), as restantes com filmes ao
+    acaso (ratings baixos).
+
+    Raises:
+        ValueError: O catálogo não tem filmes
+    """
+    n_filmes = catalogue.film_ids.size
+    if n_filmes == 0:
+        raise ValueError("O catálogo está vazio: não é possível gerar interações sintéticas")
+
+    rng = np.random.default_rng(seed)
+    por_genero = catalogue.genre_matrix.tocsc()
+    n_generos = por_genero.shape[1]
+    agora = time.time()
+
+    linhas = []
+    for u in range(num_users):
+        usuario_id = BASE_USUARIO_SINTETICO + u
+        preferidos = rng.choice(n_generos, size=min(2, n_generos), replace=False) if n_generos else []
+        candidatos = np.unique(np.concatenate(
+            [por_genero.indices[por_genero.indptr[g]:por_genero.indptr[g + 1]] for g in preferidos]
+            or [np.empty(0, dtype=np.int32)]
+        ))
+
+        escolhidos = {}
+        for _ in range(interactions):
+            gosta = candidatos.size > 0 and rng.random() < 0.8
+            pos = int(rng.choice(candidatos)) if gosta else int(rng.integers(n_filmes))
+            media = 8.5 if gosta else 4.0
+            rating = int(np.clip(round(rng.normal(media, 1.5)), 1, 10))
+            escolhidos[pos] = rating
+
+        for pos, rating in escolhidos.items():
+            linhas.append((
+                usuario_id,
+                int(catalogue.film_ids[pos]),
+                rating,
+                bool(rating >= 9 and rng.random() < 0.5),
+                bool(rng.random() < 0.7),
+                False,
+                agora - rng.random() * dias * 86400,
+            ))
+    return linhas
+
+
+def time_split(linhas, test_fraction=0.2):
+    """
+    Divide as interações por um instante de corte global.
+
+    Returns:
+        tuple: (treino, teste, instante de corte)
+    """
+    if not linhas:
+        return [], [], None
+    corte = float(np.quantile([linha[6] for linha in linhas], 1.0 - test_fraction))
+    treino = [linha for linha in linhas if linha[6] < corte]
+    teste = [linha for linha in linhas if linha[6] >= corte]
+    return treino, teste, corte
+
+
+# ============================================================================
+# Métricas
+# ============================================================================
+
+def precision_at_k(recomendados, relevantes, k):
+    return sum(1 for f in recomendados[:k] if f in relevantes) / k
+
+
+def recall_at_k(recomendados, relevantes, k):
+    return sum(1 for f in recomendados[:k] if f in relevantes) / len(relevantes)
+
+
+def ndcg_at_k(recomendados, relevantes, k):
+    dcg = sum(1.0 / math.log2(i + 2) for i, f in enumerate(recomendados[:k]) if f in relevantes)
+    idcg = sum(1.0 / math.log2(i + 2) for i in range(min(k, len(relevantes))))
+    return dcg / idcg
+
+
+def latency_summary(segundos):
+    """p50/p95/p99/média em milissegundos."""
+    if not segundos:
+        return {'p50': None, 'p95': None, 'p99': None, 'mean': None}
+    ms = np.asarray(segundos) * 1000.0
+    return {
+        'p50': round(float(np.percentile(ms, 50)), 3),
+        'p95': round(float(np.percentile(ms, 95)), 3),
+        'p99': round(float(np.percentile(ms, 99)), 3),
+        'mean': round(float(ms.mean()), 3),
+    }
+
+
+def _measure(funcao, *args, **kwargs):
+    """Executa uma chamada medindo o tempo e o número de queries."""
+    with CaptureQueriesContext(connection) as queries:
+        inicio = time.perf_counter()
+        resultado = funcao(*args, **kwargs)
+        decorrido = time.perf_counter() - inicio
+    return resultado, decorrido, len(queries.captured_queries)
+
+
+# ============================================================================
+# Variantes
+# ============================================================================
+
+def build_variants(treino, catalogue, als_params=None, item_cf_k=None, seed=42):
+    """
+    Treina cada variante apenas com as interações de treino.
+
+    Returns:
+        dict: {nome: função(usuario_id, filme_ids, pesos, limit) -> lista de IDs}
+    """
+    als_params = {'factors': 32, 'iterations': 10, 'regularization': 0.1, 'alpha': 20.0, **(als_params or {})}
+
+    interacoes = InteractionMatrix.from_rows([linha[:5] for linha in treino])
+    vizinhos = ItemNeighbours.build(interacoes, k=item_cf_k or settings.RECOMMENDER_ITEM_CF_NEIGHBOURS)
+
+    pref, conf, user_ids, item_ids = als_matrices_from_rows([linha[:6] for linha in treino])
+    user_factors, item_factors = train_als(pref, conf, seed=seed, **als_params)
+    als = ALSModel(
+        'avaliacao', user_factors, item_factors, user_ids, item_ids,
+        regularization=als_params['regularization'], alpha=als_params['alpha'],
+    )
+    historicos_als = {}
+    for linha in treino:
+        historicos_als.setdefault(linha[0], []).append(linha[1:6])
+    historicos_als = {u: als_history(linhas) for u, linhas in historicos_als.items()}
+
+    pools = get_candidate_pools()
+    rng = np.random.default_rng(seed)
+
+    def genres(usuario_id, filme_ids, pesos, limit):
+        perfil = PerfilGosto(**profile_from_history(filme_ids, pesos, catalogue))
+        return taste_recommendations(perfil, exclude_ids=filme_ids, limit=limit)
+
+    def popular(usuario_id, filme_ids, pesos, limit):
+        return pools.sample(exclude_ids=filme_ids, limit=limit, rng=rng)
+
+    variantes = {
+        'als': lambda u, ids, pesos, limit: als.recommend(u, historicos_als[u], limit=limit),
+        'item_cf': lambda u, ids, pesos, limit: vizinhos.recommend(ids, pesos, limit=limit),
+        'genres': genres,
+        'popular': popular,
+    }
+
+    def pipeline(usuario_id, filme_ids, pesos, limit):
+        for nome in [*settings.RECOMMENDER_ENGINES, 'genres', 'popular']:
+            if nome in variantes:
+                recomendados = variantes[nome](usuario_id, filme_ids, pesos, limit)
+                if recomendados:
+                    return recomendados
+        return []
+
+    variantes['pipeline'] = pipeline
+    return variantes
+
+
+def evaluate(variantes, treino, teste, catalogue, k=10, max_users=None):
+    """
+    Avalia cada variante sobre os utilizadores com filmes relevantes no teste.
+
+    Returns:
+        dict: {nome: métricas}
+    """
+    historicos = {}
+    for linha in treino:
+        historicos.setdefault(linha[0], []).append(linha[1:5])
+
+    relevantes = {}
+    for linha in teste:
+        if (linha[2] is not None and linha[2] >= RATING_RELEVANTE) or linha[3]:
+            relevantes.setdefault(linha[0], set()).add(linha[1])
+
+    usuarios = sorted(u for u in relevantes if u in historicos)
+    if max_users:
+        usuarios = usuarios[:max_users]
+
+    entradas = {}
+    for u in usuarios:
+        filme_ids, pesos = history_weights(historicos[u])
+        restantes = relevantes[u] - set(filme_ids.tolist())
+        if restantes:
+            entradas[u] = (filme_ids, pesos, restantes)
+
+    resultados = {}
+    for nome, funcao in variantes.items():
+        precisoes, recalls, ndcgs, tempos, queries = [], [], [], [], []
+        recomendados_total = set()
+        for u, (filme_ids, pesos, relevantes_u) in entradas.items():
+            recomendados, decorrido, num_queries = _measure(funcao, u, filme_ids, pesos, k)
+            recomendados_total.update(recomendados)
+            precisoes.append(precision_at_k(recomendados, relevantes_u, k))
+            recalls.append(recall_at_k(recomendados, relevantes_u, k))
+            ndcgs.append(ndcg_at_k(recomendados, relevantes_u, k))
+            tempos.append(decorrido)
+            queries.append(num_queries)
+
+        resultados[nome] = {
+            'users': len(entradas),
+            f'precision@{k}': round(float(np.mean(precisoes)), 5) if precisoes else None,
+            f'recall@{k}': round(float(np.mean(recalls)), 5) if recalls else None,
+            f'ndcg@{k}': round(float(np.mean(ndcgs)), 5) if ndcgs else None,
+            'coverage': round(len(recomendados_total) / max(1, catalogue.film_ids.size), 5),
+            'latency_ms': latency_summary(tempos),
+            'queries_per_call': {
+                'mean': round(float(np.mean(queries)), 3) if queries else None,
+                'max': int(max(queries)) if queries else None,
+            },
+        }
+    return resultados
+
+
+def measure_live(usuario_ids, k=20):
+    """
+    Latência e queries do caminho real: compute_recommendations (sem cache)
+    e a view get_movie_recommendations (com a cache por utilizador).
+    """
+    from rest_framework.test import APIRequestFactory, force_authenticate
+
+    from api.models import Usuario
+    from api.views import get_movie_recommendations
+
+    from .engine import compute_recommendations
+
+    factory = APIRequestFactory()
+    usuarios = Usuario.objects.in_bulk(usuario_ids)
+
+    def endpoint(usuario):
+        request = factory.get('/api/movies/recommendations/')
+        force_authenticate(request, user=usuario)
+        return get_movie_recommendations(request)
+
+    medicoes = {'compute_recommendations': ([], []), 'get_movie_recommendations': ([], [])}
+    for usuario in usuarios.values():
+        _, decorrido, num_queries = _measure(compute_recommendations, usuario.id, limit=k)
+        medicoes['compute_recommendations'][0].append(decorrido)
+        medicoes['compute_recommendations'][1].append(num_queries)
+
+        _, decorrido, num_queries = _measure(endpoint, usuario)
+        medicoes['get_movie_recommendations'][0].append(decorrido)
+        medicoes['get_movie_recommendations'][1].append(num_queries)
+
+    return {
+        nome: {
+            'calls': len(tempos),
+            'latency_ms': latency_summary(tempos),
+            'queries_per_call': {
+                'mean': round(float(np.mean(queries)), 3) if queries else None,
+                'max': int(max(queries)) if queries else None,
+            },
+        }
+        for nome, (tempos, queries) in medicoes.items()
+    }
+
+
+def current_commit():
+    """Commit atual do repositório (None fora de um repositório git)."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_evaluation(source='db', k=10, test_fraction=0.2, synthetic_users=500,
+                   synthetic_interactions=30, max_users=None, live_users=0,
+                   variants=VARIANTES, seed=42):
+    """
+    Executa a avaliação completa e devolve o relatório.
+
+    Returns:
+        dict: Relatório serializável em JSON
+    """
+    catalogue = get_catalogue()
+    if source == 'synthetic':
+        linhas = synthetic_dataset(
+            catalogue, num_users=synthetic_users, interactions=synthetic_interactions, seed=seed
+        )
+    else:
+        linhas = load_dataset()
+
+    treino, teste, corte = time_split(linhas, test_fraction)
+
+    inicio = time.perf_counter()
+    todas = build_variants(treino, catalogue, seed=seed)
+    tempo_treino = time.perf_counter() - inicio
+    escolhidas = {nome: todas[nome] for nome in variants if nome in todas}
+
+    relatorio = {
+        'generated_at': timezone.now().isoformat(),
+        'commit': current_commit(),
+        'k': k,
+        'dataset': {
+            'source': source,
+            'interactions': len(linhas),
+            'train': len(treino),
+            'test': len(teste),
+            'cutoff': corte,
+            'catalogue_size': int(catalogue.film_ids.size),
+        },
+        'training_seconds': round(tempo_treino, 3),
+        'variants': evaluate(escolhidas, treino, teste, catalogue, k=k, max_users=max_users),
+    }
+
+    if live_users and source == 'db':
+        usuario_ids = sorted({linha[0] for linha in linhas})[:live_users]
+        relatorio['live'] = measure_live(usuario_ids, k=k)
+
+    return relatorio
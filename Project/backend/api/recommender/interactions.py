@@ -0,0 +1,170 @@
+"""
+Matriz esparsa de interações utilizador × filme.
+
+Requisito RF-10: Motor de Recomendação
+
+Converte as linhas de AtividadeUsuario (rating, favorito, visto) num peso
+por par (utilizador, filme) e guarda-as numa matriz CSR do SciPy, com os
+IDs de utilizadores e filmes ordenados para permitir lookups com
+np.searchsorted.
+"""
+
+import numpy as np
+from scipy import sparse
+
+from api.models import AtividadeUsuario
+
+
+# Pesos de cada tipo de interação
+PESO_FAVORITO = 1.0
+PESO_VISTO = 0.3
+
+# Colunas lidas de AtividadeUsuario (ordem usada em from_rows)
+COLUNAS_ATIVIDADE = ('usuario_id', 'filme_id', 'rating', 'favorito', 'visto')
+
+
+def interaction_weights(ratings, favoritos, vistos):
+    """
+    Calcula o peso de várias interações de forma vetorizada.
+
+    O rating é centrado em 5 e normalizado para [-1, 1], de modo que
+    avaliações baixas contam como sinal negativo; favorito e visto somam
+    pesos positivos fixos.
+
+    Args:
+        ratings: Array float com os ratings (NaN quando não avaliado)
+        favoritos: Array bool com a flag favorito
+        vistos: Array bool com a flag visto
+
+    Returns:
+        np.ndarray: Pesos float32, um por interação
+    """
+    ratings = np.asarray(ratings, dtype=np.float32)
+    pesos = np.where(np.isnan(ratings), 0.0, (ratings - 5.0) / 5.0)
+    pesos = pesos + PESO_FAVORITO * np.asarray(favoritos, dtype=np.float32)
+    pesos = pesos + PESO_VISTO * np.asarray(vistos, dtype=np.float32)
+    return pesos.astype(np.float32)
+
+
+def interaction_weight(rating, favorito, visto):
+    """
+    Peso de uma única interação (ver interaction_weights).
+
+    Returns:
+        float: Peso da interação (0.0 quando não há sinal)
+    """
+    return float(interaction_weights(
+        [np.nan if rating is None else rating], [favorito], [visto]
+    )[0])
+
+
+def _columns(rows, rating_pos):
+    """Transpõe linhas de tuplos em arrays NumPy (rating None passa a NaN)."""
+    rows = list(rows)
+    if not rows:
+        return None
+    colunas = list(zip(*rows))
+    return [
+        np.array([np.nan if v is None else v for v in coluna], dtype=np.float64)
+        if i == rating_pos else np.array(coluna)
+        for i, coluna in enumerate(colunas)
+    ]
+
+
+def history_weights(rows):
+    """
+    Converte o histórico de um utilizador em (filme_ids, pesos).
+
+    Args:
+        rows: Iterável de tuplos (filme_id, rating, favorito, visto, ...);
+            as colunas seguintes (ex.: ver_mais_tarde) são ignoradas
+
+    Returns:
+        tuple: (np.ndarray int64 de filme_ids, np.ndarray float32 de pesos)
+    """
+    colunas = _columns(rows, rating_pos=1)
+    if colunas is None:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    filme_ids, ratings, favoritos, vistos = colunas[:4]
+    return filme_ids.astype(np.int64), interaction_weights(ratings, favoritos, vistos)
+
+
+class InteractionMatrix:
+    """
+    Matriz utilizador × filme com os respetivos índices de IDs.
+
+    Attributes:
+        matrix: scipy.sparse.csr_matrix float32 (n_utilizadores × n_filmes)
+        user_ids: np.ndarray int64 ordenado com o ID de cada linha
+        item_ids: np.ndarray int64 ordenado com o ID de cada coluna
+    """
+
+    def __init__(self, matrix, user_ids, item_ids):
+        self.matrix = matrix
+        self.user_ids = user_ids
+        self.item_ids = item_ids
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Constrói a matriz a partir de tuplos com as COLUNAS_ATIVIDADE.
+
+        Interações com peso zero (ex.: apenas 'ver mais tarde') são ignoradas.
+        """
+        colunas = _columns(rows, rating_pos=2)
+        if colunas is None:
+            vazio = np.empty(0, dtype=np.int64)
+            return cls(sparse.csr_matrix((0, 0), dtype=np.float32), vazio, vazio)
+
+        usuario_ids, filme_ids, ratings, favoritos, vistos = colunas
+        pesos = interaction_weights(ratings, favoritos, vistos)
+        mask = pesos != 0
+
+        user_ids, linhas = np.unique(usuario_ids[mask].astype(np.int64), return_inverse=True)
+        item_ids, colunas_idx = np.unique(filme_ids[mask].astype(np.int64), return_inverse=True)
+
+        matrix = sparse.csr_matrix(
+            (pesos[mask], (linhas, colunas_idx)),
+            shape=(len(user_ids), len(item_ids)),
+            dtype=np.float32,
+        )
+        return cls(matrix, user_ids, item_ids)
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+
+def index_of(sorted_ids, ids):
+    """
+    Mapeia IDs para posições num array ordenado (-1 quando não existe).
+
+    Args:
+        sorted_ids: np.ndarray ordenado de IDs conhecidos
+        ids: Array de IDs a procurar
+
+    Returns:
+        np.ndarray int64 com as posições
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    if sorted_ids.size == 0 or ids.size == 0:
+        return np.full(ids.shape, -1, dtype=np.int64)
+    pos = np.searchsorted(sorted_ids, ids)
+    pos = np.minimum(pos, sorted_ids.size - 1)
+    return np.where(sorted_ids[pos] == ids, pos, -1)
+
+
+def build_interaction_matrix(queryset=None):
+    """
+    Lê AtividadeUsuario (sem instanciar modelos) e devolve a InteractionMatrix.
+
+    Args:
+        queryset: QuerySet de AtividadeUsuario opcional (default: todas)
+
+    Returns:
+        InteractionMatrix
+    """
+    if queryset is None:
+        queryset = AtividadeUsuario.objects.all()
+    rows = queryset.order_by().values_list(*COLUNAS_ATIVIDADE).iterator(chunk_size=10000)
+    return InteractionMatrix.from_rows(rows)
@@ -0,0 +1,183 @@
+"""
+Filtragem colaborativa item-item (cosseno) para recomendações.
+
+Requisito RF-10: Motor de Recomendação
+Requisito RNF-01: Performance e Tempo de Resposta
+
+Offline (comando build_item_cf) calculam-se os K vizinhos mais semelhantes
+de cada filme e guardam-se num .npz compacto (int32 + float16). Online, a
+pontuação de um utilizador é uma soma vetorizada das linhas de vizinhos dos
+filmes do seu histórico, sem qualquer produto de matrizes.
+"""
+
+import os
+import threading
+
+import numpy as np
+from django.conf import settings
+from scipy import sparse
+
+from .interactions import index_of
+
+
+ARTIFACT_NAME = 'item_cf.npz'
+
+
+class ItemNeighbours:
+    """
+    Tabela de vizinhos top-K por filme.
+
+    Attributes:
+        item_ids: np.ndarray int64 ordenado com os IDs dos filmes
+        neighbours: np.ndarray int32 (n_filmes × K) com índices em item_ids
+            (-1 quando o filme tem menos de K vizinhos)
+        scores: np.ndarray float16 (n_filmes × K) com a semelhança cosseno
+    """
+
+    def __init__(self, item_ids, neighbours, scores):
+        self.item_ids = item_ids
+        self.neighbours = neighbours
+        self.scores = scores
+
+    @classmethod
+    def build(cls, interactions, k=50, block_size=1024):
+        """
+        Calcula os K vizinhos de cada filme por semelhança cosseno.
+
+        A matriz item × item é calculada por blocos de colunas para limitar a
+        memória usada; só semelhanças positivas são guardadas.
+
+        Args:
+            interactions: InteractionMatrix utilizador × filme
+            k: Número de vizinhos a guardar por filme
+            block_size: Número de filmes processados por bloco
+
+        Returns:
+            ItemNeighbours
+        """
+        n_items = interactions.matrix.shape[1]
+        neighbours = np.full((n_items, k), -1, dtype=np.int32)
+        scores = np.zeros((n_items, k), dtype=np.float16)
+
+        if n_items == 0:
+            return cls(interactions.item_ids, neighbours, scores)
+
+        X = interactions.matrix.tocsc().astype(np.float32)
+        norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=0)).ravel())
+        norms[norms == 0] = 1.0
+        Xn = (X @ sparse.diags(1.0 / norms)).tocsc()
+        XnT = Xn.T.tocsr()
+
+        for inicio in range(0, n_items, block_size):
+            fim = min(inicio + block_size, n_items)
+            bloco = (XnT @ Xn[:, inicio:fim]).tocsc()
+
+            for j in range(fim - inicio):
+                a, b = bloco.indptr[j], bloco.indptr[j + 1]
+                idx = bloco.indices[a:b]
+                val = bloco.data[a:b]
+
+                mask = (idx != inicio + j) & (val > 0)
+                idx, val = idx[mask], val[mask]
+
+                if idx.size > k:
+                    top = np.argpartition(-val, k - 1)[:k]
+                    idx, val = idx[top], val[top]
+
+                ordem = np.argsort(-val)
+                neighbours[inicio + j, :ordem.size] = idx[ordem]
+                scores[inicio + j, :ordem.size] = val[ordem]
+
+        return cls(interactions.item_ids, neighbours, scores)
+
+    def recommend(self, history_ids, history_weights, limit=20, exclude_ids=None):
+        """
+        Pontua os filmes candidatos a partir do histórico de um utilizador.
+
+        score(c) = Σ_h peso(h) · sim(h, c), para os vizinhos c de cada h.
+
+        Args:
+            history_ids: IDs dos filmes com que o utilizador interagiu
+            history_weights: Peso de cada interação (ver interactions.py)
+            limit: Número máximo de filmes a devolver
+            exclude_ids: IDs a excluir (default: o próprio histórico)
+
+        Returns:
+            list: IDs dos filmes recomendados, por pontuação descendente
+        """
+        idx = index_of(self.item_ids, history_ids)
+        validos = idx >= 0
+        idx = idx[validos]
+        pesos = np.asarray(history_weights, dtype=np.float32)[validos]
+
+        if idx.size == 0:
+            return []
+
+        vizinhos = self.neighbours[idx]
+        contrib = self.scores[idx].astype(np.float32) * pesos[:, None]
+        mask = vizinhos >= 0
+
+        acumulado = np.bincount(
+            vizinhos[mask],
+            weights=contrib[mask],
+            minlength=self.item_ids.size,
+        )
+
+        if exclude_ids is None:
+            exclude_ids = history_ids
+        excluir = index_of(self.item_ids, exclude_ids)
+        acumulado[excluir[excluir >= 0]] = 0.0
+
+        candidatos = np.flatnonzero(acumulado > 0)
+        if candidatos.size > limit:
+            top = np.argpartition(-acumulado[candidatos], limit - 1)[:limit]
+            candidatos = candidatos[top]
+        candidatos = candidatos[np.argsort(-acumulado[candidatos])]
+
+        return self.item_ids[candidatos].tolist()
+
+    def save(self, path):
+        """Guarda os vizinhos num ficheiro .npz (escrita atómica)."""
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'wb') as f:
+            np.savez(
+                f,
+                item_ids=self.item_ids,
+                neighbours=self.neighbours,
+                scores=self.scores,
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """Carrega os vizinhos a partir de um ficheiro .npz."""
+        with np.load(path) as data:
+            return cls(data['item_ids'], data['neighbours'], data['scores'])
+
+
+def artifact_path():
+    """Caminho do ficheiro de vizinhos item-item."""
+    return settings.RECOMMENDER_ARTIFACTS_DIR / ARTIFACT_NAME
+
+
+_lock = threading.Lock()
+_cache = {'mtime': None, 'model': None}
+
+
+def get_item_neighbours():
+    """
+    Devolve o modelo item-item carregado em memória (None se não existir).
+
+    O ficheiro é recarregado automaticamente quando é reconstruído.
+    """
+    path = artifact_path()
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+
+    with _lock:
+        if _cache['mtime'] != mtime:
+            _cache['model'] = ItemNeighbours.load(path)
+            _cache['mtime'] = mtime
+        return _cache['model']
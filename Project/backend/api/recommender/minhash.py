@@ -0,0 +1,290 @@
+"""
+Índice MinHash/LSH de utilizadores com gostos semelhantes.
+
+Requisito RF-10: Motor de Recomendação
+Requisito RNF-01: Performance e Tempo de Resposta
+
+O conjunto de cada utilizador são os filmes marcados como favoritos ou
+vistos. A assinatura MinHash guarda, para cada uma das MINHASH_PERMUTACOES
+funções h(x) = (a·x + b) mod p, o mínimo sobre o conjunto; a fração de
+posições iguais entre duas assinaturas estima a semelhança de Jaccard.
+
+Atualização: quando um filme entra no conjunto basta min(assinatura, h(x));
+quando sai, a assinatura é recalculada a partir do conjunto (uma query).
+
+LSH: a assinatura é dividida em MINHASH_BANDAS bandas e cada banda é
+guardada em BucketLSH com um hash de 64 bits. Os candidatos a vizinhos são
+os utilizadores que partilham pelo menos uma banda (leituras pelo índice
+(banda, chave)); só estes são comparados com a assinatura completa.
+"""
+
+import functools
+import hashlib
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+
+from api.models import AssinaturaUsuario, AtividadeUsuario, BucketLSH
+
+
+# Primo de Mersenne 2^31 - 1: a·x + b cabe em int64 sem overflow
+PRIMO = (1 << 31) - 1
+
+# Semente fixa: todos os processos têm de usar as mesmas funções de hash
+SEMENTE = 20240601
+
+FILTRO_CONJUNTO = Q(favorito=True) | Q(visto=True)
+
+
+@functools.lru_cache(maxsize=4)
+def _coefficients(num_permutacoes):
+    rng = np.random.default_rng(SEMENTE)
+    a = rng.integers(1, PRIMO, num_permutacoes, dtype=np.int64)
+    b = rng.integers(0, PRIMO, num_permutacoes, dtype=np.int64)
+    return a, b
+
+
+def hash_films(filme_ids, num_permutacoes=None):
+    """
+    Valores das funções de hash para cada filme.
+
+    Returns:
+        np.ndarray: uint32 (n_filmes × num_permutacoes)
+    """
+    a, b = _coefficients(num_permutacoes or settings.MINHASH_PERMUTACOES)
+    x = np.asarray(filme_ids, dtype=np.int64) % PRIMO
+    return ((x[:, None] * a[None, :] + b[None, :]) % PRIMO).astype(np.uint32)
+
+
+def signature(filme_ids):
+    """Assinatura MinHash de um conjunto de filmes (None se estiver vazio)."""
+    if len(filme_ids) == 0:
+        return None
+    return hash_films(filme_ids).min(axis=0)
+
+
+def band_keys(assinatura, bandas=None):
+    """
+    Chave de 64 bits (com sinal, para BigIntegerField) de cada banda.
+    """
+    bandas = bandas or settings.MINHASH_BANDAS
+    return [
+        int.from_bytes(hashlib.blake2b(banda.tobytes(), digest_size=8).digest(), 'little', signed=True)
+        for banda in np.asarray(assinatura, dtype='<u4').reshape(bandas, -1)
+    ]
+
+
+def encode(assinatura):
+    return np.asarray(assinatura, dtype='<u4').tobytes()
+
+
+def decode(dados):
+    return np.frombuffer(bytes(dados), dtype='<u4')
+
+
+def is_member(estado):
+    """Indica se um estado (rating, favorito, visto, ver_mais_tarde) pertence ao conjunto."""
+    return estado is not None and bool(estado[1] or estado[2])
+
+
+def _user_films(usuario_id):
+    return list(
+        AtividadeUsuario.objects
+        .filter(FILTRO_CONJUNTO, usuario_id=usuario_id)
+        .values_list('filme_id', flat=True)
+    )
+
+
+def _store(usuario_id, registo, assinatura, num_filmes):
+    """Grava a assinatura e atualiza apenas as bandas que mudaram."""
+    if assinatura is None:
+        AssinaturaUsuario.objects.filter(usuario_id=usuario_id).delete()
+        BucketLSH.objects.filter(usuario_id=usuario_id).delete()
+        return
+
+    chaves = band_keys(assinatura)
+    if registo is None:
+        AssinaturaUsuario.objects.update_or_create(
+            usuario_id=usuario_id,
+            defaults={'assinatura': encode(assinatura), 'num_filmes': num_filmes},
+        )
+        alteradas = list(range(len(chaves)))
+    else:
+        antigas = band_keys(decode(registo.assinatura))
+        alteradas = [i for i, (c, a) in enumerate(zip(chaves, antigas)) if c != a]
+        registo.assinatura = encode(assinatura)
+        registo.num_filmes = num_filmes
+        registo.save()
+
+    if alteradas:
+        BucketLSH.objects.filter(usuario_id=usuario_id, banda__in=alteradas).delete()
+        BucketLSH.objects.bulk_create([
+            BucketLSH(usuario_id=usuario_id, banda=i, chave=chaves[i]) for i in alteradas
+        ])
+
+
+def update_signature(usuario_id, filme_id, antes, depois):
+    """
+    Aplica à assinatura uma alteração de AtividadeUsuario.
+
+    Args:
+        antes / depois: Estados (rating, favorito, visto, ver_mais_tarde) ou None
+    """
+    update_signatures(usuario_id, [(filme_id, antes, depois)])
+
+
+def update_signatures(usuario_id, mudancas):
+    """
+    Aplica à assinatura várias alterações de AtividadeUsuario de uma só vez.
+
+    Entradas no conjunto combinam-se por mínimo com a assinatura guardada;
+    qualquer saída obriga a recalcular a assinatura a partir dos filmes.
+
+    Args:
+        mudancas: Tuplos (filme_id, antes, depois) como em update_signature
+    """
+    entradas, saidas = [], False
+    for filme_id, antes, depois in mudancas:
+        membro_antes, membro_depois = is_member(antes), is_member(depois)
+        if membro_antes == membro_depois:
+            continue
+        if membro_depois:
+            entradas.append(filme_id)
+        else:
+            saidas = True
+    if not entradas and not saidas:
+        return
+
+    with transaction.atomic():
+        registo = (
+            AssinaturaUsuario.objects
+            .select_for_update()
+            .filter(usuario_id=usuario_id)
+            .first()
+        )
+        if not saidas and registo is not None:
+            assinatura = np.minimum(decode(registo.assinatura), hash_films(entradas).min(axis=0))
+            num_filmes = registo.num_filmes + len(entradas)
+        else:
+            filmes = _user_films(usuario_id)
+            assinatura, num_filmes = signature(filmes), len(filmes)
+
+        _store(usuario_id, registo, assinatura, num_filmes)
+
+
+def similar_users(usuario_id, limit=10, max_candidatos=500):
+    """
+    Utilizadores com conjuntos de filmes mais semelhantes (Jaccard estimado).
+
+    Returns:
+        list: Tuplos (usuario_id, semelhança) por semelhança descendente
+    """
+    dados = (
+        AssinaturaUsuario.objects
+        .filter(usuario_id=usuario_id)
+        .values_list('assinatura', flat=True)
+        .first()
+    )
+    if dados is None:
+        return []
+    assinatura = decode(dados)
+
+    mesma_banda = Q()
+    for banda, chave in enumerate(band_keys(assinatura)):
+        mesma_banda |= Q(banda=banda, chave=chave)
+
+    candidatos = list(
+        BucketLSH.objects
+        .filter(mesma_banda)
+        .exclude(usuario_id=usuario_id)
+        .values('usuario_id')
+        .annotate(bandas=Count('id'))
+        .order_by('-bandas', 'usuario_id')
+        .values_list('usuario_id', flat=True)[:max_candidatos]
+    )
+    if not candidatos:
+        return []
+
+    linhas = list(
+        AssinaturaUsuario.objects
+        .filter(usuario_id__in=candidatos)
+        .values_list('usuario_id', 'assinatura')
+    )
+    ids = np.array([u for u, _ in linhas], dtype=np.int64)
+    assinaturas = np.stack([decode(a) for _, a in linhas])
+    semelhanca = (assinaturas == assinatura).mean(axis=1)
+
+    k = min(limit, ids.size)
+    top = np.argpartition(-semelhanca, k - 1)[:k]
+    top = top[np.lexsort((ids[top], -semelhanca[top]))]
+    return [(int(ids[i]), round(float(semelhanca[i]), 4)) for i in top]
+
+
+def _user_blocks(chunk_rows):
+    """
+    Lê os pares (usuario_id, filme_id) do conjunto por ordem de utilizador,
+    em blocos de cerca de chunk_rows linhas que só contêm utilizadores
+    completos, sem materializar a tabela.
+
+    Yields:
+        tuple: (usuarios, filmes) em arrays int64
+    """
+    linhas = (
+        AtividadeUsuario.objects
+        .filter(FILTRO_CONJUNTO)
+        .order_by('usuario_id')
+        .values_list('usuario_id', 'filme_id')
+        .iterator(chunk_size=min(chunk_rows, 10000))
+    )
+    resto = np.empty((0, 2), dtype=np.int64)
+    while bloco := list(islice(linhas, chunk_rows)):
+        dados = np.concatenate([resto, np.array(bloco, dtype=np.int64)])
+        # As linhas do último utilizador podem continuar no bloco seguinte
+        corte = int(np.searchsorted(dados[:, 0], dados[-1, 0]))
+        if corte:
+            yield dados[:corte, 0], dados[:corte, 1]
+        resto = dados[corte:]
+    if resto.size:
+        yield resto[:, 0], resto[:, 1]
+
+
+def rebuild_index(chunk_rows=200000, batch_size=5000):
+    """
+    Recalcula todas as assinaturas e buckets (carga inicial).
+
+    Os utilizadores são lidos e processados por blocos de cerca de
+    chunk_rows linhas; as assinaturas de cada bloco são calculadas com
+    np.minimum.reduceat sobre a matriz de hashes dos seus filmes.
+
+    Returns:
+        int: Número de utilizadores indexados
+    """
+    total = 0
+    with transaction.atomic():
+        AssinaturaUsuario.objects.all().delete()
+        BucketLSH.objects.all().delete()
+
+        for usuarios, filmes in _user_blocks(chunk_rows):
+            filme_ids, inverso = np.unique(filmes, return_inverse=True)
+            hashes = hash_films(filme_ids)
+            inicios = np.r_[0, np.flatnonzero(np.diff(usuarios)) + 1]
+            tamanhos = np.diff(np.r_[inicios, usuarios.size])
+            assinaturas = np.minimum.reduceat(hashes[inverso], inicios)
+
+            registos, buckets = [], []
+            for usuario_id, n, assinatura in zip(usuarios[inicios].tolist(), tamanhos.tolist(), assinaturas):
+                registos.append(AssinaturaUsuario(
+                    usuario_id=usuario_id, assinatura=encode(assinatura), num_filmes=n
+                ))
+                buckets.extend(
+                    BucketLSH(usuario_id=usuario_id, banda=i, chave=chave)
+                    for i, chave in enumerate(band_keys(assinatura))
+                )
+            AssinaturaUsuario.objects.bulk_create(registos, batch_size=batch_size)
+            BucketLSH.objects.bulk_create(buckets, batch_size=batch_size)
+            total += int(inicios.size)
+
+    return total
@@ -0,0 +1,116 @@
+"""
+Amostragem ponderada de candidatos (substitui ORDER BY RANDOM()).
+
+Requisito RF-10: Motor de Recomendação
+Requisito RF-11: Tendências/Populares
+Requisito RNF-01: Performance e Tempo de Resposta
+
+A partir do instantâneo do catálogo constroem-se pools de candidatos já
+ordenados por rating TMDB: um global e um por género, cada um limitado a
+RECOMMENDER_POOL_SIZE filmes. Cada pedido faz uma amostragem ponderada sem
+reposição (Efraimidis-Spirakis: chave = log(u) / peso, top-k por
+np.argpartition) sobre a união dos pools relevantes, com exclusão vetorizada
+dos filmes já avaliados (np.isin). O custo por pedido depende apenas do
+tamanho dos pools e não do tamanho do catálogo.
+"""
+
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from .catalogue import get_catalogue
+
+
+# Peso de amostragem: exp((rating - rating_máximo) / TEMPERATURA)
+TEMPERATURA = 1.0
+
+
+class CandidatePools:
+    """
+    Pools de candidatos ordenados por rating, por género e global.
+
+    Attributes:
+        catalogue: Catalogue de onde os pools foram construídos
+        global_pool: Posições no catálogo dos filmes com melhor rating
+        genre_pools: Lista (uma entrada por género) de arrays de posições
+        weights: np.ndarray float64 com o peso de amostragem de cada posição
+    """
+
+    def __init__(self, catalogue, pool_size):
+        self.catalogue = catalogue
+
+        ratings = catalogue.ratings
+        com_rating = np.flatnonzero(~np.isnan(ratings))
+        ordem = com_rating[np.argsort(-ratings[com_rating], kind='stable')]
+
+        maximo = ratings[com_rating].max() if com_rating.size else 0.0
+        self.weights = np.exp((np.nan_to_num(ratings) - maximo) / TEMPERATURA)
+
+        self.global_pool = ordem[:pool_size]
+
+        por_genero = catalogue.genre_matrix.tocsc()
+        posicao_no_ranking = np.empty(ratings.size, dtype=np.int64)
+        posicao_no_ranking[ordem] = np.arange(ordem.size)
+        self.genre_pools = []
+        for g in range(por_genero.shape[1]):
+            filmes = por_genero.indices[por_genero.indptr[g]:por_genero.indptr[g + 1]]
+            filmes = filmes[~np.isnan(ratings[filmes])]
+            filmes = filmes[np.argsort(posicao_no_ranking[filmes])]
+            self.genre_pools.append(filmes[:pool_size])
+
+    def candidates(self, genre_positions=None):
+        """Posições candidatas: união dos pools dos géneros (ou pool global)."""
+        if genre_positions is None:
+            return self.global_pool
+        pools = [self.genre_pools[g] for g in genre_positions]
+        if not pools:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(pools))
+
+    def sample(self, genre_positions=None, exclude_ids=(), limit=20, rng=None):
+        """
+        Amostra ponderada sem reposição de filmes candidatos.
+
+        Args:
+            genre_positions: Colunas de géneros (None = pool global)
+            exclude_ids: IDs de filmes a excluir (ex.: já avaliados)
+            limit: Número de filmes a devolver
+            rng: np.random.Generator opcional (testes / reprodutibilidade)
+
+        Returns:
+            list: IDs dos filmes amostrados, por ordem de chave
+        """
+        rng = rng or np.random.default_rng()
+        candidatos = self.candidates(genre_positions)
+
+        ids = self.catalogue.film_ids[candidatos]
+        if len(exclude_ids):
+            manter = ~np.isin(ids, np.asarray(exclude_ids, dtype=np.int64))
+            candidatos, ids = candidatos[manter], ids[manter]
+
+        if candidatos.size == 0:
+            return []
+
+        chaves = np.log(rng.random(candidatos.size)) / self.weights[candidatos]
+        k = min(limit, candidatos.size)
+        top = np.argpartition(-chaves, k - 1)[:k]
+        top = top[np.argsort(-chaves[top])]
+        return ids[top].tolist()
+
+
+_lock = threading.Lock()
+_cache = {'catalogue': None, 'pools': None}
+
+
+def get_candidate_pools():
+    """
+    Devolve os pools do instantâneo atual do catálogo (reconstruídos quando
+    o catálogo é recarregado).
+    """
+    catalogue = get_catalogue()
+    with _lock:
+        if _cache['catalogue'] is not catalogue:
+            _cache['pools'] = CandidatePools(catalogue, settings.RECOMMENDER_POOL_SIZE)
+            _cache['catalogue'] = catalogue
+        return _cache['pools']
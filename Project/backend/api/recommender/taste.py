@@ -0,0 +1,217 @@
+"""
+Perfil de gosto incremental (afinidade por género e por década).
+
+Requisito RF-10: Motor de Recomendação
+Requisito RNF-01: Performance e Tempo de Resposta
+
+Cada alteração de rating, favorito ou visto aplica ao PerfilGosto apenas a
+diferença de peso da interação (ver interactions.interaction_weight) nos
+géneros e na década do filme, sem reler o histórico do utilizador. Para
+recomendar, o perfil é convertido num vetor alinhado com as colunas da
+matriz filme × género do catálogo e os candidatos são pontuados com um único
+produto matriz-vetor.
+"""
+
+import numpy as np
+from django.db import transaction
+
+from api.models import AtividadeUsuario, Filme, PerfilGosto
+
+from .catalogue import get_catalogue
+from .interactions import history_weights, interaction_weight
+from .sampler import get_candidate_pools
+
+
+# Contribuição das preferências de década e do rating TMDB na pontuação
+PESO_DECADA = 0.3
+PESO_RATING_TMDB = 0.2
+
+# Número mínimo de interações para usar o perfil nas recomendações
+MIN_INTERACOES = 3
+
+
+def _decade(ano):
+    return str(int(ano) // 10 * 10) if ano else None
+
+
+def film_features(filme_id):
+    """
+    Géneros e década de um filme (catálogo em memória, com fallback à BD).
+
+    Returns:
+        tuple: (lista de géneros, década ou None)
+    """
+    catalogue = get_catalogue()
+    pos = catalogue.positions([filme_id])[0]
+    if pos >= 0:
+        generos = [catalogue.genres[g] for g in catalogue.genre_matrix[pos].indices]
+        return generos, _decade(catalogue.years[pos])
+
+    ano = Filme.objects.filter(id=filme_id).values_list('ano_lancamento', flat=True).first()
+    generos = list(
+        Filme.generos.through.objects
+        .filter(filme_id=filme_id)
+        .values_list('genero_id', flat=True)
+    )
+    return generos, _decade(ano)
+
+
+def _accumulate(pesos, chave, delta):
+    valor = round(pesos.get(chave, 0.0) + delta, 4)
+    if abs(valor) < 1e-4:
+        pesos.pop(chave, None)
+    else:
+        pesos[chave] = valor
+
+
+def _weight(estado):
+    return interaction_weight(*estado) if estado is not None else 0.0
+
+
+def apply_activity_change(usuario_id, filme_id, antes, depois):
+    """
+    Aplica ao perfil a diferença entre dois estados de uma interação.
+
+    Args:
+        usuario_id: ID do utilizador
+        filme_id: ID do filme
+        antes: Tuplo (rating, favorito, visto) anterior, ou None se não existia
+        depois: Tuplo (rating, favorito, visto) atual, ou None se foi removido
+    """
+    apply_activity_changes(usuario_id, [(filme_id, antes, depois)])
+
+
+def apply_activity_changes(usuario_id, mudancas):
+    """
+    Aplica ao perfil as diferenças de várias interações (um bloqueio e uma
+    escrita por lote).
+
+    Args:
+        usuario_id: ID do utilizador
+        mudancas: Tuplos (filme_id, antes, depois) como em apply_activity_change
+    """
+    deltas = []
+    for filme_id, antes, depois in mudancas:
+        peso_antes, peso_depois = _weight(antes), _weight(depois)
+        delta = peso_depois - peso_antes
+        delta_interacoes = int(peso_depois != 0) - int(peso_antes != 0)
+        if delta != 0 or delta_interacoes != 0:
+            deltas.append((filme_id, delta, delta_interacoes))
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        perfil = PerfilGosto.objects.select_for_update().filter(usuario_id=usuario_id).first()
+        if perfil is None:
+            # Sem perfil: é construído a partir do histórico na primeira leitura
+            return
+
+        for filme_id, delta, delta_interacoes in deltas:
+            generos, decada = film_features(filme_id)
+            for genero in generos:
+                _accumulate(perfil.generos, genero, delta)
+            if decada:
+                _accumulate(perfil.decadas, decada, delta)
+            perfil.num_interacoes = max(0, perfil.num_interacoes + delta_interacoes)
+        perfil.save()
+
+
+def profile_from_history(filme_ids, pesos, catalogue=None):
+    """
+    Calcula as afinidades a partir de um histórico (sem gravar).
+
+    Args:
+        filme_ids: Array de IDs dos filmes do histórico
+        pesos: Array com o peso de cada interação
+
+    Returns:
+        dict: Campos generos, decadas e num_interacoes de PerfilGosto
+    """
+    catalogue = catalogue or get_catalogue()
+    pos = catalogue.positions(filme_ids)
+    validos = pos >= 0
+    pos, pesos = pos[validos], np.asarray(pesos)[validos]
+
+    generos, decadas = {}, {}
+    if pos.size:
+        por_genero = catalogue.genre_matrix[pos].T @ pesos
+        for g in np.flatnonzero(por_genero):
+            generos[catalogue.genres[g]] = round(float(por_genero[g]), 4)
+
+        anos = catalogue.years[pos]
+        for decada in np.unique(anos[anos > 0] // 10 * 10):
+            decadas[str(decada)] = round(float(pesos[anos // 10 * 10 == decada].sum()), 4)
+
+    return {
+        'generos': generos,
+        'decadas': {d: p for d, p in decadas.items() if p},
+        'num_interacoes': int(np.count_nonzero(pesos)),
+    }
+
+
+def rebuild_profile(usuario_id):
+    """
+    Reconstrói o perfil a partir de todo o histórico do utilizador.
+
+    Returns:
+        PerfilGosto
+    """
+    filme_ids, pesos = history_weights(
+        AtividadeUsuario.objects
+        .filter(usuario_id=usuario_id)
+        .order_by()
+        .values_list('filme_id', 'rating', 'favorito', 'visto')
+    )
+    perfil, _ = PerfilGosto.objects.update_or_create(
+        usuario_id=usuario_id,
+        defaults=profile_from_history(filme_ids, pesos),
+    )
+    return perfil
+
+
+def taste_recommendations(perfil, exclude_ids=(), limit=20):
+    """
+    Pontua candidatos contra o perfil de gosto.
+
+    score = (G · g) / max(g) + PESO_DECADA · d[década] + PESO_RATING_TMDB · rating / 10
+
+    em que G é a matriz filme × género dos candidatos (pools dos géneros com
+    afinidade positiva) e g o vetor de afinidades do perfil.
+
+    Returns:
+        list: IDs dos filmes por pontuação descendente
+    """
+    if perfil.num_interacoes < MIN_INTERACOES:
+        return []
+
+    pools = get_candidate_pools()
+    catalogue = pools.catalogue
+
+    vetor = catalogue.genre_vector(perfil.generos)
+
+    positivos = np.flatnonzero(vetor > 0)
+    if positivos.size == 0:
+        return []
+
+    candidatos = pools.candidates(positivos)
+    ids = catalogue.film_ids[candidatos]
+    if len(exclude_ids):
+        manter = ~np.isin(ids, np.asarray(exclude_ids, dtype=np.int64))
+        candidatos, ids = candidatos[manter], ids[manter]
+    if candidatos.size == 0:
+        return []
+
+    scores = (catalogue.genre_matrix[candidatos] @ vetor) / vetor.max()
+
+    if perfil.decadas:
+        maximo = max(abs(p) for p in perfil.decadas.values())
+        anos = catalogue.years[candidatos]
+        for decada, peso in perfil.decadas.items():
+            scores[anos // 10 * 10 == int(decada)] += PESO_DECADA * peso / maximo
+
+    scores += PESO_RATING_TMDB * np.nan_to_num(catalogue.ratings[candidatos]) / 10.0
+
+    k = min(limit, candidatos.size)
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return ids[top].tolist()
@@ -0,0 +1,198 @@
+"""
+Tendências locais com decaimento exponencial no tempo.
+
+Requisito RF-11: Tendências/Populares
+Requisito RNF-01: Performance e Tempo de Resposta
+
+Cada evento dos utilizadores (avaliação, favorito, ver mais tarde,
+visualização) soma pontos ao bucket horário do filme em TendenciaHoraria.
+A pontuação de um filme num período é
+
+    Σ pontos_h · 2^(-(agora - h) / meia_vida)
+
+somada na base de dados (uma query agregada que devolve só o top-K) sobre
+os buckets das últimas JANELA_MEIAS_VIDAS meias-vidas. O top-K de cada
+período fica em memória e é recalculado a cada TRENDING_REFRESH_SECONDS.
+"""
+
+import threading
+import time
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, FloatField, Sum, Value
+from django.db.models.functions import Extract, Power
+from django.utils import timezone
+
+from api.models import TendenciaHoraria
+
+
+# Pontos de cada tipo de evento
+PONTOS_AVALIACAO = 1.0
+PONTOS_FAVORITO = 2.0
+PONTOS_VER_MAIS_TARDE = 1.0
+PONTOS_VISUALIZACAO = 1.5
+
+# Buckets mais antigos do que N meias-vidas pesam menos de 2^-N e são ignorados
+JANELA_MEIAS_VIDAS = 6
+
+PERIODOS = ('day', 'week')
+
+
+def window(period):
+    """Janela de buckets considerada num período."""
+    return timedelta(hours=settings.TRENDING_HALF_LIFE_HOURS[period] * JANELA_MEIAS_VIDAS)
+
+
+def _hour(quando):
+    return quando.replace(minute=0, second=0, microsecond=0)
+
+
+def activity_points(antes, depois):
+    """
+    Pontos de uma alteração de AtividadeUsuario.
+
+    Só contam as transições para positivo: primeira avaliação, favorito ou
+    ver mais tarde marcados. Remoções não retiram pontos (a tendência mede
+    atividade, não estado).
+
+    Args:
+        antes: (rating, favorito, visto, ver_mais_tarde) anterior ou None
+        depois: (rating, favorito, visto, ver_mais_tarde) atual ou None
+
+    Returns:
+        float: Pontos a somar ao bucket atual do filme
+    """
+    if depois is None:
+        return 0.0
+    rating_antes, favorito_antes, _, ver_mais_tarde_antes = antes or (None, False, False, False)
+    rating, favorito, _, ver_mais_tarde = depois
+
+    pontos = 0.0
+    if rating is not None and rating_antes is None:
+        pontos += PONTOS_AVALIACAO
+    if favorito and not favorito_antes:
+        pontos += PONTOS_FAVORITO
+    if ver_mais_tarde and not ver_mais_tarde_antes:
+        pontos += PONTOS_VER_MAIS_TARDE
+    return pontos
+
+
+def record_event(filme_id, pontos, quando=None):
+    """
+    Soma pontos ao bucket horário de um filme.
+
+    Um UPDATE atómico (pontos = pontos + x) no caso comum; ao abrir um bucket
+    novo remove também os buckets do filme que já saíram da janela mais longa.
+    """
+    if pontos <= 0:
+        return
+
+    hora = _hour(quando or timezone.now())
+    buckets = TendenciaHoraria.objects.filter(filme_id=filme_id, hora=hora)
+    if buckets.update(pontos=F('pontos') + pontos):
+        return
+
+    try:
+        with transaction.atomic():
+            TendenciaHoraria.objects.create(filme_id=filme_id, hora=hora, pontos=pontos)
+    except IntegrityError:
+        # Outro pedido abriu o bucket entretanto
+        buckets.update(pontos=F('pontos') + pontos)
+        return
+
+    _prune([filme_id], hora)
+
+
+def record_events(pontos_por_filme, quando=None):
+    """
+    Soma pontos aos buckets horários de vários filmes num único upsert
+    (INSERT ... ON CONFLICT DO UPDATE pontos = pontos + EXCLUDED.pontos).
+
+    Args:
+        pontos_por_filme: Dict {filme_id: pontos}; entradas <= 0 são ignoradas
+        quando: Instante dos eventos (por omissão, agora)
+    """
+    pontos_por_filme = {f: p for f, p in pontos_por_filme.items() if p > 0}
+    if not pontos_por_filme:
+        return
+
+    hora = _hour(quando or timezone.now())
+    tabela = connection.ops.quote_name(TendenciaHoraria._meta.db_table)
+    valores = ', '.join(['(%s, %s, %s)'] * len(pontos_por_filme))
+    params = []
+    for filme_id, pontos in pontos_por_filme.items():
+        params.extend([filme_id, hora, pontos])
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {tabela} (filme_id, hora, pontos)
+            VALUES {valores}
+            ON CONFLICT (filme_id, hora)
+            DO UPDATE SET pontos = {tabela}.pontos + EXCLUDED.pontos
+            RETURNING filme_id, (xmax = 0) AS novo
+            """,
+            params,
+        )
+        novos = [filme_id for filme_id, novo in cursor.fetchall() if novo]
+
+    if novos:
+        _prune(novos, hora)
+
+
+def _prune(filme_ids, hora):
+    """Remove os buckets dos filmes que já saíram da janela mais longa."""
+    limite = hora - max(window(p) for p in PERIODOS)
+    TendenciaHoraria.objects.filter(filme_id__in=filme_ids, hora__lt=limite).delete()
+
+
+def compute_trending(period, limit, agora=None):
+    """
+    Calcula o top de tendências de um período na base de dados.
+
+    Returns:
+        list: Tuplos (filme_id, pontuação) por pontuação descendente
+    """
+    agora = agora or timezone.now()
+    meia_vida = settings.TRENDING_HALF_LIFE_HOURS[period]
+
+    expoente = (
+        (Extract('hora', 'epoch', tzinfo=dt_timezone.utc) - Value(agora.timestamp()))
+        / Value(3600.0 * meia_vida)
+    )
+    pontuacao = Sum(
+        F('pontos') * Power(Value(2.0), expoente),
+        output_field=FloatField(),
+    )
+
+    linhas = (
+        TendenciaHoraria.objects
+        .filter(hora__gte=agora - window(period))
+        .values('filme_id')
+        .annotate(pontuacao=pontuacao)
+        .order_by('-pontuacao', 'filme_id')
+        .values_list('filme_id', 'pontuacao')[:limit]
+    )
+    return [(filme_id, float(p)) for filme_id, p in linhas]
+
+
+_lock = threading.Lock()
+_cache = {}
+
+
+def get_trending(period='week'):
+    """
+    Top-K local de um período (em memória, recalculado periodicamente).
+
+    Returns:
+        list: Tuplos (filme_id, pontuação) por pontuação descendente
+    """
+    agora = time.monotonic()
+    with _lock:
+        calculado_em, top = _cache.get(period, (None, None))
+        if calculado_em is None or agora - calculado_em > settings.TRENDING_REFRESH_SECONDS:
+            top = compute_trending(period, settings.TRENDING_TOP_K)
+            _cache[period] = (agora, top)
+        return top
@@ -0,0 +1,212 @@
+"""
+Cache partilhada das respostas públicas (pedidos anónimos).
+
+Requisito RNF-01: Performance e Tempo de Resposta
+
+get_genres, MovieCatalogueView, trending_movies, list_reviews e
+movie_details devolvem o mesmo corpo a todos os pedidos anónimos. O
+decorador public_response_cache guarda essas respostas na cache
+RESPONSE_CACHE_ALIAS (tabela da base de dados ou ficheiros, sem serviços
+externos, partilhada por todos os workers) com a chave:
+
+    resposta:<view>:<gerações>:<query string canónica + argumentos do URL>
+
+A invalidação é por versões: cada resposta depende de contadores de
+geração (por exemplo "generos", "filme:<id>", "reviews:<id>") que os
+sinais e as escritas incrementam após o commit, pelo que as entradas
+antigas deixam de ser lidas e expiram com RESPONSE_CACHE_TTL.
+
+Os contadores lidos ficam também na memória do processo quando o
+barramento de invalidação está ativo (api.invalidation): cada incremento
+publica "geracao:<nome>" e os workers esquecem esse contador, pelo que um
+acerto na cache custa uma única leitura (a da resposta).
+
+As respostas anónimas levam Cache-Control: public, max-age e
+Vary: Authorization, para que o nginx (e o browser) também as guardem;
+respostas marcadas com no-store (por exemplo, tendências de recurso com
+a TMDB indisponível) não são guardadas.
+"""
+
+import hashlib
+import threading
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+
+from . import invalidation
+
+
+GERACAO_KEY = 'resposta:geracao:{nome}'
+RESPOSTA_KEY = 'resposta:{view}:{geracoes}:{consulta}'
+
+# Cabeçalhos guardados com o corpo (validadores dos pedidos condicionais)
+CABECALHOS_GUARDADOS = ('ETag', 'Last-Modified')
+
+
+def response_cache():
+    """Cache das respostas públicas (RESPONSE_CACHE_ALIAS)."""
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+# Contadores de geração lidos por este processo ({nome: (expira, valor)},
+# com o TTL do L1 das caches de dois níveis); a época muda a cada
+# invalidação, para não guardar valores lidos antes dela
+_geracoes_locais = {}
+_epoca = [0]
+_geracoes_lock = threading.Lock()
+
+
+def _forget_generations(nomes):
+    """Subscritor de "geracao": esquece os contadores (None esquece todos)."""
+    with _geracoes_lock:
+        _epoca[0] += 1
+        if nomes is None:
+            _geracoes_locais.clear()
+        else:
+            for nome in nomes:
+                _geracoes_locais.pop(nome, None)
+
+
+invalidation.subscribe('geracao', _forget_generations)
+
+
+def current_generations(nomes):
+    """
+    Valores atuais dos contadores de geração (um get_many para os que não
+    estão na memória do processo).
+
+    Contadores inexistentes (ou removidos pela cache) começam num valor
+    derivado do relógio, para nunca coincidirem com uma geração anterior.
+    """
+    usar_locais = invalidation.sync()
+    agora = time.monotonic()
+    valores = {}
+    with _geracoes_lock:
+        epoca = _epoca[0]
+        if usar_locais:
+            for nome in nomes:
+                expira, valor = _geracoes_locais.get(nome, (0, None))
+                if expira > agora:
+                    valores[nome] = valor
+
+    em_falta = [nome for nome in nomes if nome not in valores]
+    if em_falta:
+        cache = response_cache()
+        chaves = {nome: GERACAO_KEY.format(nome=nome) for nome in em_falta}
+        lidos = cache.get_many(chaves.values())
+        for nome, chave in chaves.items():
+            if chave not in lidos:
+                cache.add(chave, time.time_ns(), timeout=None)
+                lidos[chave] = cache.get(chave)
+            valores[nome] = lidos[chave]
+        if usar_locais:
+            with _geracoes_lock:
+                if _epoca[0] == epoca:
+                    expira = agora + settings.TIERED_CACHE_L1_TTL
+                    _geracoes_locais.update((nome, (expira, valores[nome])) for nome in em_falta)
+                    if len(_geracoes_locais) > settings.TIERED_CACHE_L1_MAX_ENTRIES:
+                        _geracoes_locais.clear()
+
+    return [valores[nome] for nome in nomes]
+
+
+def _bump(nomes):
+    cache = response_cache()
+    for nome in nomes:
+        chave = GERACAO_KEY.format(nome=nome)
+        try:
+            cache.incr(chave)
+        except ValueError:
+            cache.set(chave, time.time_ns(), timeout=None)
+    invalidation.publish(*(f'geracao:{nome}' for nome in nomes))
+
+
+def invalidate_public_responses(*nomes):
+    """
+    Incrementa contadores de geração após o commit da transação atual,
+    para que nenhum pedido guarde dados antigos com a nova geração.
+    """
+    nomes = list(dict.fromkeys(nomes))
+    if nomes:
+        transaction.on_commit(lambda: _bump(nomes))
+
+
+def _chave(view, request, geracoes, kwargs):
+    consulta = urlencode(sorted(
+        (chave, valor)
+        for chave, valores in request.GET.lists()
+        for valor in valores
+    ))
+    consulta += '|' + urlencode(sorted(kwargs.items()))
+    return RESPOSTA_KEY.format(
+        view=view,
+        geracoes=hashlib.md5(repr(geracoes).encode()).hexdigest(),
+        consulta=hashlib.md5(consulta.encode()).hexdigest(),
+    )
+
+
+def _public_headers(response):
+    patch_vary_headers(response, ['Authorization'])
+    if response.status_code not in (200, 304) or 'no-store' in response.get('Cache-Control', ''):
+        return response
+    if 'Cache-Control' in response:
+        del response['Cache-Control']
+    patch_cache_control(response, public=True, max_age=settings.RESPONSE_CACHE_MAX_AGE)
+    return response
+
+
+def public_response_cache(view_nome, geracoes=()):
+    """
+    Decorador de views (dentro de @api_view, ou com method_decorator em
+    APIView) que guarda as respostas 200 dos pedidos GET anónimos.
+
+    Args:
+        view_nome: Prefixo das chaves da view
+        geracoes: Nomes dos contadores de que a resposta depende, ou função
+            (request, **kwargs) que os devolve
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+
+            nomes = geracoes(request, **kwargs) if callable(geracoes) else geracoes
+            cache = response_cache()
+            chave = _chave(view_nome, request, current_generations(nomes), kwargs)
+
+            guardada = cache.get(chave)
+            if guardada is not None:
+                dados, cabecalhos = guardada
+                resposta = get_conditional_response(
+                    request,
+                    etag=cabecalhos.get('ETag'),
+                    last_modified=parse_http_date_safe(cabecalhos.get('Last-Modified', '')),
+                )
+                if resposta is None:
+                    resposta = Response(dados)
+                for nome, valor in cabecalhos.items():
+                    resposta[nome] = valor
+                return _public_headers(resposta)
+
+            resposta = view(request, *args, **kwargs)
+            if (
+                isinstance(resposta, Response)
+                and resposta.status_code == 200
+                and 'no-store' not in resposta.get('Cache-Control', '')
+            ):
+                cabecalhos = {
+                    nome: resposta[nome] for nome in CABECALHOS_GUARDADOS if nome in resposta
+                }
+                cache.set(chave, (resposta.data, cabecalhos), settings.RESPONSE_CACHE_TTL)
+            return _public_headers(resposta)
+
+        return wrapper
+    return decorator
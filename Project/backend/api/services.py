@@ -3,12 +3,42 @@ Serviços para integração com APIs externas.
 
 Requisito RF-12: Integração com TMDB API
 Requisito RNF-01: Performance e Tempo de Resposta
+
+As respostas da TMDB ficam na cache de dois níveis tmdb_cache (LRU do
+processo e tabela partilhada pelos workers) durante TMDB_CACHE_TTL
+segundos; pedidos concorrentes iguais fazem uma única chamada à TMDB, e
+os que esperam por ela mais de TIERED_CACHE_FILL_WAIT segundos desistem.
+As falhas que indicam a TMDB em baixo (timeout, ligação, HTTP 429/5xx)
+ficam em cache durante TMDB_FAILURE_CACHE_TTL segundos: nesse intervalo os
+pedidos falham de imediato, sem esperar pelo timeout de 10 segundos.
 """
 
+import hashlib
+import json
+
 import requests
 from django.conf import settings
 from typing import Optional, Dict, Any
 
+from .tiered_cache import FillUnavailable, TwoTierCache
+
+
+tmdb_cache = TwoTierCache(
+    'tmdb',
+    l1_max_entries=settings.TIERED_CACHE_L1_MAX_ENTRIES,
+    l1_ttl=settings.TIERED_CACHE_L1_TTL,
+    ttl=settings.TMDB_CACHE_TTL,
+)
+
+
+def _tmdb_unavailable(erro):
+    """Erros que indicam a TMDB em baixo (guardados na cache negativa)."""
+    if isinstance(erro, requests.exceptions.HTTPError):
+        return erro.response is not None and (
+            erro.response.status_code == 429 or erro.response.status_code >= 500
+        )
+    return isinstance(erro, (requests.exceptions.Timeout, requests.exceptions.ConnectionError))
+
 
 class TMDBService:
     """
@@ -21,6 +51,47 @@ class TMDBService:
     BASE_URL = "https://api.themoviedb.org/3"
     TIMEOUT = 10  # segundos (RNF-01)
     
+    @staticmethod
+    def get_json(path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        GET à TMDB com cache de dois níveis (a api_key não entra na chave).
+        
+        Args:
+            path: Caminho relativo a BASE_URL (ex.: "movie/popular")
+            params: Parâmetros da query (sem api_key)
+        
+        Returns:
+            Dict com o JSON da resposta
+        
+        Raises:
+            requests.exceptions.RequestException: Erro na comunicação com TMDB
+                (ConnectionError se a TMDB falhou há pouco ou se outro pedido
+                igual está em curso há demasiado tempo)
+        """
+        params = dict(params or {})
+        chave = hashlib.md5(
+            json.dumps([path, sorted(params.items())], default=str).encode()
+        ).hexdigest()
+        
+        def carregar():
+            response = requests.get(
+                f"{TMDBService.BASE_URL}/{path}",
+                params={**params, 'api_key': settings.TMDB_API_KEY},
+                timeout=TMDBService.TIMEOUT
+            )
+            response.raise_for_status()
+            return response.json()
+        
+        try:
+            return tmdb_cache.get_or_set(
+                chave,
+                carregar,
+                ttl_erro=settings.TMDB_FAILURE_CACHE_TTL,
+                guardar_erro=_tmdb_unavailable,
+            )
+        except FillUnavailable as erro:
+            raise requests.exceptions.ConnectionError(f"TMDB indisponível ({erro})") from erro
+    
     @staticmethod
     def fetch_movies(
         page: int = 1,
@@ -63,9 +134,8 @@ class TMDBService:
         # Determinar endpoint baseado nos parâmetros
         if title:
             # US04: Pesquisa por título
-            endpoint = f"{TMDBService.BASE_URL}/search/movie"
+            endpoint = "search/movie"
             params = {
-                'api_key': api_key,
                 'query': title,
                 'page': page,
                 'language': 'en-US'
@@ -77,9 +147,8 @@ class TMDBService:
         
         elif genre_id:
             # US05: Filtragem por género (usar discover)
-            endpoint = f"{TMDBService.BASE_URL}/discover/movie"
+            endpoint = "discover/movie"
             params = {
-                'api_key': api_key,
                 'with_genres': genre_id,
                 'page': page,
                 'language': 'en-US',
@@ -88,22 +157,14 @@ class TMDBService:
         
         else:
             # RF-04: Catálogo principal (filmes populares)
-            endpoint = f"{TMDBService.BASE_URL}/movie/popular"
+            endpoint = "movie/popular"
             params = {
-                'api_key': api_key,
                 'page': page,
                 'language': 'en-US'
             }
         
-        # Fazer requisição com timeout (RNF-01)
-        response = requests.get(
-            endpoint,
-            params=params,
-            timeout=TMDBService.TIMEOUT
-        )
-        response.raise_for_status()
-        
-        data = response.json()
+        # Fazer requisição com timeout (RNF-01), via cache
+        data = TMDBService.get_json(endpoint, params)
         
         # Normalizar resposta
         return {
@@ -129,20 +190,7 @@ class TMDBService:
         if not api_key:
             raise ValueError("TMDB_API_KEY não configurada")
         
-        endpoint = f"{TMDBService.BASE_URL}/genre/movie/list"
-        params = {
-            'api_key': api_key,
-            'language': 'en-US'
-        }
-        
-        response = requests.get(
-            endpoint,
-            params=params,
-            timeout=TMDBService.TIMEOUT
-        )
-        response.raise_for_status()
-        
-        return response.json()
+        return TMDBService.get_json("genre/movie/list", {'language': 'en-US'})
 
 
 # Instância única do serviço
@@ -0,0 +1,103 @@
+"""
+Sinais dos modelos da API.
+
+Requisito RF-10: Motor de Recomendação
+Requisito RF-11: Tendências/Populares
+Requisito RNF-01: Performance e Tempo de Resposta (cache de cartões e
+do utilizador autenticado)
+"""
+
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .activity import propagate_activity_changes
+from .authentication import invalidate_cached_user
+from .cards import invalidate_movie_card, touch_movies
+from .models import AtividadeUsuario, Filme, Genero, HistoricoVisualizacao, Usuario
+from .response_cache import invalidate_public_responses
+from .recommender.trending import PONTOS_VISUALIZACAO, record_event
+
+
+def _propagar(instance, antes, depois):
+    propagate_activity_changes(instance.usuario_id, [(instance.filme_id, antes, depois)])
+
+
+def _invalidar_reviews(instance):
+    """Respostas públicas dos reviews do filme (se o review existe ou existia)."""
+    if instance.review or getattr(instance, '_review_original', None):
+        invalidate_public_responses(f'reviews:{instance.filme_id}')
+    instance._review_original = instance.review
+
+
+@receiver(post_save, sender=AtividadeUsuario)
+def atividade_guardada(sender, instance, created, **kwargs):
+    """
+    Propaga alterações de rating/favorito/visto ao motor de recomendações
+    (cache, perfil de gosto, coocorrências) e novos eventos às tendências locais.
+    Alterações a outros campos são ignoradas.
+    """
+    antes = None if created else getattr(instance, '_estado_original', None)
+    depois = instance.estado_monitorizado()
+    instance._estado_original = depois
+    if antes != depois:
+        _propagar(instance, antes, depois)
+    _invalidar_reviews(instance)
+
+
+@receiver(post_delete, sender=AtividadeUsuario)
+def atividade_removida(sender, instance, **kwargs):
+    antes = getattr(instance, '_estado_original', None) or instance.estado_monitorizado()
+    _propagar(instance, antes, None)
+    _invalidar_reviews(instance)
+
+
+@receiver(post_save, sender=HistoricoVisualizacao)
+def visualizacao_registada(sender, instance, created, **kwargs):
+    if created:
+        record_event(instance.filme_id, PONTOS_VISUALIZACAO, quando=instance.data_visualizacao)
+
+
+@receiver(post_save, sender=Filme)
+@receiver(post_delete, sender=Filme)
+def filme_alterado(sender, instance, **kwargs):
+    """Invalida o fragmento do cartão e as respostas públicas do filme."""
+    invalidate_movie_card(instance)
+    invalidate_public_responses('filmes', f'filme:{instance.id}')
+
+
+@receiver(m2m_changed, sender=Filme.generos.through)
+def generos_alterados(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Os géneros fazem parte do cartão: uma nova versão do filme (updated_at)
+    invalida os fragmentos dos filmes afetados.
+    """
+    if action in ('post_add', 'post_remove'):
+        filme_ids = list(pk_set) if reverse else [instance.pk]
+    elif action == 'pre_clear':
+        filme_ids = list(instance.filmes.values_list('id', flat=True)) if reverse else [instance.pk]
+    else:
+        return
+    touch_movies(filme_ids)
+    invalidate_public_responses('filmes', *(f'filme:{filme_id}' for filme_id in filme_ids))
+
+
+@receiver(post_save, sender=Genero)
+@receiver(post_delete, sender=Genero)
+def genero_alterado(sender, instance, **kwargs):
+    invalidate_public_responses('generos', 'filmes')
+
+
+@receiver(post_save, sender=Usuario)
+def utilizador_alterado(sender, instance, created, **kwargs):
+    """
+    O nome dos autores aparece nas listas públicas de reviews; o utilizador
+    em cache na autenticação deixa de ser válido.
+    """
+    if not created:
+        invalidate_public_responses('autores')
+        invalidate_cached_user(instance.id)
+
+
+@receiver(post_delete, sender=Usuario)
+def utilizador_removido(sender, instance, **kwargs):
+    invalidate_cached_user(instance.id)
@@ -1,3 +1,1414 @@
-from django.test import TestCase
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import requests
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import DatabaseError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from scipy import sparse
+
+from . import invalidation
+from .activity import write_activities, write_activity
+from .authentication import add_user_claims, user_cache
+from .cards import card_cache
+from .models import (
+    AssinaturaUsuario, AtividadeUsuario, BucketLSH, CoocorrenciaFilmes, Filme, Genero, HistoricoVisualizacao,
+    PerfilGosto, RecomendacaoUsuario, TendenciaHoraria, TopCoocorrencia, Usuario,
+)
+from .recommender import als, catalogue, item_cf, trending
+from .recommender.als import (
+    ALSModel, als_history, als_matrices_from_rows, current_version, get_als_model, save_version, train_als,
+)
+from .recommender.batch import generate_for_users
+from .recommender.cache import refresh_recommendations
+from .recommender.cowatch import rebuild_cowatch, update_cowatch_many
+from .recommender.engine import compute_recommendations
+from .recommender.evaluation import (
+    ndcg_at_k, precision_at_k, recall_at_k, synthetic_dataset, time_split,
+)
+from .recommender.interactions import InteractionMatrix
+from .recommender.item_cf import ItemNeighbours, get_item_neighbours
+from .recommender.minhash import encode, rebuild_index, signature, similar_users
+from .recommender.sampler import CandidatePools
+from .recommender.taste import rebuild_profile
+from .recommender.trending import compute_trending, get_trending, record_event, record_events
+from .response_cache import _geracoes_locais, current_generations, invalidate_public_responses
+from .services import tmdb_cache
+from .tiered_cache import FillUnavailable, TwoTierCache
+
+
+class ListQueryCountTests(TestCase):
+    """
+    O número de queries das listas não depende do número de filmes.
+
+    Requisito RNF-01: Performance e Tempo de Resposta
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.generos = [
+            Genero.objects.create(nome=nome) for nome in ('Ação', 'Comédia', 'Drama')
+        ]
+        cls.outro = Usuario.objects.create(nome="Outro", email="outro@example.com", password_hash="x")
+
+    def setUp(self):
+        cache.clear()
+        card_cache.clear()
+        self.usuario = Usuario.objects.create(nome="Teste", email="teste@example.com", password_hash="x")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.usuario)
+
+    def _criar_filmes(self, n):
+        filmes = []
+        for i in range(n):
+            filme = Filme.objects.create(
+                nome=f"Filme {i}",
+                descricao="Sinopse",
+                ano_lancamento=2000 + i,
+                rating_tmdb=7.0,
+                poster_path=f"/p{i}.jpg",
+            )
+            filme.generos.set(self.generos[: 1 + i % 3])
+            filmes.append(filme)
+        return filmes
+
+    def _adicionar_atividades(self, filmes):
+        for filme in filmes:
+            AtividadeUsuario.objects.create(
+                usuario=self.usuario, filme=filme, rating=8, favorito=True, ver_mais_tarde=True
+            )
+            AtividadeUsuario.objects.create(usuario=self.outro, filme=filme, rating=6)
+
+    def _contar_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()
+
+    def _assert_constante(self, url, preparar):
+        """Mede o endpoint com 2 e com 12 filmes e compara o número de queries."""
+        preparar(self._criar_filmes(2))
+        poucos, dados = self._contar_queries(url)
+        preparar(self._criar_filmes(10))
+        muitos, dados_muitos = self._contar_queries(url)
+        self.assertEqual(poucos, muitos)
+        return dados, dados_muitos
+
+    def test_my_rated_movies(self):
+        _, dados = self._assert_constante('/api/movies/my_rated/', self._adicionar_atividades)
+        self.assertEqual(dados['total'], 12)
+        self.assertEqual(dados['results'][0]['user_rating'], 8)
+
+    def test_my_rated_movies_cursor(self):
+        self._assert_constante('/api/movies/my_rated/?limit=5', self._adicionar_atividades)
+
+    def test_list_watch_later(self):
+        _, dados = self._assert_constante('/api/movies/watch_later/', self._adicionar_atividades)
+        self.assertEqual(dados['total'], 12)
+
+    def test_list_user_favorites(self):
+        _, dados = self._assert_constante('/api/movies/favorites/', self._adicionar_atividades)
+        self.assertEqual(dados['total'], 12)
+        cartao = dados['results'][0]
+        self.assertEqual(cartao['genre_ids'], cartao['genres'])
+        self.assertEqual(cartao['movie_id'], cartao['id'])
+
+    def test_recommendations(self):
+        def recomendar(filmes):
+            ids = list(Filme.objects.order_by('id').values_list('id', flat=True))
+            for filme in filmes:
+                AtividadeUsuario.objects.create(usuario=self.outro, filme=filme, rating=6)
+            RecomendacaoUsuario.objects.update_or_create(
+                usuario=self.usuario,
+                defaults={
+                    'filme_ids': ids,
+                    'motor': 'popular',
+                    'eventos_pendentes': 0,
+                    'calculado_em': timezone.now(),
+                },
+            )
+
+        _, dados = self._assert_constante('/api/movies/recommendations/', recomendar)
+        self.assertEqual(dados['total'], 12)
+        self.assertEqual(dados['recommendations'][0]['user_rating_average'], 6.0)
+        self.assertEqual(dados['recommendations'][0]['genres'], ['Ação'])
+
+    @override_settings(MOVIE_CARD_CACHE_TTL=0)
+    def test_sparse_fields(self):
+        self._adicionar_atividades(self._criar_filmes(3))
+        completo, _ = self._contar_queries('/api/movies/favorites/')
+        reduzido, dados = self._contar_queries(
+            '/api/movies/favorites/?fields=id,title,poster_url&overview_chars=3'
+        )
+        # Sem "genres" a query dos géneros não é feita
+        self.assertEqual(reduzido, completo - 1)
+        self.assertEqual(set(dados['results'][0]), {'id', 'title', 'poster_url'})
+
+        _, dados = self._contar_queries('/api/movies/my_rated/?fields=overview&overview_chars=3')
+        self.assertEqual(dados['results'][0], {'overview': 'Sin…'})
+
+        response = self.client.get('/api/movies/watch_later/?fields=id,capa')
+        self.assertEqual(response.status_code, 400)
+
+    def test_card_fragment_cache(self):
+        filmes = self._criar_filmes(3)
+        self._adicionar_atividades(filmes)
+        _, dados = self._contar_queries('/api/movies/favorites/')
+
+        # Filmes e géneros vêm do L1 da cache de fragmentos
+        with CaptureQueriesContext(connection) as queries:
+            dados_cache = self.client.get('/api/movies/favorites/').json()
+        self.assertEqual(dados_cache, dados)
+        tabelas = ('FROM "api_filme"', 'api_filme_generos', 'cache_partilhada')
+        self.assertFalse([q for q in queries if any(t in q['sql'] for t in tabelas)])
+
+        # Com o L1 vazio (outro worker) os cartões vêm do L2
+        card_cache._l1.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/movies/favorites/').json(), dados)
+        self.assertFalse([q for q in queries if 'FROM "api_filme' in q['sql']])
+
+        # Gravar o filme ou mudar os géneros invalida o fragmento
+        filmes[0].nome = "Novo título"
+        filmes[0].save()
+        filmes[1].generos.set([self.generos[2]])
+        _, dados = self._contar_queries('/api/movies/favorites/?fields=id,title,genres')
+        por_id = {item['id']: item for item in dados['results']}
+        self.assertEqual(por_id[filmes[0].id]['title'], "Novo título")
+        self.assertEqual(por_id[filmes[1].id]['genres'], ['Drama'])
+
+        _, dados = self._contar_queries(f'/api/movies/{filmes[0].id}/')
+        self.assertEqual(dados['title'], "Novo título")
+        self.assertTrue(dados['favorito'])
+
+
+class MovieStateTests(TestCase):
+    """
+    Estado do utilizador para vários filmes (GET /api/movies/state/).
+
+    Requisito R08: Favoritos / Watchlist
+    Requisito RNF-01: Performance e Tempo de Resposta
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(nome="Teste", email="teste@example.com", password_hash="x")
+        outro = Usuario.objects.create(nome="Outro", email="outro@example.com", password_hash="x")
+        cls.filmes = [Filme.objects.create(nome=f"Filme {i}", rating_tmdb=7.0) for i in range(3)]
+        AtividadeUsuario.objects.create(usuario=cls.usuario, filme=cls.filmes[0], rating=8, favorito=True)
+        AtividadeUsuario.objects.create(usuario=cls.usuario, filme=cls.filmes[2], visto=True, ver_mais_tarde=True)
+        AtividadeUsuario.objects.create(usuario=outro, filme=cls.filmes[1], rating=3, favorito=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.usuario)
+
+    def test_single_query_aligned_with_ids(self):
+        a, b, c = (filme.id for filme in self.filmes)
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/movies/state/?ids={c},{a}&ids={b},{a}')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'ids': [c, a, b],
+            'rating': [None, 8, None],
+            'favorito': [False, True, False],
+            'visto': [True, False, False],
+            'ver_mais_tarde': [True, False, False],
+        })
+
+    def test_empty_and_invalid_ids(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/movies/state/')
+        self.assertEqual(response.json()['ids'], [])
+        self.assertEqual(response.json()['rating'], [])
+
+        self.assertEqual(self.client.get('/api/movies/state/?ids=1,x').status_code, 400)
+        ids = ','.join(str(i) for i in range(1, 202))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(f'/api/movies/state/?ids={ids}').status_code, 400)
+
+
+class EstimatedCountPaginationTests(TestCase):
+    """
+    Paginação do histórico sem COUNT(*) exato (GET /api/history/watched/).
+
+    Requisito RF-09: Histórico de Interação
+    Requisito RNF-01: Performance e Tempo de Resposta
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(nome="Teste", email="teste@example.com", password_hash="x")
+        agora = timezone.now()
+        cls.filmes = []
+        for i in range(5):
+            filme = Filme.objects.create(nome=f"Filme {i}", rating_tmdb=7.0)
+            historico = HistoricoVisualizacao.objects.create(usuario=cls.usuario, filme=filme)
+            HistoricoVisualizacao.objects.filter(pk=historico.pk).update(
+                data_visualizacao=agora - timedelta(hours=i)
+            )
+            cls.filmes.append(filme)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.usuario)
+
+    def _pagina(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q['sql'] for q in queries if 'COUNT(' in q['sql'].upper()])
+        return response.json()
+
+    def test_pages_without_count(self):
+        dados = self._pagina('/api/history/watched/?page_size=2')
+        self.assertTrue(dados['has_next'])
+        self.assertFalse(dados['count_exact'])
+        self.assertGreaterEqual(dados['count'], 3)
+        self.assertEqual(dados['next'], 'http://testserver/api/history/watched/?page=2&page_size=2')
+        self.assertIsNone(dados['previous'])
+        self.assertEqual(len(dados['results']), 2)
+
+        dados = self._pagina(dados['next'])
+        self.assertEqual(dados['next'], 'http://testserver/api/history/watched/?page=3&page_size=2')
+        self.assertEqual(dados['previous'], 'http://testserver/api/history/watched/?page_size=2')
+
+        # Última página: total exato sem query extra
+        dados = self._pagina(dados['next'])
+        self.assertFalse(dados['has_next'])
+        self.assertIsNone(dados['next'])
+        self.assertEqual((dados['count'], dados['count_exact']), (5, True))
+        self.assertEqual(len(dados['results']), 1)
+
+    def test_page_beyond_end(self):
+        response = self.client.get('/api/history/watched/?page=4&page_size=2')
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalGetTests(TestCase):
+    """
+    ETag / Last-Modified: 304 Not Modified sem construir o corpo.
+
+    Requisito RNF-01: Performance e Tempo de Resposta
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.genero = Genero.objects.create(nome='Drama')
+        cls.filme = Filme.objects.create(nome="Filme", descricao="Sinopse", rating_tmdb=7.0)
+        cls.filme.generos.set([cls.genero])
+
+    def setUp(self):
+        cache.clear()
+        card_cache.clear()
+        self.usuario = Usuario.objects.create(nome="Teste", email="teste@example.com", password_hash="x")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.usuario)
+
+    def _revalidar(self, url, max_queries):
+        """Primeiro pedido (200) e revalidação com If-None-Match (304)."""
+        primeira = self.client.get(url)
+        self.assertEqual(primeira.status_code, 200)
+        etag = primeira.headers['ETag']
+        with self.assertNumQueries(max_queries):
+            segunda = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(segunda.status_code, 304)
+        self.assertEqual(segunda.headers['ETag'], etag)
+        return etag
+
+    def test_user_me(self):
+        etag = self._revalidar('/api/auth/me/', 0)
+        self.usuario.nome = "Outro nome"
+        self.usuario.save()
+        response = self.client.get('/api/auth/me/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_get_genres(self):
+        url = '/api/movies/genres/'
+        etag = self._revalidar(url, 1)
+        Genero.objects.create(nome='Ação')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_movie_details(self):
+        url = f'/api/movies/{self.filme.id}/'
+        etag = self._revalidar(url, 1)
+        AtividadeUsuario.objects.create(usuario=self.usuario, filme=self.filme, rating=9)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['rating_user'], 9)
+
+    def test_list_reviews(self):
+        url = f'/api/movies/{self.filme.id}/reviews/'
+        etag = self._revalidar(url, 1)
+        AtividadeUsuario.objects.create(usuario=self.usuario, filme=self.filme, review="Bom")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total'], 1)
+        self.assertEqual(self.client.get('/api/movies/999999/reviews/').status_code, 404)
+
+
+class PublicResponseCacheTests(TestCase):
+    """
+    Cache partilhada das respostas anónimas, invalidada por versões.
+
+    Requisito RNF-01: Performance e Tempo de Resposta
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.genero = Genero.objects.create(nome='Drama')
+        cls.filme = Filme.objects.create(nome="Filme", descricao="Sinopse", rating_tmdb=7.0)
+        cls.autor = Usuario.objects.create(nome="Autor", email="autor@example.com", password_hash="x")
+
+    def setUp(self):
+        cache.clear()
+        card_cache.clear()
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        self.client = APIClient()
+
+    def _get(self, url, **extra):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, **extra)
+        return response, [q['sql'] for q in queries]
+
+    def _sem_tabelas_da_api(self, queries):
+        """Só houve queries à tabela da cache."""
+        self.assertTrue(queries)
+        self.assertTrue(all('cache_respostas' in sql for sql in queries), queries)
+
+    def test_genres(self):
+        url = '/api/movies/genres/'
+        primeira, _ = self._get(url)
+        self.assertEqual(primeira.status_code, 200)
+        self.assertIn('public', primeira.headers['Cache-Control'])
+        self.assertIn('Authorization', primeira.headers['Vary'])
+
+        segunda, queries = self._get(url)
+        self._sem_tabelas_da_api(queries)
+        self.assertEqual(segunda.json(), primeira.json())
+
+        revalidada, queries = self._get(url, HTTP_IF_NONE_MATCH=primeira.headers['ETag'])
+        self.assertEqual(revalidada.status_code, 304)
+        self._sem_tabelas_da_api(queries)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Genero.objects.create(nome='Ação')
+        self.assertEqual(self.client.get(url).json()['total'], 2)
+
+    def test_reviews_and_movie(self):
+        reviews = f'/api/movies/{self.filme.id}/reviews/'
+        detalhes = f'/api/movies/{self.filme.id}/'
+        self.assertEqual(self.client.get(reviews).json()['total'], 0)
+        self.assertEqual(self.client.get(detalhes).json()['title'], "Filme")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            AtividadeUsuario.objects.create(usuario=self.autor, filme=self.filme, review="Bom")
+            self.filme.nome = "Novo título"
+            self.filme.save()
+
+        self.assertEqual(self.client.get(reviews).json()['total'], 1)
+        self.assertEqual(self.client.get(detalhes).json()['title'], "Novo título")
+
+    def test_authenticated_bypass(self):
+        usuario = Usuario.objects.create(nome="Teste", email="teste@example.com", password_hash="x")
+        self.client.get('/api/movies/genres/')
+        self.client.force_authenticate(user=usuario)
+        response, queries = self._get('/api/movies/genres/')
+        self.assertFalse(any('cache_respostas' in sql for sql in queries))
+        self.assertNotIn('public', response.headers['Cache-Control'])
+
+
+class TwoTierCacheTests(TestCase):
+    """
+    Cache em dois níveis (LRU em memória + tabela partilhada).
+
+    Requisito RNF-01: Performance e Tempo de Resposta
+    """
+
+    def setUp(self):
+        self.cache = TwoTierCache('teste', l1_max_entries=2, l1_ttl=60, ttl=60)
+        self.cache.clear()
+
+    def test_lru_and_l2(self):
+        self.cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        # O L1 só guarda as 2 entradas mais recentes; "a" vem do L2
+        self.assertEqual(self.cache.get_many(['b', 'c']), {'b': 2, 'c': 3})
+        with self.assertNumQueries(1):
+            self.assertEqual(self.cache.get('a'), 1)
+        stats = self.cache.stats()
+        self.assertEqual(stats['l1_hits'], 2)
+        self.assertEqual(stats['l2_hits'], 1)
+        self.assertEqual(stats['l1_size'], 2)
+
+        self.cache.delete('a')
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_get_or_set(self):
+        chamadas = []
+
+        def carregar():
+            chamadas.append(1)
+            return {'valor': 42}
+
+        self.assertEqual(self.cache.get_or_set('x', carregar), {'valor': 42})
+        self.cache._l1.clear()
+        self.assertEqual(self.cache.get_or_set('x', carregar), {'valor': 42})
+        self.assertEqual(len(chamadas), 1)
+        self.assertEqual(self.cache.stats()['fills'], 1)
+
+    def test_get_or_set_caches_failures(self):
+        chamadas = []
+
+        def carregar():
+            chamadas.append(1)
+            raise RuntimeError("em baixo")
+
+        with self.assertRaises(RuntimeError):
+            self.cache.get_or_set('x', carregar, ttl_erro=30)
+        self.cache._l1.clear()
+        with self.assertRaises(FillUnavailable):
+            self.cache.get_or_set('x', carregar, ttl_erro=30)
+        self.assertEqual(len(chamadas), 1)
+        self.assertIsNone(self.cache.get('x'))
+
+    def _other_session(self):
+        ligacao = connection.get_new_connection(connection.get_connection_params())
+        ligacao.autocommit = True
+        self.addCleanup(ligacao.close)
+        return ligacao.cursor()
+
+    def test_get_or_set_bounded_wait(self):
+        # Outro worker está a preencher a mesma chave
+        outro = self._other_session()
+        outro.execute("SELECT pg_advisory_lock(hashtextextended(%s, 0))", ['teste:x'])
+
+        inicio = time.monotonic()
+        with self.assertRaises(FillUnavailable):
+            self.cache.get_or_set('x', lambda: 1, espera=0.2)
+        self.assertLess(time.monotonic() - inicio, 2)
+
+        # Entretanto o outro worker gravou o valor
+        self.cache.set('x', 7)
+        self.cache._l1.clear()
+        self.assertEqual(self.cache.get_or_set('x', lambda: 1, espera=0.2), 7)
+
+    def test_get_or_set_releases_lock_after_database_error(self):
+        def carregar():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT * FROM tabela_inexistente")
+
+        with self.assertRaises(DatabaseError):
+            self.cache.get_or_set('x', carregar)
+
+        # A transação continua utilizável e o lock foi libertado
+        self.assertEqual(self.cache.get_or_set('y', lambda: 2), 2)
+        outro = self._other_session()
+        outro.execute("SELECT pg_try_advisory_lock(hashtextextended(%s, 0))", ['teste:x'])
+        self.assertTrue(outro.fetchone()[0])
+
+
+class InvalidationBusTests(TestCase):
+    """
+    Barramento de invalidação entre workers (LISTEN/NOTIFY).
+
+    Requisito RNF-01: Performance e Tempo de Resposta
+    """
+
+    def setUp(self):
+        estado = dict(invalidation._estado)
+        self.addCleanup(invalidation._estado.update, estado)
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        card_cache.clear()
+        _geracoes_locais.clear()
+
+    def _modo(self, modo):
+        invalidation._estado.update(modo=modo, pid=os.getpid(), geracao=None)
+
+    def test_publish_after_commit(self):
+        card_cache.set('cartao:5:1', {'id': 5})
+        card_cache.set('cartao:50:1', {'id': 50})
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            invalidation.publish('filme:5', 'filme:5')
+            self.assertIn('cartao:5:1', card_cache._l1)
+        self.assertEqual(len(callbacks), 1)
+        self.assertNotIn('cartao:5:1', card_cache._l1)
+        self.assertIn('cartao:50:1', card_cache._l1)
+
+        with CaptureQueriesContext(connection) as queries:
+            invalidation._send(['filme:5'])
+        self.assertEqual(len(queries), 1)
+        self.assertIn('pg_notify', queries[0]['sql'])
+
+    def test_generation_memo(self):
+        self._modo(invalidation.ESCUTA)
+        primeira = current_generations(['generos'])
+        with self.assertNumQueries(0):
+            self.assertEqual(current_generations(['generos']), primeira)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_public_responses('generos')
+        self.assertNotEqual(current_generations(['generos']), primeira)
+
+        # Sem listener, a memória do processo não é usada
+        self._modo(invalidation.PARADO)
+        with self.assertNumQueries(1):
+            current_generations(['generos'])
+
+    def test_generation_counter_fallback(self):
+        self._modo(invalidation.ESCUTA)
+        current_generations(['generos'])
+
+        # Listener desligado: a primeira verificação esvazia a memória
+        self._modo(invalidation.DESLIGADO)
+        self.assertTrue(invalidation.sync())
+        self.assertFalse(_geracoes_locais)
+        current_generations(['generos'])
+        with self.assertNumQueries(1):  # apenas o contador de geração
+            current_generations(['generos'])
+
+        # Outro worker publicou uma invalidação
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nextval(%s)", [invalidation.SEQUENCIA])
+        self.assertTrue(invalidation.sync())
+        self.assertFalse(_geracoes_locais)
+
+
+class AuthenticatedUserCacheTests(TestCase):
+    """
+    Cache do utilizador autenticado por token e modo sem estado.
+
+    Requisito R01: Gestão de Utilizadores
+    Requisito RNF-01: Performance e Tempo de Resposta
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(nome="Teste", email="teste@example.com", password_hash="x")
+
+    def setUp(self):
+        estado = dict(invalidation._estado)
+        self.addCleanup(invalidation._estado.update, estado)
+        invalidation._estado.update(modo=invalidation.ESCUTA, pid=os.getpid())
+        user_cache.evict()
+        self.client = APIClient()
+        self._autenticar(claims=False)
+
+    def _autenticar(self, claims=True):
+        refresh = RefreshToken.for_user(self.usuario)
+        if claims:
+            add_user_claims(refresh, self.usuario)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def _queries_usuario(self, metodo, url, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, metodo)(url, **kwargs)
+        return response, sum('FROM "api_usuario"' in q['sql'] for q in queries)
+
+    def test_cached_until_update(self):
+        self.assertEqual(self._queries_usuario('get', '/api/auth/me/')[1], 1)
+        response, queries = self._queries_usuario('get', '/api/auth/me/')
+        self.assertEqual(queries, 0)
+        self.assertEqual(response.json()['nome'], "Teste")
+
+        # Alterações feitas pela view (sem gravar) não chegam à cache
+        response = self.client.put(
+            '/api/auth/me/update/', {'nome': "Outro", 'password': "123456"}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/api/auth/me/').json()['nome'], "Teste")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put('/api/auth/me/update/', {'nome': "Novo nome"}, format='json')
+        response, queries = self._queries_usuario('get', '/api/auth/me/')
+        self.assertEqual(queries, 1)
+        self.assertEqual(response.json()['nome'], "Novo nome")
+
+    def test_logout(self):
+        self.client.get('/api/auth/me/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/auth/logout/')
+        self.assertEqual(self._queries_usuario('get', '/api/auth/me/')[1], 1)
+
+    def test_no_listener(self):
+        invalidation._estado['modo'] = invalidation.PARADO
+        self.client.get('/api/auth/me/')
+        self.assertEqual(self._queries_usuario('get', '/api/auth/me/')[1], 1)
+
+    @override_settings(AUTH_STATELESS=True)
+    def test_stateless(self):
+        self._autenticar()
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/auth/me/')
+        self.assertEqual(response.json()['email'], "teste@example.com")
+        self.assertEqual(response.json()['updated_at'], self.usuario.updated_at.isoformat())
+
+        # Tokens sem os claims usam a base de dados
+        user_cache.evict()
+        self._autenticar(claims=False)
+        self.assertEqual(self._queries_usuario('get', '/api/auth/me/')[1], 1)
+
+
+class BatchActivityTests(TestCase):
+    """
+    Escritas em lote (POST /api/movies/batch/).
+
+    Requisito R04: Avaliações
+    Requisito R09: Ver Mais Tarde
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(nome="Teste", email="teste@example.com", password_hash="x")
+        cls.filme = Filme.objects.create(nome="Filme", rating_tmdb=7.0)
+
+    def test_partial_update_keeps_other_fields(self):
+        write_activity(self.usuario.id, self.filme.id, {'rating': 8, 'favorito': True})
+        client = APIClient()
+        client.force_authenticate(user=self.usuario)
+        response = client.post('/api/movies/batch/', {'operations': [
+            {'op': 'watch_later', 'movie_id': self.filme.id},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 0)
+        atividade = AtividadeUsuario.objects.get(usuario=self.usuario, filme=self.filme)
+        self.assertEqual(atividade.rating, 8)
+        self.assertTrue(atividade.favorito)
+        self.assertTrue(atividade.ver_mais_tarde)
+        self.assertIsNotNone(atividade.data_adicao_favoritos)
+
+    def test_cowatch_failure_after_commit_is_logged(self):
+        client = APIClient()
+        client.force_authenticate(user=self.usuario)
+        with mock.patch('api.activity.update_cowatch_many', side_effect=RuntimeError("grafo")), \
+                self.assertLogs('django', 'ERROR'), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/api/movies/batch/', {'operations': [
+                {'op': 'favorite', 'movie_id': self.filme.id},
+            ]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(AtividadeUsuario.objects.get(usuario=self.usuario, filme=self.filme).favorito)
+
+
+class ConcurrentActivityWriteTests(TransactionTestCase):
+    """
+    Primeiras escritas concorrentes da mesma atividade (duas ligações).
+
+    Requisito R04: Avaliações
+    Requisito R08: Favoritos
+    """
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create(nome="Teste", email="teste@example.com", password_hash="x")
+        self.filme = Filme.objects.create(nome="Filme", rating_tmdb=7.0)
+        self.outro = Filme.objects.create(nome="Outro", rating_tmdb=6.0)
+
+    def _concorrente(self, segunda):
+        """
+        Grava rating=8 numa transação que só faz commit depois de a segunda
+        escrita (noutra ligação) ter começado e ficado à espera.
+        """
+        escrito, libertar = threading.Event(), threading.Event()
+        resultados = {}
+
+        def primeira():
+            try:
+                with transaction.atomic():
+                    resultados['primeira'] = write_activity(self.usuario.id, self.filme.id, {'rating': 8})
+                    escrito.set()
+                    libertar.wait(5)
+            finally:
+                connection.close()
+
+        def outra():
+            try:
+                resultados['segunda'] = segunda()
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=primeira), threading.Thread(target=outra)]
+        threads[0].start()
+        escrito.wait(5)
+        threads[1].start()
+        time.sleep(0.3)
+        libertar.set()
+        for thread in threads:
+            thread.join(10)
+        return resultados
+
+    def test_concurrent_first_writes(self):
+        resultados = self._concorrente(
+            lambda: write_activity(self.usuario.id, self.filme.id, {'favorito': True})
+        )
+
+        atividade = AtividadeUsuario.objects.get(usuario=self.usuario, filme=self.filme)
+        self.assertEqual((atividade.rating, atividade.favorito), (8, True))
+        self.assertTrue(resultados['primeira'].criado)
+        self.assertFalse(resultados['segunda'].criado)
+        self.assertEqual(resultados['segunda'].antes, (8, False, False, False))
+
+    def test_concurrent_batch(self):
+        resultados = self._concorrente(lambda: write_activities(self.usuario.id, {
+            self.filme.id: {'ver_mais_tarde': True},
+            self.outro.id: {'ver_mais_tarde': True},
+        }))
+
+        atividade = AtividadeUsuario.objects.get(usuario=self.usuario, filme=self.filme)
+        self.assertEqual((atividade.rating, atividade.ver_mais_tarde), (8, True))
+        por_filme = {r.filme_id: r for r in resultados['segunda']}
+        self.assertFalse(por_filme[self.filme.id].criado)
+        self.assertEqual(por_filme[self.filme.id].antes, (8, False, False, False))
+        self.assertTrue(por_filme[self.outro.id].criado)
+
+
+class ConcurrentRecommendationRefreshTests(TransactionTestCase):
+    """
+    Primeiro cálculo concorrente da lista de recomendações de um utilizador.
+
+    Requisito RF-10: Motor de Recomendação
+    """
+
+    def test_concurrent_first_refresh(self):
+        usuario = Usuario.objects.create(nome="Teste", email="teste@example.com", password_hash="x")
+        filme = Filme.objects.create(nome="Filme", rating_tmdb=7.0)
+        AtividadeUsuario.objects.create(usuario=usuario, filme=filme, rating=9)
+
+        gravado, libertar = threading.Event(), threading.Event()
+        erros = []
+
+        def primeiro():
+            try:
+                with transaction.atomic():
+                    refresh_recommendations(usuario.id)
+                    gravado.set()
+                    libertar.wait(5)
+            except Exception as erro:
+                erros.append(erro)
+            finally:
+                connection.close()
+
+        def segundo():
+            try:
+                refresh_recommendations(usuario.id)
+            except Exception as erro:
+                erros.append(erro)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=primeiro), threading.Thread(target=segundo)]
+        threads[0].start()
+        gravado.wait(5)
+        threads[1].start()
+        time.sleep(0.3)
+        libertar.set()
+        for thread in threads:
+            thread.join(10)
+
+        self.assertEqual(erros, [])
+        self.assertEqual(RecomendacaoUsuario.objects.filter(usuario=usuario).count(), 1)
+
+
+class CowatchConcurrencyTests(TransactionTestCase):
+    """
+    Eventos concorrentes de coocorrência com os mesmos dois filmes.
+
+    Requisito RF-10: Motor de Recomendação
+    """
+
+    def test_opposite_events_do_not_deadlock(self):
+        a, b = (Filme.objects.create(nome=f"Filme {i}", rating_tmdb=7.0) for i in range(2))
+        usuarios = []
+        for i, ja_visto in enumerate((b, a)):
+            usuario = Usuario.objects.create(nome=f"U{i}", email=f"u{i}@example.com", password_hash="x")
+            AtividadeUsuario.objects.create(usuario=usuario, filme=ja_visto, visto=True)
+            usuarios.append(usuario)
+        CoocorrenciaFilmes.objects.bulk_create([
+            CoocorrenciaFilmes(filme=a, outro_filme=b, contagem=1),
+            CoocorrenciaFilmes(filme=b, outro_filme=a, contagem=1),
+        ])
+
+        # Outra sessão bloqueia (a, b): os dois eventos ficam à espera dela
+        ligacao = connection.get_new_connection(connection.get_connection_params())
+        self.addCleanup(ligacao.close)
+        ligacao.cursor().execute(
+            f"SELECT 1 FROM {CoocorrenciaFilmes._meta.db_table} "
+            "WHERE filme_id = %s AND outro_filme_id = %s FOR UPDATE",
+            [a.id, b.id],
+        )
+
+        erros = []
+
+        def evento(usuario, filme):
+            try:
+                update_cowatch_many(usuario.id, [(filme.id, None, (None, False, True, False))])
+            except Exception as erro:
+                erros.append(erro)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=evento, args=(usuarios[0], a)),
+            threading.Thread(target=evento, args=(usuarios[1], b)),
+        ]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.3)
+        ligacao.rollback()
+        for thread in threads:
+            thread.join(10)
+
+        self.assertEqual(erros, [])
+        self.assertEqual(
+            sorted(CoocorrenciaFilmes.objects.values_list('contagem', flat=True)), [3, 3]
+        )
+
+
+class LibrarySyncTests(TestCase):
+    """
+    Sincronização incremental da biblioteca (GET /api/user/library/).
+
+    Requisito R04: Avaliações
+    Requisito RNF-01: Performance e Tempo de Resposta
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(nome="Teste", email="teste@example.com", password_hash="x")
+        cls.filmes = [Filme.objects.create(nome=f"Filme {i}", rating_tmdb=7.0) for i in range(3)]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.usuario)
+
+    def _library(self, token=None):
+        return self.client.get('/api/user/library/', {'since': token} if token else {}).json()
+
+    def test_delta(self):
+        write_activity(self.usuario.id, self.filmes[0].id, {'rating': 7})
+        token = self._library()['sync_token']
+        write_activity(self.usuario.id, self.filmes[1].id, {'favorito': True})
+
+        delta = self._library(token)
+        self.assertFalse(delta['full'])
+        self.assertIn(self.filmes[1].id, delta['ids'])
+
+    def test_delete_and_create_in_same_interval(self):
+        write_activity(self.usuario.id, self.filmes[0].id, {'rating': 7})
+        write_activity(self.usuario.id, self.filmes[1].id, {'rating': 6})
+        token = self._library()['sync_token']
+
+        # O filme 0 sai da biblioteca e entra uma linha com created_at
+        # anterior ao token (transação confirmada depois de o token ser
+        # emitido): o número de linhas bate certo com o do token
+        self.filmes[0].delete()
+        write_activity(self.usuario.id, self.filmes[2].id, {'rating': 9})
+        AtividadeUsuario.objects.filter(filme=self.filmes[2]).update(
+            created_at=timezone.now() - timedelta(minutes=1)
+        )
+
+        resposta = self._library(token)
+        self.assertTrue(resposta['full'])
+        self.assertEqual(sorted(resposta['ids']), [self.filmes[1].id, self.filmes[2].id])
+
+    def test_old_token_format(self):
+        self.assertTrue(self._library('1700000000000000.3')['full'])
+
+
+class CowatchRebuildTests(TestCase):
+    """
+    Reconstrução completa do grafo de coocorrência (build_cowatch).
+
+    Requisito RF-10: Motor de Recomendação
+    """
+
+    def test_rebuild_across_blocks(self):
+        filmes = [Filme.objects.create(nome=f"Filme {i}", rating_tmdb=7.0) for i in range(3)]
+        agora = timezone.now()
+        for i, (nome, vistos) in enumerate([("A", [0, 1, 2]), ("B", [0, 1])]):
+            usuario = Usuario.objects.create(nome=nome, email=f"{nome}@example.com", password_hash="x")
+            for j in vistos:
+                AtividadeUsuario.objects.create(usuario=usuario, filme=filmes[j], visto=True)
+                AtividadeUsuario.objects.filter(usuario=usuario, filme=filmes[j]).update(
+                    updated_at=agora - timedelta(minutes=10 * i + 3 - j)
+                )
+
+        # Blocos de 2 linhas: as de A ficam em dois blocos; só contam os
+        # 2 filmes mais recentes de cada utilizador
+        self.assertEqual(rebuild_cowatch(max_fan_out=2, top_n=5, batch_size=2), (4, 3))
+        contagens = {
+            (par.filme_id, par.outro_filme_id): par.contagem
+            for par in CoocorrenciaFilmes.objects.all()
+        }
+        f0, f1, f2 = (filme.id for filme in filmes)
+        self.assertEqual(contagens, {(f0, f1): 1, (f1, f0): 1, (f1, f2): 1, (f2, f1): 1})
+        self.assertEqual(sorted(TopCoocorrencia.objects.get(filme_id=f1).filme_ids), sorted([f0, f2]))
+
+
+class ALSTests(TestCase):
+    """
+    Treino e serviço do modelo ALS.
+
+    Requisito RF-10: Motor de Recomendação
+    """
+
+    @staticmethod
+    def _linhas(num_usuarios=40, num_filmes=30, seed=0):
+        rng = np.random.default_rng(seed)
+        linhas = []
+        for u in range(1, num_usuarios + 1):
+            for f in rng.choice(num_filmes, size=8, replace=False):
+                rating = int(rng.integers(1, 11)) if rng.random() < 0.6 else None
+                linhas.append((
+                    u, int(f) + 1, rating,
+                    bool(rng.random() < 0.3), bool(rng.random() < 0.5), bool(rng.random() < 0.3),
+                ))
+        return linhas
+
+    def test_fold_in_matches_trained_factors(self):
+        linhas = self._linhas()
+        pref, conf, user_ids, item_ids = als_matrices_from_rows(linhas)
+        user_factors, item_factors = train_als(pref, conf, factors=8, iterations=40)
+        modelo = ALSModel('teste', user_factors, item_factors, user_ids, item_ids)
+
+        for i, usuario_id in enumerate(user_ids):
+            historico = als_history([linha[1:] for linha in linhas if linha[0] == usuario_id])
+            vetor = modelo.fold_in(historico)
+            erro = np.linalg.norm(vetor - user_factors[i]) / np.linalg.norm(user_factors[i])
+            self.assertLess(erro, 0.05)
+
+    def test_versions_and_current_switch(self):
+        linhas = self._linhas()
+        pref, conf, user_ids, item_ids = als_matrices_from_rows(linhas)
+        params = {'factors': 4, 'iterations': 2, 'regularization': 0.2, 'alpha': 10.0}
+
+        with tempfile.TemporaryDirectory() as pasta, \
+                override_settings(RECOMMENDER_ARTIFACTS_DIR=Path(pasta)):
+            als._cache.update(version=None, model=None)
+            self.assertIsNone(get_als_model())
+
+            versoes = []
+            for seed in range(4):
+                fatores = train_als(pref, conf, factors=4, iterations=2, seed=seed)
+                versoes.append(save_version(*fatores, user_ids, item_ids, params, keep=2))
+                modelo = get_als_model()
+                # O próximo pedido usa a versão acabada de publicar
+                self.assertEqual(current_version(), versoes[-1])
+                self.assertEqual(modelo.version, versoes[-1])
+                np.testing.assert_array_equal(modelo.user_factors, fatores[0])
+                np.testing.assert_array_equal(modelo.item_ids, item_ids)
+
+            self.assertEqual(len(set(versoes)), 4)
+            self.assertIsInstance(modelo.item_factors, np.memmap)
+            self.assertEqual((modelo.regularization, modelo.alpha), (0.2, 10.0))
+            self.assertEqual(sorted(p.name for p in als.als_dir().iterdir() if p.is_dir()), versoes[-2:])
+
+            # Os filmes do histórico nunca são recomendados
+            historico = als_history([linha[1:] for linha in linhas if linha[0] == 1])
+            recomendados = modelo.recommend(1, historico, limit=5)
+            self.assertEqual(len(recomendados), 5)
+            self.assertFalse(set(recomendados) & set(historico[0].tolist()))
+        als._cache.update(version=None, model=None)
+
+
+class ItemCFTests(TestCase):
+    """
+    Vizinhos item-item (cosseno) e pontuação do histórico.
+
+    Requisito RF-10: Motor de Recomendação
+    """
+
+    def _vizinhos(self):
+        # Filmes 10 e 20 têm os mesmos utilizadores; 30 partilha um com eles
+        # e outro com 40
+        linhas = [
+            (1, 10, None, True, False), (1, 20, None, True, False),
+            (2, 10, None, True, False), (2, 20, None, True, False), (2, 30, None, True, False),
+            (3, 30, None, True, False), (3, 40, None, True, False),
+        ]
+        return ItemNeighbours.build(InteractionMatrix.from_rows(linhas), k=2, block_size=3)
+
+    def test_neighbours_on_hand_built_matrix(self):
+        vizinhos = self._vizinhos()
+        por_filme = {}
+        for i, filme_id in enumerate(vizinhos.item_ids.tolist()):
+            validos = vizinhos.neighbours[i] >= 0
+            por_filme[filme_id] = list(zip(
+                vizinhos.item_ids[vizinhos.neighbours[i][validos]].tolist(),
+                np.round(vizinhos.scores[i][validos].astype(float), 2).tolist(),
+            ))
+
+        self.assertEqual(por_filme[10], [(20, 1.0), (30, 0.5)])
+        self.assertEqual(por_filme[40], [(30, 0.71)])
+        # 30 tem três vizinhos (40: 0.71; 10 e 20: 0.5); com k=2 fica 40 e um dos empatados
+        self.assertEqual(por_filme[30][0], (40, 0.71))
+        self.assertEqual(len(por_filme[30]), 2)
+
+        self.assertEqual(vizinhos.recommend([10], [1.0]), [20, 30])
+        self.assertEqual(vizinhos.recommend([10], [1.0], exclude_ids=[10, 20]), [30])
+        self.assertEqual(vizinhos.recommend([99], [1.0]), [])
+
+    def test_save_and_reload(self):
+        with tempfile.TemporaryDirectory() as pasta, \
+                override_settings(RECOMMENDER_ARTIFACTS_DIR=Path(pasta)):
+            item_cf._cache.update(mtime=None, model=None)
+            self.assertIsNone(get_item_neighbours())
+
+            vizinhos = self._vizinhos()
+            vizinhos.save(item_cf.artifact_path())
+            carregado = get_item_neighbours()
+            np.testing.assert_array_equal(carregado.item_ids, vizinhos.item_ids)
+            np.testing.assert_array_equal(carregado.neighbours, vizinhos.neighbours)
+            np.testing.assert_array_equal(carregado.scores, vizinhos.scores)
+            self.assertIs(get_item_neighbours(), carregado)
+        item_cf._cache.update(mtime=None, model=None)
+
+
+class RecommendationEngineTests(TestCase):
+    """
+    Ordem dos motores em compute_recommendations: modelo offline, perfil de
+    gosto (géneros) e populares.
+
+    Requisito RF-10: Motor de Recomendação
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        aventura, drama = Genero.objects.create(nome='Aventura'), Genero.objects.create(nome='Drama')
+        cls.filmes = []
+        for i in range(7):
+            filme = Filme.objects.create(nome=f"Filme {i}", rating_tmdb=5.0 + i / 2)
+            filme.generos.add(aventura if i in (0, 1, 2, 6) else drama)
+            cls.filmes.append(filme)
+        cls.usuario = Usuario.objects.create(nome="Teste", email="teste@example.com", password_hash="x")
+        for filme in cls.filmes[:3]:
+            AtividadeUsuario.objects.create(usuario=cls.usuario, filme=filme, rating=9)
+
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.pasta = Path(pasta.name)
+        ajuste = override_settings(RECOMMENDER_ARTIFACTS_DIR=self.pasta, RECOMMENDER_ENGINES=['als', 'item_cf'])
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+        for modulo_cache in (catalogue._cache, item_cf._cache, als._cache):
+            for chave in modulo_cache:
+                modulo_cache[chave] = None
+
+    def test_offline_engine_first(self):
+        ids = np.array([filme.id for filme in self.filmes], dtype=np.int64)
+        vizinhos = np.full((ids.size, 1), -1, dtype=np.int32)
+        vizinhos[0, 0] = 4
+        ItemNeighbours(ids, vizinhos, np.ones((ids.size, 1), dtype=np.float16)).save(
+            item_cf.artifact_path()
+        )
+
+        filme_ids, motor, num_positivas = compute_recommendations(self.usuario.id)
+        self.assertEqual((filme_ids, motor, num_positivas), ([self.filmes[4].id], 'item_cf', 3))
+
+    def test_genres_without_offline_model(self):
+        filme_ids, motor, _ = compute_recommendations(self.usuario.id)
+        self.assertEqual((filme_ids, motor), ([self.filmes[6].id], 'genres'))
+
+    def test_popular_without_history(self):
+        outro = Usuario.objects.create(nome="Outro", email="outro@example.com", password_hash="x")
+        filme_ids, motor, num_positivas = compute_recommendations(outro.id, limit=3)
+        self.assertEqual(motor, 'popular')
+        self.assertEqual(num_positivas, 0)
+        self.assertEqual(len(filme_ids), 3)
+        self.assertTrue(set(filme_ids) <= {filme.id for filme in self.filmes})
+
+    def test_generate_for_users_upserts(self):
+        antigo = timezone.now() - timedelta(days=2)
+        RecomendacaoUsuario.objects.create(
+            usuario=self.usuario, filme_ids=[self.filmes[5].id], motor='popular',
+            num_avaliacoes_positivas=0, eventos_pendentes=4, calculado_em=antigo,
+        )
+        outro = Usuario.objects.create(nome="Outro", email="outro@example.com", password_hash="x")
+
+        self.assertEqual(generate_for_users([self.usuario.id, outro.id], limit=3), 2)
+
+        self.assertEqual(RecomendacaoUsuario.objects.filter(usuario=self.usuario).count(), 1)
+        recomendacao = RecomendacaoUsuario.objects.get(usuario=self.usuario)
+        self.assertEqual(recomendacao.filme_ids, [self.filmes[6].id])
+        self.assertEqual((recomendacao.motor, recomendacao.num_avaliacoes_positivas), ('genres', 3))
+        self.assertEqual(recomendacao.eventos_pendentes, 0)
+        self.assertGreater(recomendacao.calculado_em, antigo)
+        self.assertEqual(RecomendacaoUsuario.objects.get(usuario=outro).motor, 'popular')
+
+
+class TrendingTests(TestCase):
+    """
+    Tendências locais com decaimento exponencial.
+
+    Requisito RF-11: Tendências/Populares
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.filmes = [Filme.objects.create(nome=f"Filme {i}", rating_tmdb=7.0) for i in range(4)]
+
+    def setUp(self):
+        trending._cache.clear()
+        self.agora = timezone.now().replace(minute=0, second=0, microsecond=0)
+
+    @override_settings(TRENDING_HALF_LIFE_HOURS={'day': 6.0, 'week': 48.0})
+    def test_decayed_order(self):
+        a, b, c, _ = (filme.id for filme in self.filmes)
+        record_events({a: 10.0}, quando=self.agora - timedelta(hours=48))
+        record_events({b: 4.0}, quando=self.agora - timedelta(hours=1))
+        # Dois eventos na mesma hora somam no mesmo bucket
+        record_event(c, 1.0, quando=self.agora + timedelta(minutes=5))
+        record_event(c, 2.0, quando=self.agora + timedelta(minutes=40))
+        self.assertEqual(TendenciaHoraria.objects.filter(filme_id=c).count(), 1)
+
+        semana = compute_trending('week', 10, agora=self.agora)
+        self.assertEqual([f for f, _ in semana], [a, b, c])
+        self.assertAlmostEqual(semana[0][1], 10.0 * 0.5, places=4)
+        self.assertAlmostEqual(semana[1][1], 4.0 * 2 ** (-1 / 48), places=4)
+        self.assertAlmostEqual(semana[2][1], 3.0, places=4)
+
+        # 48 h são 8 meias-vidas do período "day": fora da janela
+        dia = compute_trending('day', 10, agora=self.agora)
+        self.assertEqual([f for f, _ in dia], [b, c])
+        self.assertAlmostEqual(dia[0][1], 4.0 * 2 ** (-1 / 6), places=4)
+
+    @override_settings(TRENDING_HALF_LIFE_HOURS={'day': 6.0, 'week': 48.0})
+    def test_prune_on_new_bucket(self):
+        filme_id = self.filmes[3].id
+        fora = self.agora - timedelta(hours=48 * trending.JANELA_MEIAS_VIDAS + 1)
+        record_event(filme_id, 1.0, quando=fora)
+        record_event(filme_id, 1.0, quando=self.agora)
+        self.assertEqual(
+            list(TendenciaHoraria.objects.filter(filme_id=filme_id).values_list('hora', flat=True)),
+            [self.agora],
+        )
+
+        # Também no upsert em lote
+        record_events({filme_id: 1.0}, quando=fora)
+        record_events({filme_id: 1.0}, quando=self.agora + timedelta(hours=1))
+        self.assertEqual(
+            sorted(TendenciaHoraria.objects.filter(filme_id=filme_id).values_list('hora', flat=True)),
+            [self.agora, self.agora + timedelta(hours=1)],
+        )
+
+    @override_settings(TRENDING_REFRESH_SECONDS=60)
+    def test_in_memory_top_refresh(self):
+        record_events({self.filmes[0].id: 1.0})
+        self.assertEqual([f for f, _ in get_trending('week')], [self.filmes[0].id])
+
+        record_events({self.filmes[1].id: 5.0})
+        with self.assertNumQueries(0):
+            self.assertEqual([f for f, _ in get_trending('week')], [self.filmes[0].id])
+
+        with override_settings(TRENDING_REFRESH_SECONDS=-1):
+            self.assertEqual(
+                [f for f, _ in get_trending('week')], [self.filmes[1].id, self.filmes[0].id]
+            )
+
+    @override_settings(TMDB_API_KEY='chave')
+    def test_tmdb_failure_uses_local_trending(self):
+        tmdb_cache.clear()
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        record_events({self.filmes[2].id: 3.0})
+
+        with mock.patch('api.services.requests.get', side_effect=requests.exceptions.ConnectionError) as get:
+            respostas = [APIClient().get('/api/movies/trending/', {'period': 'day'}) for _ in range(2)]
+
+        for resposta in respostas:
+            self.assertEqual(resposta.status_code, 200)
+            self.assertEqual((resposta.json()['source'], resposta.json()['fallback']), ('local', True))
+            self.assertEqual(resposta.json()['results'][0]['id'], self.filmes[2].id)
+        # A falha fica em cache: a TMDB só é chamada uma vez
+        self.assertEqual(get.call_count, 1)
+
+
+class MinHashTests(TestCase):
+    """
+    Assinaturas MinHash e índice LSH de utilizadores semelhantes.
+
+    Requisito RF-10: Motor de Recomendação
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.filmes = [Filme.objects.create(nome=f"Filme {i}", rating_tmdb=7.0) for i in range(5)]
+        cls.usuarios = [
+            Usuario.objects.create(nome=f"U{i}", email=f"u{i}@example.com", password_hash="x")
+            for i in range(4)
+        ]
+
+    def _indice(self, usuario):
+        registo = AssinaturaUsuario.objects.get(usuario=usuario)
+        buckets = set(BucketLSH.objects.filter(usuario=usuario).values_list('banda', 'chave'))
+        return bytes(registo.assinatura), registo.num_filmes, buckets
+
+    def test_incremental_updates_match_rebuild(self):
+        usuario = self.usuarios[0]
+        a, b, c = (filme.id for filme in self.filmes[:3])
+        with self.captureOnCommitCallbacks(execute=True):
+            write_activity(usuario.id, a, {'favorito': True})
+        with self.captureOnCommitCallbacks(execute=True):
+            write_activities(usuario.id, {b: {'favorito': True}, c: {'favorito': True}})
+        self.assertEqual(self._indice(usuario)[0], encode(signature([a, b, c])))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            write_activity(usuario.id, c, {'favorito': False})
+        incremental = self._indice(usuario)
+        self.assertEqual(incremental[:2], (encode(signature([a, b])), 2))
+
+        self.assertEqual(rebuild_index(), 1)
+        self.assertEqual(self._indice(usuario), incremental)
+
+    def test_rebuild_in_small_blocks(self):
+        conjuntos = [[0, 1, 2], [0, 1, 2], [0, 1, 3], [3, 4]]
+        for usuario, filmes in zip(self.usuarios, conjuntos):
+            for i in filmes:
+                AtividadeUsuario.objects.create(usuario=usuario, filme=self.filmes[i], visto=True)
+
+        # Blocos de 2 linhas: cada utilizador ocupa mais de um bloco
+        self.assertEqual(rebuild_index(chunk_rows=2), 4)
+        for usuario, filmes in zip(self.usuarios, conjuntos):
+            assinatura, num_filmes, _ = self._indice(usuario)
+            self.assertEqual(assinatura, encode(signature([self.filmes[i].id for i in filmes])))
+            self.assertEqual(num_filmes, len(filmes))
+
+        # O utilizador com o mesmo conjunto vem primeiro, com semelhança 1
+        semelhantes = similar_users(self.usuarios[0].id)
+        self.assertEqual(semelhantes[0], (self.usuarios[1].id, 1.0))
+        self.assertNotIn(self.usuarios[0].id, [u for u, _ in semelhantes])
+
+
+class CandidateSamplerTests(TestCase):
+    """
+    Amostragem ponderada de candidatos (pools por rating e por género).
+
+    Requisito RF-10: Motor de Recomendação
+    """
+
+    def setUp(self):
+        ids = np.arange(1, 21, dtype=np.int64)
+        ratings = np.linspace(5.0, 9.0, ids.size).astype(np.float32)
+        ratings[0] = np.nan
+        generos = sparse.csr_matrix(
+            (np.ones(ids.size, dtype=np.float32), (np.arange(ids.size), ids % 2)), shape=(ids.size, 2)
+        )
+        catalogo = catalogue.Catalogue(ids, ratings, np.zeros(ids.size, dtype=np.int32), ['par', 'impar'], generos)
+        self.pools = CandidatePools(catalogo, pool_size=15)
+
+    def test_never_returns_excluded_ids(self):
+        excluidos = list(range(2, 21, 3))
+        rng = np.random.default_rng(0)
+        for _ in range(200):
+            amostra = self.pools.sample(exclude_ids=excluidos, limit=10, rng=rng)
+            self.assertEqual(len(amostra), 10)
+            self.assertEqual(len(set(amostra)), 10)
+            self.assertFalse(set(amostra) & set(excluidos))
+            # Pool global: os 15 melhores ratings (o filme 1 não tem rating)
+            self.assertTrue(set(amostra) <= set(range(6, 21)))
+
+    def test_genre_pools_and_exhaustion(self):
+        amostra = self.pools.sample(genre_positions=[0], limit=50, rng=np.random.default_rng(1))
+        self.assertEqual(sorted(amostra), list(range(2, 21, 2)))
+
+        pares = list(range(2, 21, 2))
+        self.assertEqual(self.pools.sample(genre_positions=[0], exclude_ids=pares, limit=5), [])
+        self.assertEqual(self.pools.sample(genre_positions=[], limit=5), [])
+
+
+class TasteProfileTests(TestCase):
+    """
+    Perfil de gosto incremental (afinidade por género e década).
+
+    Requisito RF-10: Motor de Recomendação
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        generos = [Genero.objects.create(nome=nome) for nome in ('Aventura', 'Drama', 'Terror')]
+        cls.filmes = []
+        for i in range(5):
+            filme = Filme.objects.create(nome=f"Filme {i}", rating_tmdb=7.0, ano_lancamento=1985 + 7 * i)
+            filme.generos.add(generos[i % 3], generos[(i + 1) % 3])
+            cls.filmes.append(filme)
+        cls.usuario = Usuario.objects.create(nome="Teste", email="teste@example.com", password_hash="x")
+
+    def setUp(self):
+        catalogue._cache.update(catalogue=None, loaded_at=0.0)
+
+    def _campos(self, perfil):
+        return perfil.generos, perfil.decadas, perfil.num_interacoes
+
+    def test_incremental_matches_rebuild(self):
+        rebuild_profile(self.usuario.id)
+        a, b, c, d, e = (filme.id for filme in self.filmes)
+        write_activity(self.usuario.id, a, {'rating': 9})
+        write_activities(self.usuario.id, {b: {'favorito': True}, c: {'visto': True}, d: {'rating': 2}})
+        write_activity(self.usuario.id, a, {'rating': 4, 'favorito': True})
+        write_activity(self.usuario.id, b, {'favorito': False})
+        write_activities(self.usuario.id, {e: {'ver_mais_tarde': True}, c: {'rating': 10}})
+
+        generos, decadas, num_interacoes = self._campos(PerfilGosto.objects.get(usuario=self.usuario))
+        esperado = self._campos(rebuild_profile(self.usuario.id))
+
+        self.assertEqual(num_interacoes, esperado[2])
+        for atual, reconstruido in ((generos, esperado[0]), (decadas, esperado[1])):
+            self.assertEqual(set(atual), set(reconstruido))
+            for chave, valor in reconstruido.items():
+                self.assertAlmostEqual(atual[chave], valor, places=3)
+
+
+class EvaluationTests(TestCase):
+    """
+    Métricas, divisão temporal e conjunto sintético da avaliação offline.
+
+    Requisito RF-10: Motor de Recomendação
+    """
+
+    def test_metrics(self):
+        recomendados, relevantes = [1, 2, 3, 4, 5], {2, 5, 9}
+        self.assertAlmostEqual(precision_at_k(recomendados, relevantes, 4), 0.25)
+        self.assertAlmostEqual(recall_at_k(recomendados, relevantes, 4), 1 / 3)
+        self.assertAlmostEqual(recall_at_k(recomendados, relevantes, 5), 2 / 3)
+        idcg = 1.0 + 1.0 / np.log2(3) + 0.5
+        self.assertAlmostEqual(ndcg_at_k(recomendados, relevantes, 4), (1.0 / np.log2(3)) / idcg)
+        self.assertAlmostEqual(ndcg_at_k([2, 5, 9], relevantes, 3), 1.0)
+
+    def test_time_split(self):
+        linhas = [(1, filme_id, 8, False, True, False, float(filme_id)) for filme_id in range(10)]
+        treino, teste, corte = time_split(linhas, test_fraction=0.2)
+        self.assertAlmostEqual(corte, 7.2)
+        self.assertEqual([linha[1] for linha in treino], list(range(8)))
+        self.assertEqual([linha[1] for linha in teste], [8, 9])
+        self.assertEqual(time_split([]), ([], [], None))
+
+    def test_synthetic_dataset(self):
+        vazio = catalogue.Catalogue(
+            np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int32), [],
+            sparse.csr_matrix((0, 0), dtype=np.float32),
+        )
+        with self.assertRaises(ValueError):
+            synthetic_dataset(vazio)
+
+        ids = np.arange(1, 11, dtype=np.int64)
+        generos = sparse.csr_matrix(
+            (np.ones(ids.size, dtype=np.float32), (np.arange(ids.size), ids % 2)), shape=(ids.size, 2)
+        )
+        catalogo = catalogue.Catalogue(ids, np.full(ids.size, 7.0, dtype=np.float32),
+                                       np.zeros(ids.size, dtype=np.int32), ['par', 'impar'], generos)
+        linhas = synthetic_dataset(catalogo, num_users=3, interactions=5)
+        self.assertTrue(linhas)
+        self.assertTrue({linha[1] for linha in linhas} <= set(ids.tolist()))
+        self.assertTrue(all(1 <= linha[2] <= 10 for linha in linhas))
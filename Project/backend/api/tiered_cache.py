@@ -0,0 +1,410 @@
+"""
+Cache em dois níveis: LRU em memória (L1) e tabela partilhada (L2).
+
+Requisito RNF-01: Performance e Tempo de Resposta
+
+L1: dicionário LRU por processo, limitado em número de entradas e com TTL
+próprio (curto), sem qualquer I/O.
+
+L2: tabela UNLOGGED cache_partilhada no Postgres (migração 0015), partilhada
+por todos os workers do nó e que sobrevive a reinícios do gunicorn/uvicorn.
+Leituras e escritas de várias chaves são uma única query (get_many /
+set_many), com os valores serializados com pickle.
+
+Preenchimentos coalescidos: em get_or_set, pedidos concorrentes para a
+mesma chave em falta esperam pelo primeiro (um lock por chave no processo
+e um advisory lock do Postgres entre workers), que calcula o valor uma
+única vez e o grava no L2; os restantes leem-no do L2. A espera é limitada
+(TIERED_CACHE_FILL_WAIT): quem não obtém o lock a tempo recebe
+FillUnavailable e pode usar uma alternativa. As falhas de carregar() podem
+ficar em cache durante ttl_erro segundos (cache negativa), para que uma
+dependência em baixo não seja chamada, e esperada, por cada pedido.
+
+O L1 de cada worker pode ser limpo pelos outros através do barramento de
+invalidação (evict_local, chamado pelos subscritores de api.invalidation).
+
+Métricas: cada instância conta acertos e falhas por nível, preenchimentos
+e esperas coalescidas (stats()); o resumo de todas as instâncias é
+escrito no logger "api.cache" a cada TIERED_CACHE_STATS_INTERVAL segundos.
+"""
+
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+
+logger = logging.getLogger('api.cache')
+
+TABELA_L2 = 'cache_partilhada'
+
+_instancias = []
+_ultimo_registo = [time.monotonic()]
+_ultima_limpeza = [time.monotonic()]
+
+
+class TwoTierCache:
+    """
+    Cache L1 (LRU em memória) + L2 (tabela UNLOGGED partilhada).
+
+    Os valores devolvidos pelo L1 são partilhados entre pedidos do mesmo
+    processo: não devem ser alterados por quem os lê.
+
+    Attributes:
+        nome: Prefixo das chaves no L2 e nome nas métricas
+        l1_max_entries: Número máximo de entradas no L1
+        l1_ttl: TTL das entradas no L1 (segundos)
+        ttl: TTL por omissão no L2 (segundos)
+    """
+
+    def __init__(self, nome, l1_max_entries=1000, l1_ttl=60, ttl=300):
+        self.nome = nome
+        self.l1_max_entries = l1_max_entries
+        self.l1_ttl = l1_ttl
+        self.ttl = ttl
+        self._l1 = OrderedDict()
+        self._lock = threading.Lock()
+        self._locks_chave = {}
+        self._contadores = dict.fromkeys(
+            ('l1_hits', 'l1_misses', 'l2_hits', 'l2_misses', 'fills', 'coalesced', 'failures'), 0
+        )
+        _instancias.append(self)
+
+    # ------------------------------------------------------------------
+    # L1
+    # ------------------------------------------------------------------
+
+    def _contar(self, **incrementos):
+        with self._lock:
+            for nome, valor in incrementos.items():
+                self._contadores[nome] += valor
+
+    def _l1_get_many(self, chaves):
+        agora = time.monotonic()
+        encontrados = {}
+        with self._lock:
+            for chave in chaves:
+                entrada = self._l1.get(chave)
+                if entrada is None:
+                    continue
+                expira, valor = entrada
+                if expira < agora:
+                    del self._l1[chave]
+                    continue
+                self._l1.move_to_end(chave)
+                encontrados[chave] = valor
+            self._contadores['l1_hits'] += len(encontrados)
+            self._contadores['l1_misses'] += len(chaves) - len(encontrados)
+        return encontrados
+
+    def _l1_set_many(self, valores, ttl):
+        expira = time.monotonic() + min(self.l1_ttl, ttl)
+        with self._lock:
+            for chave, valor in valores.items():
+                self._l1[chave] = (expira, valor)
+                self._l1.move_to_end(chave)
+            while len(self._l1) > self.l1_max_entries:
+                self._l1.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # L2
+    # ------------------------------------------------------------------
+
+    def _l2_key(self, chave):
+        return f'{self.nome}:{chave}'
+
+    def _l2_get_many(self, chaves):
+        if not chaves:
+            return {}
+        por_chave_l2 = {self._l2_key(chave): chave for chave in chaves}
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT chave, valor FROM {TABELA_L2} WHERE chave = ANY(%s) AND expira_em > %s",
+                [list(por_chave_l2), timezone.now()],
+            )
+            linhas = cursor.fetchall()
+        encontrados = {por_chave_l2[chave]: pickle.loads(bytes(valor)) for chave, valor in linhas}
+        self._contar(l2_hits=len(encontrados), l2_misses=len(chaves) - len(encontrados))
+        return encontrados
+
+    def _l2_set_many(self, valores, ttl):
+        if not valores:
+            return
+        agora = timezone.now()
+        chaves = [self._l2_key(chave) for chave in valores]
+        dados = [pickle.dumps(valor, pickle.HIGHEST_PROTOCOL) for valor in valores.values()]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {TABELA_L2} (chave, valor, expira_em)
+                SELECT chave, valor, %s FROM unnest(%s::varchar[], %s::bytea[]) AS v (chave, valor)
+                ON CONFLICT (chave) DO UPDATE SET
+                    valor = EXCLUDED.valor,
+                    expira_em = EXCLUDED.expira_em
+                """,
+                [agora + timedelta(seconds=ttl), chaves, dados],
+            )
+            # Remove as entradas expiradas no máximo uma vez por intervalo
+            if time.monotonic() - _ultima_limpeza[0] > settings.TIERED_CACHE_CULL_INTERVAL:
+                _ultima_limpeza[0] = time.monotonic()
+                cursor.execute(f"DELETE FROM {TABELA_L2} WHERE expira_em <= %s", [agora])
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+
+    def get_many(self, chaves, falhas=False):
+        """
+        Valores de várias chaves (L1 e, para as restantes, uma query ao L2).
+
+        Args:
+            chaves: Chaves a ler
+            falhas: Incluir as falhas guardadas por get_or_set (uso interno)
+
+        Returns:
+            dict: {chave: valor} das chaves encontradas
+        """
+        chaves = list(dict.fromkeys(chaves))
+        encontrados = self._l1_get_many(chaves)
+        em_falta = [chave for chave in chaves if chave not in encontrados]
+        if em_falta:
+            do_l2 = self._l2_get_many(em_falta)
+            self._l1_set_many(do_l2, self.ttl)
+            encontrados.update(do_l2)
+        self._log_stats()
+        if not falhas:
+            encontrados = {
+                chave: valor for chave, valor in encontrados.items() if not isinstance(valor, _Falha)
+            }
+        return encontrados
+
+    def get(self, chave, default=None):
+        return self.get_many([chave]).get(chave, default)
+
+    def set_many(self, valores, ttl=None):
+        """Grava vários valores nos dois níveis (uma query ao L2)."""
+        ttl = self.ttl if ttl is None else ttl
+        self._l1_set_many(valores, ttl)
+        self._l2_set_many(valores, ttl)
+
+    def set(self, chave, valor, ttl=None):
+        self.set_many({chave: valor}, ttl)
+
+    def delete_many(self, chaves):
+        """Remove chaves do L1 deste processo e do L2."""
+        chaves = list(chaves)
+        with self._lock:
+            for chave in chaves:
+                self._l1.pop(chave, None)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {TABELA_L2} WHERE chave = ANY(%s)",
+                [[self._l2_key(chave) for chave in chaves]],
+            )
+
+    def delete(self, chave):
+        self.delete_many([chave])
+
+    def clear(self):
+        """Esvazia o L1 deste processo e as entradas desta cache no L2."""
+        with self._lock:
+            self._l1.clear()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABELA_L2} WHERE chave LIKE %s", [f'{self.nome}:%'])
+
+    def evict_local(self, prefixos=None):
+        """
+        Remove entradas do L1 deste processo, sem tocar no L2.
+
+        Args:
+            prefixos: Prefixos das chaves a remover (None esvazia o L1)
+        """
+        with self._lock:
+            if prefixos is None:
+                self._l1.clear()
+                return
+            prefixos = tuple(prefixos)
+            for chave in [chave for chave in self._l1 if chave.startswith(prefixos)]:
+                del self._l1[chave]
+
+    def get_or_set(self, chave, carregar, ttl=None, espera=None, ttl_erro=0, guardar_erro=None):
+        """
+        Devolve o valor da chave, calculando-o com carregar() se não existir.
+
+        Pedidos concorrentes para a mesma chave (no processo e entre
+        workers) esperam pelo primeiro em vez de chamarem carregar() de
+        novo, mas no máximo espera segundos: depois disso desistem.
+
+        Args:
+            chave: Chave do valor
+            carregar: Função sem argumentos que calcula o valor
+            ttl: TTL do valor (segundos; por omissão o da instância)
+            espera: Tempo máximo de espera pelo preenchimento de outro
+                pedido (segundos; por omissão TIERED_CACHE_FILL_WAIT)
+            ttl_erro: Durante quantos segundos uma falha de carregar() é
+                guardada (0 não guarda falhas)
+            guardar_erro: Função que recebe a exceção de carregar() e diz se
+                a falha deve ser guardada (por omissão todas)
+
+        Raises:
+            FillUnavailable: carregar() falhou há menos de ttl_erro segundos,
+                ou outro pedido está a calcular o valor há mais de espera
+                segundos
+            Exception: As exceções de carregar() propagam-se e o valor não
+                é gravado
+        """
+        espera = settings.TIERED_CACHE_FILL_WAIT if espera is None else espera
+        valor = self._get_or_fail(self.get_many([chave], falhas=True), chave)
+        if valor is not _AUSENTE:
+            return valor
+
+        fim = time.monotonic() + espera
+        with self._lock:
+            lock_chave = self._locks_chave.setdefault(chave, threading.Lock())
+        try:
+            if not lock_chave.acquire(timeout=espera):
+                raise FillUnavailable(f"{self.nome}: preenchimento de {chave} em curso")
+            try:
+                with _advisory_lock(self._l2_key(chave), fim) as obtido:
+                    # Outro pedido pode ter preenchido a chave enquanto esperávamos
+                    valor = self._l1_get_many([chave]).get(chave, _AUSENTE)
+                    if valor is _AUSENTE:
+                        valor = self._l2_get_many([chave]).get(chave, _AUSENTE)
+                        if valor is not _AUSENTE:
+                            self._l1_set_many({chave: valor}, self.ttl if ttl is None else ttl)
+                    valor = self._get_or_fail({chave: valor}, chave)
+                    if valor is not _AUSENTE:
+                        self._contar(coalesced=1)
+                        return valor
+                    if not obtido:
+                        raise FillUnavailable(f"{self.nome}: preenchimento de {chave} em curso")
+
+                    try:
+                        with _isolated():
+                            valor = carregar()
+                    except Exception as erro:
+                        if ttl_erro and (guardar_erro is None or guardar_erro(erro)):
+                            self._contar(failures=1)
+                            with _isolated():
+                                self.set(chave, _Falha(repr(erro), ttl_erro), ttl_erro)
+                        raise
+                    self._contar(fills=1)
+                    with _isolated():
+                        self.set(chave, valor, ttl)
+                    return valor
+            finally:
+                lock_chave.release()
+        finally:
+            with self._lock:
+                if not lock_chave.locked():
+                    self._locks_chave.pop(chave, None)
+
+    @staticmethod
+    def _get_or_fail(encontrados, chave):
+        valor = encontrados.get(chave, _AUSENTE)
+        if isinstance(valor, _Falha):
+            if valor.expira < time.time():
+                return _AUSENTE
+            raise FillUnavailable(valor.mensagem)
+        return valor
+
+    def stats(self):
+        """
+        Métricas desta instância no processo atual.
+
+        Returns:
+            dict: Contadores e rácio de acertos por nível (l1_hit_ratio,
+            l2_hit_ratio sobre as falhas do L1) e tamanho do L1
+        """
+        with self._lock:
+            contadores = dict(self._contadores)
+            contadores['l1_size'] = len(self._l1)
+        for nivel in ('l1', 'l2'):
+            total = contadores[f'{nivel}_hits'] + contadores[f'{nivel}_misses']
+            contadores[f'{nivel}_hit_ratio'] = round(contadores[f'{nivel}_hits'] / total, 4) if total else None
+        return contadores
+
+    def _log_stats(self):
+        agora = time.monotonic()
+        if agora - _ultimo_registo[0] < settings.TIERED_CACHE_STATS_INTERVAL:
+            return
+        _ultimo_registo[0] = agora
+        for instancia in _instancias:
+            logger.info("cache %s: %s", instancia.nome, instancia.stats())
+
+
+_AUSENTE = object()
+
+
+class FillUnavailable(Exception):
+    """O valor não está em cache e não pode ser calculado agora."""
+
+
+class _Falha:
+    """Falha de carregar() guardada na cache (cache negativa)."""
+
+    def __init__(self, mensagem, ttl):
+        self.mensagem = mensagem
+        # Instante de expiração próprio: no L1 a entrada pode durar mais
+        self.expira = time.time() + ttl
+
+
+class _advisory_lock:
+    """
+    Advisory lock de sessão do Postgres, esperado até ao instante fim
+    (time.monotonic()); sem efeito noutras bases de dados.
+
+    O bloco devolve se o lock foi obtido. Se a libertação falhar fora de
+    uma transação, a ligação é fechada (o que também liberta o lock).
+    """
+
+    def __init__(self, chave, fim):
+        self.chave = chave
+        self.fim = fim
+        self.ativo = connection.vendor == 'postgresql'
+        self.obtido = False
+
+    def __enter__(self):
+        if not self.ativo:
+            return True
+        with connection.cursor() as cursor:
+            while True:
+                cursor.execute("SELECT pg_try_advisory_lock(hashtextextended(%s, 0))", [self.chave])
+                self.obtido = cursor.fetchone()[0]
+                resto = self.fim - time.monotonic()
+                if self.obtido or resto <= 0:
+                    break
+                time.sleep(min(0.05, resto))
+        return self.obtido
+
+    def __exit__(self, *exc):
+        if not self.obtido:
+            return
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(hashtextextended(%s, 0))", [self.chave])
+        except DatabaseError:
+            logger.warning("Não foi possível libertar o advisory lock %s", self.chave, exc_info=True)
+            if not connection.in_atomic_block:
+                # Fechar a sessão liberta os locks que ela detém
+                connection.close()
+
+
+def _isolated():
+    """
+    Savepoint quando há uma transação em curso: um erro da base de dados
+    dentro do bloco não a aborta, e o advisory lock pode ser libertado.
+    """
+    return transaction.atomic() if connection.in_atomic_block else nullcontext()
+
+
+def all_stats():
+    """Métricas de todas as caches de dois níveis do processo."""
+    return {instancia.nome: instancia.stats() for instancia in _instancias}
@@ -1,7 +1,9 @@
 from functools import cache
+import json
 import math
+from datetime import datetime, timedelta, timezone as dt_timezone
 from django.shortcuts import render
-from django.db import models
+from django.db import connection, models
 from django.http import JsonResponse
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
@@ -9,16 +11,37 @@ from rest_framework import status, viewsets
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
 from math import log
-from django.db.models import Count, Avg
-from .models import AtividadeUsuario, Filme, Genero, Usuario, HistoricoVisualizacao, Favorito
+from django.db.models import Count, Avg, Max, OuterRef, Q, Subquery
+from django.db.models.functions import MD5, Cast, Coalesce, Concat
+from django.contrib.postgres.aggregates import StringAgg
+from .models import (
+    AtividadeUsuario, Filme, Genero, Usuario, HistoricoVisualizacao, Favorito, PerfilGosto,
+    TopCoocorrencia,
+)
+from .activity import write_activities, write_activity
+from .authentication import add_user_claims, invalidate_cached_user
+from .conditional import make_etag, not_modified, set_validators
+from .response_cache import public_response_cache
+from .cards import (
+    CAMPOS_CARTAO, card_fields, movie_cards, select_fields, sparse_params, truncate_overview,
+)
 from .services import tmdb_service
+from .recommender.content import get_content_index, load_documents
+from .recommender.cache import get_recommendations
+from .recommender.minhash import similar_users
+from .recommender.taste import rebuild_profile
+from .recommender.trending import get_trending
 import requests
 from django.conf import settings
 from django.contrib.auth.hashers import make_password,check_password
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
-from django.utils import timezone
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
 
 
 
@@ -190,7 +213,7 @@ def login(request):
     
     try:
         # Gerar tokens JWT (requer rest_framework_simplejwt)
-        refresh = RefreshToken.for_user(usuario)
+        refresh = add_user_claims(RefreshToken.for_user(usuario), usuario)
         access_token = str(refresh.access_token)
         refresh_token = str(refresh)
         
@@ -223,6 +246,7 @@ def logout(request):
         # Por enquanto, apenas confirmamos o logout bem-sucedido
         
         user = request.user
+        invalidate_cached_user(user.id, request.auth.get(api_settings.JTI_CLAIM))
         
         return Response({
             "message": "Logout realizado com sucesso",
@@ -239,18 +263,29 @@ def logout(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_me(request):
-
+    """
+    Dados do utilizador autenticado.
     
+    GET /api/auth/me/
+    
+    Responde 304 Not Modified (sem queries) quando o ETag/Last-Modified
+    enviado pelo cliente corresponde ao updated_at do utilizador.
+    """
     user = request.user
+    etag = make_etag('me', user.id, user.updated_at)
+    
+    resposta = not_modified(request, etag, user.updated_at, por_utilizador=True)
+    if resposta is not None:
+        return resposta
     
     try:
-        return Response({
+        return set_validators(Response({
             "id": user.id,
             "nome": user.nome,
             "email": user.email,
             "created_at": user.created_at.isoformat() if hasattr(user, 'created_at') and user.created_at else None,
             "updated_at": user.updated_at.isoformat() if hasattr(user, 'updated_at') and user.updated_at else None,
-        }, status=status.HTTP_200_OK)
+        }, status=status.HTTP_200_OK), etag, user.updated_at, por_utilizador=True)
     
     except Exception as e:
         return Response(
@@ -413,12 +448,11 @@ def UpdateProfile(request):
 
 
 def tmdb_request(endpoint, params=None):
-    base_url = "https://api.themoviedb.org/3"
-    if params is None:
-        params = {}
-    params['api_key'] = settings.TMDB_API_KEY
-    response = requests.get(f"{base_url}/{endpoint}", params=params)
-    return response.json()  
+    """GET à TMDB via cache (tmdb_service.get_json); erros HTTP devolvem o JSON de erro."""
+    try:
+        return tmdb_service.get_json(endpoint, params)
+    except requests.exceptions.HTTPError as e:
+        return e.response.json()
 
 
 @api_view(['GET'])
@@ -451,19 +485,7 @@ def search_movies(request):
     # ====================================================================
     
     try:
-        params = {
-            'query': query,
-            'page': page,
-            'api_key': settings.TMDB_API_KEY
-        }
-        
-        response = requests.get(
-            'https://api.themoviedb.org/3/search/movie',
-            params=params,
-            timeout=10
-        )
-        response.raise_for_status()
-        data = response.json()
+        data = tmdb_service.get_json('search/movie', {'query': query, 'page': page})
         
         # ====================================================================
         # Processar e cachear resultados
@@ -604,8 +626,95 @@ def search_movies_tmdb(request):
 
 
 
+TRENDING_LOCAL_PAGE_SIZE = 20
+
+
+def _local_trending_response(period, page, fallback=False):
+    """
+    Resposta de tendências calculada a partir da atividade local (RF-11).
+    
+    Os resultados seguem o formato da TMDB usado pelo frontend.
+    """
+    top = get_trending(period)
+    inicio = (page - 1) * TRENDING_LOCAL_PAGE_SIZE
+    pagina = top[inicio:inicio + TRENDING_LOCAL_PAGE_SIZE]
+    
+    filmes = Filme.objects.defer('capa').prefetch_related('generos').in_bulk(
+        [filme_id for filme_id, _ in pagina]
+    )
+    
+    results = []
+    for filme_id, pontuacao in pagina:
+        filme = filmes.get(filme_id)
+        if filme is None:
+            continue
+        generos = [g.nome for g in filme.generos.all()]
+        results.append({
+            "id": filme.id,
+            "title": filme.nome,
+            "overview": filme.descricao,
+            "poster_path": filme.poster_path,
+            "poster_url": f"https://image.tmdb.org/t/p/w500{filme.poster_path}" if filme.poster_path else None,
+            "genres": generos,
+            "genre_ids": generos,
+            "release_date": str(filme.ano_lancamento) if filme.ano_lancamento else None,
+            "vote_average": filme.rating_tmdb,
+            "trending_score": round(pontuacao, 3),
+        })
+    
+    return Response(
+        {
+            "total": len(top),
+            "page": page,
+            "total_pages": max(1, math.ceil(len(top) / TRENDING_LOCAL_PAGE_SIZE)),
+            "period": period,
+            "source": "local",
+            "fallback": fallback,
+            "results": results
+        },
+        status=status.HTTP_200_OK
+    )
+
+
+def _trending_fallback(period, page, detail):
+    """
+    TMDB indisponível: devolve as tendências locais ou, se ainda não houver
+    atividade suficiente, o erro original.
+    """
+    if get_trending(period):
+        # Resposta de recurso: não deve ficar em cache (nem no nginx)
+        response = _local_trending_response(period, page, fallback=True)
+        patch_cache_control(response, no_store=True)
+        return response
+    
+    return Response(
+        {
+            "error": "Erro ao obter filmes trending",
+            "detail": detail
+        },
+        status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
+
 @api_view(['GET'])
+@public_response_cache('trending', geracoes=('filmes',))
 def trending_movies(request):
+    """
+    Retorna os filmes em tendência.
+    
+    Requisito RF-11: Tendências/Populares
+    
+    GET /api/movies/trending/?period=week&page=1&source=tmdb
+    
+    Query params:
+        - period: 'day' ou 'week' (padrão: week)
+        - page: Página (padrão: 1)
+        - source: 'tmdb' (padrão) ou 'local' (atividade dos utilizadores,
+          com decaimento exponencial no tempo)
+    
+    Quando a TMDB não está disponível usa automaticamente as tendências
+    locais (resposta com "source": "local" e "fallback": true).
+    """
     
     # ====================================================================
     # Validação de Parâmetros
@@ -622,43 +731,28 @@ def trending_movies(request):
     except (ValueError, TypeError):
         page = 1
     
+    source = request.GET.get('source', 'tmdb').lower().strip()
+    if source == 'local':
+        return _local_trending_response(period, page)
+    
     # ====================================================================
     # Validação da API Key
     # ====================================================================
     
     api_key = settings.TMDB_API_KEY
     if not api_key or api_key == "":
-        return Response(
-            {
-                "error": "Erro ao obter filmes trending",
-                "detail": "API key da TMDB não configurada"
-            },
-            status=status.HTTP_503_SERVICE_UNAVAILABLE
-        )
+        return _trending_fallback(period, page, "API key da TMDB não configurada")
     
     # ====================================================================
     # Chamada à API da TMDB
     # ====================================================================
     
     try:
-        # Construir URL do endpoint trending
-        url = f"https://api.themoviedb.org/3/trending/movie/{period}"
-        
-        params = {
-            'api_key': api_key,
-            'page': page,
-            'language': 'en-US'  # TMDB padrão é en-US
-        }
-        
-        # Fazer pedido com timeout de 10 segundos
-        response = requests.get(
-            url,
-            params=params,
-            timeout=10
+        # Pedido ao endpoint trending (timeout de 10 segundos, via cache)
+        data = tmdb_service.get_json(
+            f"trending/movie/{period}",
+            {'page': page, 'language': 'en-US'}  # TMDB padrão é en-US
         )
-        response.raise_for_status()  # Lançar erro se status != 2xx
-        
-        data = response.json()
         
         # ====================================================================
         # Validação da Resposta
@@ -686,28 +780,17 @@ def trending_movies(request):
                 "page": data.get('page', page),
                 "total_pages": data.get('total_pages', 1),
                 "period": period,
+                "source": "tmdb",
                 "results": data.get('results', [])
             },
             status=status.HTTP_200_OK
         )
     
     except requests.exceptions.Timeout:
-        return Response(
-            {
-                "error": "Erro ao obter filmes trending",
-                "detail": "Timeout na ligação à TMDB (mais de 10 segundos)"
-            },
-            status=status.HTTP_503_SERVICE_UNAVAILABLE
-        )
+        return _trending_fallback(period, page, "Timeout na ligação à TMDB (mais de 10 segundos)")
     
     except requests.exceptions.ConnectionError:
-        return Response(
-            {
-                "error": "Erro ao obter filmes trending",
-                "detail": "Erro de conexão com a TMDB"
-            },
-            status=status.HTTP_503_SERVICE_UNAVAILABLE
-        )
+        return _trending_fallback(period, page, "Erro de conexão com a TMDB")
     
     except requests.exceptions.HTTPError as e:
         # Erro HTTP (401, 403, 404, 500, etc.)
@@ -720,55 +803,60 @@ def trending_movies(request):
         else:
             detail = f"Erro HTTP {e.response.status_code} da TMDB"
         
-        return Response(
-            {
-                "error": "Erro ao obter filmes trending",
-                "detail": detail
-            },
-            status=status.HTTP_503_SERVICE_UNAVAILABLE
-        )
+        return _trending_fallback(period, page, detail)
     
     except requests.exceptions.RequestException as e:
         # Qualquer outro erro de requests
-        return Response(
-            {
-                "error": "Erro ao obter filmes trending",
-                "detail": "Erro ao conectar à API da TMDB"
-            },
-            status=status.HTTP_503_SERVICE_UNAVAILABLE
-        )
+        return _trending_fallback(period, page, "Erro ao conectar à API da TMDB")
     
     except ValueError:
         # Erro ao fazer parse do JSON
-        return Response(
-            {
-                "error": "Erro ao obter filmes trending",
-                "detail": "Resposta inválida da TMDB"
-            },
-            status=status.HTTP_503_SERVICE_UNAVAILABLE
-        )
+        return _trending_fallback(period, page, "Resposta inválida da TMDB")
     
     except Exception as e:
         # Erro inesperado
-        return Response(
-            {
-                "error": "Erro ao obter filmes trending",
-                "detail": "Erro interno do servidor"
-            },
-            status=status.HTTP_503_SERVICE_UNAVAILABLE
-        )
+        return _trending_fallback(period, page, "Erro interno do servidor")
 
 
 @api_view(['GET'])
+@public_response_cache('movie', geracoes=lambda request, movie_id: (f'filme:{movie_id}', 'generos'))
 def movie_details(request, movie_id):
-   
-
+    """
+    Detalhes de um filme (BD local ou, se não existir, TMDB).
+    
+    GET /api/movies/<movie_id>/
+    
+    Filmes locais: uma query lê o updated_at do filme e o da atividade do
+    utilizador, que servem de ETag/Last-Modified; sem alterações responde
+    304 Not Modified sem construir o corpo.
+    """
     user = request.user if request.user.is_authenticated else None
 
-    # Procura 1º na BD LOCAL
-    try:
-        filme = Filme.objects.prefetch_related("generos").get(id=movie_id)
-
+    # Procura 1º na BD LOCAL (cartão da cache de fragmentos)
+    versoes = Filme.objects.filter(id=movie_id)
+    if user:
+        versoes = versoes.annotate(atividade_updated_at=Subquery(
+            AtividadeUsuario.objects
+            .filter(usuario=user, filme_id=OuterRef('id'))
+            .values('updated_at')[:1]
+        ))
+        versoes = versoes.values_list('updated_at', 'atividade_updated_at')
+    else:
+        versoes = versoes.values_list('updated_at')
+    versoes = versoes.first()
+
+    if versoes is not None:
+        filme_updated_at = versoes[0]
+        atividade_updated_at = versoes[1] if user else None
+        etag = make_etag('movie', movie_id, filme_updated_at, user.id if user else 0, atividade_updated_at)
+        ultima = max(d for d in (filme_updated_at, atividade_updated_at) if d)
+
+        resposta = not_modified(request, etag, ultima, por_utilizador=True)
+        if resposta is not None:
+            return resposta
+
+    cartao = movie_cards([movie_id], versoes={movie_id: versoes[0]} if versoes else {}).get(movie_id)
+    if cartao is not None:
         # estado do utilizador (default)
         rating_user = None
         favorito = False
@@ -776,20 +864,22 @@ def movie_details(request, movie_id):
         ver_mais_tarde = False
 
         if user:
-            atividade = AtividadeUsuario.objects.filter(usuario=user, filme=filme).first()
+            atividade = (
+                AtividadeUsuario.objects
+                .filter(usuario=user, filme_id=movie_id)
+                .values_list('rating', 'favorito', 'visto', 'ver_mais_tarde')
+                .first()
+            )
             if atividade:
-                rating_user = atividade.rating
-                favorito = atividade.favorito
-                visto = atividade.visto
-                ver_mais_tarde = atividade.ver_mais_tarde
+                rating_user, favorito, visto, ver_mais_tarde = atividade
 
-        return Response({
-            "id": filme.id,
-            "title": filme.nome,
-            "overview": filme.descricao,
-            "genres": [g.nome for g in filme.generos.all()],
-            "tmdb_rating": filme.rating_tmdb,
-            "poster_url": f"https://image.tmdb.org/t/p/w500{filme.poster_path}" if filme.poster_path else None,
+        return set_validators(Response({
+            "id": cartao["id"],
+            "title": cartao["title"],
+            "overview": cartao["overview"],
+            "genres": cartao["genres"],
+            "tmdb_rating": cartao["tmdb_rating"],
+            "poster_url": cartao["poster_url"],
 
             # user info
             "rating_user": rating_user,
@@ -798,10 +888,9 @@ def movie_details(request, movie_id):
             "ver_mais_tarde": ver_mais_tarde,
 
             "source": "database"
-        })
+        }), etag, ultima, por_utilizador=True)
 
-    except Filme.DoesNotExist:
-        pass  # não está na BD → avançar para TMDB
+    # não está na BD → avançar para TMDB
 
     # Procura no tmdb
     data = tmdb_request(f"movie/{movie_id}")
@@ -873,6 +962,409 @@ def movie_details(request, movie_id):
     })
 
 
+@api_view(['GET'])
+def similar_movies(request, movie_id):
+    """
+    Lista filmes semelhantes ("mais como este") a partir do índice de conteúdo.
+    
+    Requisito RF-10: Motor de Recomendação
+    Requisito RNF-01: Performance (vizinhos pré-calculados, sem chamadas externas)
+    
+    GET /api/movies/<movie_id>/similar/?limit=10
+    """
+    try:
+        limit = int(request.GET.get('limit', 10))
+    except (ValueError, TypeError):
+        limit = 10
+    limit = max(1, min(limit, 50))
+    
+    index = get_content_index()
+    
+    if index is not None and index.positions([movie_id])[0] >= 0:
+        vizinhos = index.similar(movie_id, limit=limit)
+    else:
+        # Filme ainda não indexado: comparar o seu texto contra o índice
+        documentos = load_documents([movie_id])
+        if not documentos:
+            return Response(
+                {"error": "Filme não encontrado"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        vizinhos = index.similar_to_document(documentos[0], limit=limit) if index else []
+    
+    filmes = (
+        Filme.objects
+        .defer('capa')
+        .prefetch_related('generos')
+        .in_bulk([filme_id for filme_id, _ in vizinhos])
+    )
+    
+    results = []
+    for filme_id, semelhanca in vizinhos:
+        filme = filmes.get(filme_id)
+        if filme is None:
+            continue
+        results.append({
+            "id": filme.id,
+            "title": filme.nome,
+            "overview": filme.descricao,
+            "genres": [g.nome for g in filme.generos.all()],
+            "poster_path": filme.poster_path,
+            "poster_url": f"https://image.tmdb.org/t/p/w500{filme.poster_path}" if filme.poster_path else None,
+            "tmdb_rating": filme.rating_tmdb,
+            "similarity": semelhanca
+        })
+    
+    return Response({
+        "movie_id": movie_id,
+        "total": len(results),
+        "results": results
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+def also_liked_movies(request, movie_id):
+    """
+    Lista os filmes de que gostaram os utilizadores que viram/gostaram deste.
+    
+    Requisito RF-10: Motor de Recomendação
+    Requisito RNF-01: Performance (top pré-calculado, leitura pela chave primária)
+    
+    GET /api/movies/<movie_id>/also-liked/?limit=10
+    """
+    try:
+        limit = int(request.GET.get('limit', 10))
+    except (ValueError, TypeError):
+        limit = 10
+    limit = max(1, min(limit, settings.COWATCH_TOP_N))
+    
+    top = TopCoocorrencia.objects.filter(filme_id=movie_id).values_list('filme_ids', 'contagens').first()
+    vizinhos = list(zip(*top))[:limit] if top else []
+    
+    filmes = (
+        Filme.objects
+        .defer('capa')
+        .prefetch_related('generos')
+        .in_bulk([filme_id for filme_id, _ in vizinhos])
+    )
+    
+    results = []
+    for filme_id, contagem in vizinhos:
+        filme = filmes.get(filme_id)
+        if filme is None:
+            continue
+        results.append({
+            "id": filme.id,
+            "title": filme.nome,
+            "overview": filme.descricao,
+            "genres": [g.nome for g in filme.generos.all()],
+            "poster_path": filme.poster_path,
+            "poster_url": f"https://image.tmdb.org/t/p/w500{filme.poster_path}" if filme.poster_path else None,
+            "tmdb_rating": filme.rating_tmdb,
+            "co_occurrences": contagem
+        })
+    
+    return Response({
+        "movie_id": movie_id,
+        "total": len(results),
+        "results": results
+    }, status=status.HTTP_200_OK)
+
+
+MOVIE_STATE_MAX_IDS = 200
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def movies_state(request):
+    """
+    Estado do utilizador (rating, favorito, visto, ver mais tarde) para vários filmes.
+    
+    Requisito R08: Favoritos / Watchlist
+    Requisito RNF-01: Performance (uma única query pelo índice (usuario, filme))
+    
+    GET /api/movies/state/?ids=550,680,13
+    
+    Query params:
+        - ids: IDs separados por vírgulas (ou repetidos), no máximo 200
+    
+    Returns:
+        Arrays paralelos alinhados com "ids" (filmes sem atividade têm
+        rating null e flags a false):
+        {"ids": [...], "rating": [...], "favorito": [...], "visto": [...], "ver_mais_tarde": [...]}
+    """
+    valores = [v for param in request.GET.getlist('ids') for v in param.split(',') if v.strip()]
+    try:
+        ids = list(dict.fromkeys(int(v) for v in valores))
+    except ValueError:
+        return Response(
+            {"error": "ids deve conter apenas números inteiros"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if len(ids) > MOVIE_STATE_MAX_IDS:
+        return Response(
+            {"error": f"Máximo de {MOVIE_STATE_MAX_IDS} ids por pedido"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    estados = {}
+    if ids:
+        estados = {
+            filme_id: estado
+            for filme_id, *estado in (
+                AtividadeUsuario.objects
+                .filter(usuario_id=request.user.id, filme_id__in=ids)
+                .order_by()
+                .values_list('filme_id', 'rating', 'favorito', 'visto', 'ver_mais_tarde')
+            )
+        }
+    
+    vazio = (None, False, False, False)
+    colunas = list(zip(*(estados.get(filme_id, vazio) for filme_id in ids))) or [[], [], [], []]
+    
+    return Response({
+        "ids": ids,
+        "rating": list(colunas[0]),
+        "favorito": list(colunas[1]),
+        "visto": list(colunas[2]),
+        "ver_mais_tarde": list(colunas[3]),
+    }, status=status.HTTP_200_OK)
+
+
+BATCH_MAX_OPERATIONS = 500
+
+# Operação do lote -> campos de AtividadeUsuario alterados
+BATCH_OPERATIONS = {
+    'rate': None,  # {'rating': valor pedido}
+    'delete_rating': {'rating': None},
+    'favorite': {'favorito': True},
+    'remove_favorite': {'favorito': False},
+    'watch_later': {'ver_mais_tarde': True},
+    'remove_watch_later': {'ver_mais_tarde': False},
+    'watched': {'visto': True},
+}
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def batch_activity(request):
+    """
+    Aplica várias operações de avaliação, favoritos e ver mais tarde de uma vez.
+    
+    Requisito R04: Avaliações
+    Requisito R08: Favoritos / Watchlist
+    Requisito RNF-01: Performance (um único INSERT ... ON CONFLICT valida
+    os filmes e aplica todas as alterações)
+    
+    POST /api/movies/batch/
+    Body:
+        {"operations": [
+            {"op": "rate", "movie_id": 550, "rating": 8},
+            {"op": "favorite", "movie_id": 550},
+            {"op": "watch_later", "movie_id": 680}
+        ]}
+    
+    Operações: rate, delete_rating, favorite, remove_favorite, watch_later,
+    remove_watch_later, watched. As operações sobre o mesmo filme são
+    combinadas pela ordem do pedido (máximo de 500 por pedido).
+    
+    Returns:
+        {"applied": n, "created": n, "not_found": [...], "results": [
+            {"movie_id", "rating", "favorito", "visto", "ver_mais_tarde", "created"}
+        ]}
+    """
+    operacoes = request.data.get('operations') if isinstance(request.data, dict) else None
+    if not isinstance(operacoes, list) or not operacoes:
+        return Response(
+            {"error": "O parâmetro 'operations' deve ser uma lista não vazia"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if len(operacoes) > BATCH_MAX_OPERATIONS:
+        return Response(
+            {"error": f"Máximo de {BATCH_MAX_OPERATIONS} operações por pedido"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    alteracoes = {}
+    for indice, operacao in enumerate(operacoes):
+        if not isinstance(operacao, dict) or operacao.get('op') not in BATCH_OPERATIONS:
+            return Response(
+                {"error": f"Operação {indice}: 'op' deve ser um de {', '.join(BATCH_OPERATIONS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            movie_id = int(operacao.get('movie_id'))
+        except (ValueError, TypeError):
+            return Response(
+                {"error": f"Operação {indice}: 'movie_id' deve ser um número inteiro"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if movie_id <= 0:
+            return Response(
+                {"error": f"Operação {indice}: 'movie_id' deve ser um número positivo"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        campos = BATCH_OPERATIONS[operacao['op']]
+        if campos is None:
+            try:
+                rating = int(operacao.get('rating'))
+            except (ValueError, TypeError):
+                return Response(
+                    {"error": f"Operação {indice}: 'rating' deve ser um número inteiro"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if not (0 <= rating <= 10):
+                return Response(
+                    {"error": f"Operação {indice}: Rating deve estar entre 0 e 10"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            campos = {'rating': rating}
+        
+        alteracoes.setdefault(movie_id, {}).update(campos)
+    
+    # A mesma instrução valida os filmes: os que não existem não são devolvidos
+    resultados = write_activities(request.user.id, alteracoes)
+    encontrados = {r.filme_id for r in resultados}
+    not_found = [movie_id for movie_id in alteracoes if movie_id not in encontrados]
+    
+    return Response({
+        "applied": len(resultados),
+        "created": sum(1 for r in resultados if r.criado),
+        "not_found": not_found,
+        "results": [
+            {
+                "movie_id": r.filme_id,
+                "rating": r.rating,
+                "favorito": r.favorito,
+                "visto": r.visto,
+                "ver_mais_tarde": r.ver_mais_tarde,
+                "created": r.criado,
+            }
+            for r in resultados
+        ],
+    }, status=status.HTTP_200_OK)
+
+
+# Sobreposição (segundos) entre sincronizações: cobre escritas cujo
+# updated_at é anterior ao token mas que só ficaram visíveis depois dele
+LIBRARY_SYNC_OVERLAP_SECONDS = 5
+
+
+def _library_columns(linhas):
+    """Arrays paralelos (ids, rating, favorito, visto, ver_mais_tarde) de linhas de estado."""
+    colunas = list(zip(*linhas)) or [[], [], [], [], []]
+    return {
+        "ids": list(colunas[0]),
+        "rating": list(colunas[1]),
+        "favorito": list(colunas[2]),
+        "visto": list(colunas[3]),
+        "ver_mais_tarde": list(colunas[4]),
+    }
+
+
+def _library_hash():
+    """
+    Parcela de cada filme na soma de controlo da biblioteca: um hash de 64
+    bits do filme_id, para que apagar um filme e acrescentar outro mude a soma.
+    """
+    return models.Func(
+        Cast('filme_id', models.TextField()), models.Value(0),
+        function='hashtextextended', output_field=models.BigIntegerField(),
+    )
+
+
+def _library_token(ultima_alteracao, total, soma):
+    """
+    Token de sincronização: instante da última alteração vista, número de
+    linhas e soma de controlo dos filmes.
+    """
+    micros = int(ultima_alteracao.timestamp() * 1_000_000) if ultima_alteracao else 0
+    return f"{micros}.{total}.{soma}"
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def user_library(request):
+    """
+    Biblioteca do utilizador (ratings, favoritos, vistos, ver mais tarde)
+    com sincronização incremental.
+    
+    Requisito R04: Avaliações
+    Requisito R08: Favoritos / Watchlist
+    Requisito RNF-01: Performance (as revisitas só transferem as alterações)
+    
+    GET /api/user/library/                 -> estado completo
+    GET /api/user/library/?since=<token>   -> só as atividades alteradas
+    
+    Returns:
+        {"full": bool, "sync_token": "...", "ids": [...], "rating": [...],
+         "favorito": [...], "visto": [...], "ver_mais_tarde": [...]}
+        
+        No estado completo só aparecem filmes com rating ou alguma flag.
+        Num delta aparece o estado atual de cada filme alterado; um filme
+        sem rating e com todas as flags a false saiu da biblioteca. Quando
+        o delta não é seguro (linhas apagadas desde o token, detetadas pelo
+        número de linhas e pela soma de controlo dos filmes, ou token de uma
+        versão anterior) é devolvido o estado completo com "full": true.
+    """
+    atividades = AtividadeUsuario.objects.filter(usuario_id=request.user.id).order_by()
+    colunas = ('filme_id', 'rating', 'favorito', 'visto', 'ver_mais_tarde')
+    
+    token = request.GET.get('since')
+    partes = token.split('.') if token else []
+    if token and len(partes) != 2:
+        try:
+            micros, total_anterior, soma_anterior = (int(parte) for parte in partes)
+            desde = datetime.fromtimestamp(micros / 1_000_000, tz=dt_timezone.utc)
+        except (ValueError, OverflowError, OSError):
+            return Response(
+                {"error": "Token de sincronização inválido"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        alteradas = list(
+            atividades
+            .filter(updated_at__gt=desde - timedelta(seconds=LIBRARY_SYNC_OVERLAP_SECONDS))
+            .values_list(*colunas, 'created_at', 'updated_at', _library_hash())
+        )
+        resumo = atividades.aggregate(total=Count('id'), soma=models.Sum(_library_hash()))
+        total, soma = resumo['total'], int(resumo['soma'] or 0)
+        criadas = [linha for linha in alteradas if linha[5] > desde]
+        
+        # Linhas apagadas não deixam rasto em updated_at: sem apagamentos,
+        # as linhas atuais são as do token mais as criadas depois dele, pelo
+        # que o número de linhas e a soma de controlo têm de bater certo
+        if (
+            total == total_anterior + len(criadas)
+            and soma == soma_anterior + sum(linha[7] for linha in criadas)
+        ):
+            ultima = max((linha[6] for linha in alteradas), default=desde)
+            return Response({
+                "full": False,
+                "sync_token": _library_token(max(ultima, desde), total, soma),
+                **_library_columns(linha[:5] for linha in alteradas),
+            }, status=status.HTTP_200_OK)
+    
+    linhas = list(
+        atividades.order_by('filme_id').values_list(*colunas, 'updated_at', _library_hash())
+    )
+    ultima = max((linha[5] for linha in linhas), default=None)
+    
+    return Response({
+        "full": True,
+        "sync_token": _library_token(ultima, len(linhas), sum(linha[6] for linha in linhas)),
+        **_library_columns(
+            linha[:5] for linha in linhas
+            if linha[1] is not None or any(linha[2:5])
+        ),
+    }, status=status.HTTP_200_OK)
+
+
 # ============================================================================
 # SISTEMA DE AVALIAÇÕES - RF-04 (Avaliações) e US07 (Avaliar Filme)
 # ============================================================================
@@ -922,30 +1414,23 @@ def rate_movie(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    try:
-        filme = Filme.objects.get(id=movie_id)
-    except Filme.DoesNotExist:
+    # Um único INSERT ... ON CONFLICT valida o filme, grava o rating e
+    # devolve os agregados atualizados (RNF-01)
+    atividade = write_activity(user.id, movie_id, {'rating': rating}, agregados=True)
+    if atividade is None:
         return Response(
             {"error": "Filme não encontrado"},
             status=status.HTTP_404_NOT_FOUND
         )
-    
-    atividade, created = AtividadeUsuario.objects.update_or_create(
-        usuario=user,
-        filme=filme,
-        defaults={'rating': rating}
-    )
-    
-    rating_average = filme.get_rating_medio_usuarios()
-    total_ratings = filme.get_numero_avaliacoes()
+    created = atividade.criado
     
     response_data = {
         "message": "Avaliação registada com sucesso" if created else "Avaliação atualizada com sucesso",
-        "movie_id": filme.id,
-        "movie_title": filme.nome,
+        "movie_id": atividade.filme_id,
+        "movie_title": atividade.nome,
         "rating": rating,
-        "rating_average": rating_average,
-        "total_ratings": total_ratings,
+        "rating_average": atividade.rating_medio,
+        "total_ratings": atividade.total_avaliacoes,
         "created": created
     }
     
@@ -999,35 +1484,28 @@ def update_rating(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    try:
-        filme = Filme.objects.get(id=movie_id)
-    except Filme.DoesNotExist:
+    atividade = write_activity(
+        user.id, movie_id, {'rating': rating}, exigir='atividade', agregados=True
+    )
+    if atividade is None:
         return Response(
             {"error": "Filme não encontrado"},
             status=status.HTTP_404_NOT_FOUND
         )
     
-    try:
-        atividade = AtividadeUsuario.objects.get(usuario=user, filme=filme)
-    except AtividadeUsuario.DoesNotExist:
+    if not atividade.escrito:
         return Response(
             {"error": "Não existe avaliação anterior para este filme"},
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    atividade.rating = rating
-    atividade.save(update_fields=['rating', 'updated_at'])
-    
-    rating_average = filme.get_rating_medio_usuarios()
-    total_ratings = filme.get_numero_avaliacoes()
-    
     response_data = {
         "message": "Avaliação atualizada com sucesso",
-        "movie_id": filme.id,
-        "movie_title": filme.nome,
+        "movie_id": atividade.filme_id,
+        "movie_title": atividade.nome,
         "rating": rating,
-        "rating_average": rating_average,
-        "total_ratings": total_ratings,
+        "rating_average": atividade.rating_medio,
+        "total_ratings": atividade.total_avaliacoes,
         "updated_at": atividade.updated_at.isoformat() if atividade.updated_at else None
     }
     
@@ -1067,84 +1545,180 @@ def delete_rating(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    try:
-        filme = Filme.objects.get(id=movie_id)
-    except Filme.DoesNotExist:
+    # Remover o rating (manter o registo de atividade caso existam outras
+    # interações); a média do filme após a remoção vem na mesma instrução
+    atividade = write_activity(
+        user.id, movie_id, {'rating': None}, exigir='rating', agregados=True
+    )
+    if atividade is None:
         return Response(
             {"error": "Filme não encontrado"},
             status=status.HTTP_404_NOT_FOUND
         )
     
-    try:
-        atividade = AtividadeUsuario.objects.get(usuario=user, filme=filme)
-    except AtividadeUsuario.DoesNotExist:
+    if not atividade.escrito:
         return Response(
             {"error": "Não existe avaliação para este filme"},
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    if atividade.rating is None:
-        return Response(
-            {"error": "Não existe avaliação para este filme"},
-            status=status.HTTP_400_BAD_REQUEST
-        )
-    
-    # Guardar dados antes da eliminação para a resposta
-    old_rating = atividade.rating
-    
-    # Remover o rating (manter o registo de atividade caso existam outras interações)
-    atividade.rating = None
-    atividade.save(update_fields=['rating', 'updated_at'])
-    
-    # Recalcular a média do filme após remoção
-    rating_average = filme.get_rating_medio_usuarios()
-    total_ratings = filme.get_numero_avaliacoes()
-    
     response_data = {
         "message": "Avaliação removida com sucesso",
-        "movie_id": filme.id,
-        "movie_title": filme.nome,
-        "removed_rating": old_rating,
-        "rating_average": rating_average,
-        "total_ratings": total_ratings,
+        "movie_id": atividade.filme_id,
+        "movie_title": atividade.nome,
+        "removed_rating": atividade.antes[0],
+        "rating_average": atividade.rating_medio,
+        "total_ratings": atividade.total_avaliacoes,
         "deleted_at": atividade.updated_at.isoformat() if atividade.updated_at else None
     }
     
     return Response(response_data, status=status.HTTP_200_OK)
 
 
+CURSOR_PAGE_SIZE = 20
+CURSOR_MAX_PAGE_SIZE = 100
+
+# Campos aceites por ?fields= em cada lista de filmes
+CAMPOS_AVALIADOS = (*CAMPOS_CARTAO, 'user_rating', 'rated_at')
+CAMPOS_VER_MAIS_TARDE = (*CAMPOS_CARTAO, 'added_at')
+CAMPOS_FAVORITOS = (*CAMPOS_CARTAO, 'movie_id', 'backdrop_path', 'genre_ids', 'vote_average', 'added_at')
+CAMPOS_RECOMENDACOES = (*CAMPOS_CARTAO, 'user_rating_average')
+
+# Campos dos favoritos que repetem um campo do cartão
+ALIASES_FAVORITOS = {
+    'movie_id': 'id',
+    'backdrop_path': 'poster_path',
+    'genre_ids': 'genres',
+    'vote_average': 'tmdb_rating',
+}
+
+
+def _cursor_params(request):
+    """
+    Parâmetros da paginação por cursor (opcional: ativa com ?limit= ou ?cursor=).
+    
+    Returns:
+        tuple: (limite, posição) com posição = (datetime, id) ou None na
+        primeira página; None se o pedido não usa cursor
+    
+    Raises:
+        ValueError: Parâmetros inválidos (mensagem para a resposta 400)
+    """
+    cursor = request.GET.get('cursor')
+    limite = request.GET.get('limit')
+    if cursor is None and limite is None:
+        return None
+    
+    try:
+        limite = int(limite) if limite else CURSOR_PAGE_SIZE
+    except ValueError:
+        raise ValueError("O parâmetro 'limit' deve ser um número inteiro")
+    if not (1 <= limite <= CURSOR_MAX_PAGE_SIZE):
+        raise ValueError(f"O parâmetro 'limit' deve estar entre 1 e {CURSOR_MAX_PAGE_SIZE}")
+    
+    posicao = None
+    if cursor:
+        try:
+            micros, ultimo_id = (int(parte) for parte in cursor.split('.'))
+            posicao = (datetime.fromtimestamp(micros / 1_000_000, tz=dt_timezone.utc), ultimo_id)
+        except (ValueError, OverflowError, OSError):
+            raise ValueError("Cursor inválido")
+    
+    return limite, posicao
+
+
+def _cursor_page(queryset, campo, limite, posicao):
+    """
+    Página por keyset sobre (campo, id) descendentes.
+    
+    A condição campo <= valor delimita o início da página no índice
+    composto, pelo que o custo por página não depende da posição nem do
+    tamanho da lista.
+    
+    Args:
+        queryset: Queryset de .values() com as colunas campo e id
+    
+    Returns:
+        tuple: (lista de dicts, próximo cursor ou None)
+    """
+    queryset = queryset.order_by(f'-{campo}', '-id')
+    if posicao is not None:
+        valor, ultimo_id = posicao
+        queryset = queryset.filter(**{f'{campo}__lte': valor}).filter(
+            models.Q(**{f'{campo}__lt': valor}) | models.Q(id__lt=ultimo_id)
+        )
+    
+    objetos = list(queryset[:limite + 1])
+    if len(objetos) <= limite:
+        return objetos, None
+    
+    objetos = objetos[:limite]
+    ultimo = objetos[-1]
+    micros = int(ultimo[campo].timestamp() * 1_000_000)
+    return objetos, f"{micros}.{ultimo['id']}"
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def my_rated_movies(request):
+    """
+    Filmes avaliados pelo utilizador, do mais recente para o mais antigo.
+    
+    Requisito R04: Avaliações
+    
+    GET /api/movies/my_rated/
+    
+    Query params (opcionais, paginação por cursor):
+        - limit: Filmes por página (1-100, default 20)
+        - cursor: Valor de "next_cursor" da página anterior
+    
+    Query params (opcionais, payload reduzido):
+        - fields: Campos a devolver, separados por vírgulas (CAMPOS_AVALIADOS)
+        - overview_chars: Trunca a sinopse a este número de caracteres
+    
+    Sem limit/cursor devolve a lista completa com "total".
+    """
     user = request.user
     
+    try:
+        paginacao = _cursor_params(request)
+        campos, overview_chars = sparse_params(request, CAMPOS_AVALIADOS)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
     try:
         atividades = (
             AtividadeUsuario.objects
             .filter(usuario=user, rating__isnull=False)
-            .select_related('filme')
-            .prefetch_related('filme__generos')
             .order_by('-updated_at')
-        )
+            .values('id', 'filme_id', 'filme__updated_at', 'rating', 'updated_at')
+        )
+        
+        next_cursor = None
+        if paginacao:
+            atividades, next_cursor = _cursor_page(atividades, 'updated_at', *paginacao)
+        
+        atividades = list(atividades)
+        cartoes = movie_cards(
+            (a['filme_id'] for a in atividades),
+            campos=card_fields(campos), overview_chars=overview_chars,
+            versoes={a['filme_id']: a['filme__updated_at'] for a in atividades}
+        )
+        results = [
+            select_fields({
+                **cartoes[atividade['filme_id']],
+                "user_rating": atividade['rating'],
+                "rated_at": atividade['updated_at'].isoformat() if atividade['updated_at'] else None
+            }, campos)
+            for atividade in atividades
+            if atividade['filme_id'] in cartoes
+        ]
         
-        results = []
-        for atividade in atividades:
-            try:
-                filme = atividade.filme
-                results.append({
-                    "id": filme.id,
-                    "title": filme.nome,
-                    "overview": filme.descricao,
-                    "genres": [g.nome for g in filme.generos.all()],
-                    "poster_path": filme.poster_path,
-                    "poster_url": f"https://image.tmdb.org/t/p/w500{filme.poster_path}" if filme.poster_path else None,
-                    "tmdb_rating": filme.rating_tmdb,
-                    "user_rating": atividade.rating,
-                    "release_date": filme.ano_lancamento,
-                    "rated_at": atividade.updated_at.isoformat() if atividade.updated_at else None
-                })
-            except Exception:
-                continue
+        if paginacao:
+            return Response({
+                "results": results,
+                "next_cursor": next_cursor
+            }, status=status.HTTP_200_OK)
         
         return Response({
             "total": len(results),
@@ -1159,7 +1733,38 @@ def my_rated_movies(request):
 
 
 @api_view(['GET'])
+@public_response_cache('genres', geracoes=('generos',))
 def get_genres(request):
+    """
+    Lista todos os géneros.
+    
+    GET /api/genres/
+    
+    O ETag é o MD5 dos nomes e descrições calculado pela base de dados numa
+    única query (Genero não tem updated_at); sem alterações responde 304.
+    """
+    texto = models.TextField()
+    assinatura = Genero.objects.order_by().aggregate(
+        total=Count('nome'),
+        md5=MD5(Coalesce(
+            StringAgg(
+                Concat(
+                    'nome', models.Value('\x1f'),
+                    Coalesce('descricao', models.Value(''), output_field=texto),
+                    output_field=texto,
+                ),
+                delimiter='\x1e', order_by='nome',
+            ),
+            models.Value(''),
+            output_field=texto,
+        )),
+    )
+    etag = make_etag('genres', assinatura['total'], assinatura['md5'])
+    
+    resposta = not_modified(request, etag)
+    if resposta is not None:
+        return resposta
+    
     try:
         genres = (
             Genero.objects
@@ -1176,10 +1781,10 @@ def get_genres(request):
             for g in genres
         ]
         
-        return Response({
+        return set_validators(Response({
             'total': len(genre_list),
             'genres': genre_list
-        }, status=status.HTTP_200_OK)
+        }, status=status.HTTP_200_OK), etag)
     
     except Exception as e:
         return Response(
@@ -1254,6 +1859,95 @@ class StandardResultsPagination(PageNumberPagination):
     page_query_param = 'page'
 
 
+class EstimatedCountPagination(StandardResultsPagination):
+    """
+    Paginação por página sem COUNT(*) exato em cada pedido.
+    
+    Requisito RNF-01: Performance (tabelas grandes, ex.: histórico)
+    
+    Lê page_size + 1 linhas: a linha extra indica se existe página seguinte
+    (has_next). O total depende de count_mode, escolhido por endpoint
+    (atributo da classe ou de uma subclasse):
+        - 'none': sem total (count null)
+        - 'capped': COUNT sobre no máximo count_cap + 1 linhas
+        - 'estimate': estimativa do planeador do PostgreSQL (EXPLAIN, a
+          partir das estatísticas de pg_class/pg_statistic)
+    Na última página o total é sempre exato (offset + linhas lidas), sem
+    query extra. "count_exact" indica se o total é exato.
+    """
+    count_mode = 'estimate'
+    count_cap = 1000
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size_atual = self.get_page_size(request)
+        
+        try:
+            self.numero_pagina = int(request.query_params.get(self.page_query_param, 1))
+        except (TypeError, ValueError):
+            self.numero_pagina = 0
+        if self.numero_pagina < 1:
+            raise NotFound("Página inválida.")
+        
+        offset = (self.numero_pagina - 1) * self.page_size_atual
+        linhas = list(queryset[offset:offset + self.page_size_atual + 1])
+        self.has_next = len(linhas) > self.page_size_atual
+        linhas = linhas[:self.page_size_atual]
+        
+        if not linhas and self.numero_pagina > 1:
+            raise NotFound("Página inválida.")
+        
+        if not self.has_next:
+            self.count, self.count_exact = offset + len(linhas), True
+        else:
+            # Há pelo menos mais uma linha além das já lidas
+            self.count, self.count_exact = self._count(queryset, offset + len(linhas) + 1)
+        return linhas
+    
+    def _count(self, queryset, minimo):
+        """Total (aproximado ou limitado, nunca abaixo de minimo) de acordo com count_mode."""
+        if self.count_mode == 'estimate' and connection.vendor == 'postgresql':
+            sql, params = queryset.order_by().query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+                plano = cursor.fetchone()[0]
+            if isinstance(plano, str):
+                plano = json.loads(plano)
+            return max(int(plano[0]['Plan']['Plan Rows']), minimo), False
+        
+        if self.count_mode in ('capped', 'estimate'):
+            total = queryset.order_by()[:self.count_cap + 1].count()
+            if total > self.count_cap:
+                return max(self.count_cap, minimo), False
+            return total, True
+        
+        return None, False
+    
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.numero_pagina + 1)
+    
+    def get_previous_link(self):
+        if self.numero_pagina <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.numero_pagina == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.numero_pagina - 1)
+    
+    def get_paginated_response(self, data):
+        return Response({
+            "count": self.count,
+            "count_exact": self.count_exact,
+            "has_next": self.has_next,
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+
 class MovieCatalogueView(APIView):
     """
     Endpoint para explorar o catálogo de filmes com pesquisa e filtros.
@@ -1271,6 +1965,10 @@ class MovieCatalogueView(APIView):
         - page (int, opcional): Número da página (default: 1)
         - title (str, opcional): Termo de pesquisa para título (US04)
         - genre_id (int, opcional): ID do género para filtro (US05)
+        - fields (str, opcional): Campos a devolver por filme, separados
+          por vírgulas (CAMPOS_CATALOGO)
+        - overview_chars (int, opcional): Trunca a sinopse a este número
+          de caracteres
     
     Autenticação: Não requerida (AllowAny) - RF-04
     
@@ -1316,11 +2014,20 @@ class MovieCatalogueView(APIView):
         - Filtro por género (US05)
         - Timeout de 10 segundos (RNF-01)
         - Formato de resposta paginado (DRF-style)
+        - Respostas anónimas em cache partilhada (public_response_cache)
     """
     
     permission_classes = [AllowAny]
     pagination_class = StandardResultsPagination
     
+    # Campos aceites por ?fields=
+    CAMPOS_CATALOGO = (
+        'movie_id', 'title', 'overview', 'poster_path', 'poster_url', 'backdrop_path',
+        'release_date', 'vote_average', 'vote_count', 'genre_ids', 'original_language',
+        'popularity',
+    )
+    
+    @method_decorator(public_response_cache('catalogue'))
     def get(self, request):
         """
         Método GET para obter catálogo de filmes com suporte a pesquisa e filtros.
@@ -1343,6 +2050,12 @@ class MovieCatalogueView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # Campos e truncagem da sinopse (payload reduzido)
+        try:
+            campos, overview_chars = sparse_params(request, self.CAMPOS_CATALOGO)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
         # Título para pesquisa (US04)
         title = request.query_params.get('title', '').strip()
         if title and len(title) > 512:
@@ -1487,7 +2200,7 @@ class MovieCatalogueView(APIView):
             formatted_movie = {
                 'movie_id': movie.get('id'),
                 'title': movie.get('title', ''),
-                'overview': movie.get('overview', ''),
+                'overview': truncate_overview(movie.get('overview', ''), overview_chars),
                 'poster_path': poster_path,
                 'poster_url': poster_url,
                 'backdrop_path': movie.get('backdrop_path'),
@@ -1499,7 +2212,7 @@ class MovieCatalogueView(APIView):
                 'popularity': movie.get('popularity'),
             }
             
-            formatted_results.append(formatted_movie)
+            formatted_results.append(select_fields(formatted_movie, campos))
         
         # ====================================================================
         # Construir resposta paginada (formato DRF)
@@ -1514,6 +2227,10 @@ class MovieCatalogueView(APIView):
             query_params['title'] = title
         if genre_id:
             query_params['genre_id'] = genre_id
+        if campos is not None:
+            query_params['fields'] = request.query_params['fields']
+        if overview_chars is not None:
+            query_params['overview_chars'] = overview_chars
         
         # URL da próxima página
         next_url = None
@@ -1559,10 +2276,12 @@ class HistoryWatchedViewSet(viewsets.ReadOnlyModelViewSet):
         - Apenas utilizadores autenticados podem aceder
         - Filtra automaticamente por utilizador autenticado
         - Ordenado por data de visualização (descendente)
+        - Paginação sem COUNT(*) exato (EstimatedCountPagination): total
+          estimado e has_next pela linha extra
     """
     serializer_class = HistoryItemSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = StandardResultsPagination
+    pagination_class = EstimatedCountPagination
     
     def get_queryset(self):
         """
@@ -1613,24 +2332,18 @@ def add_watch_later(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    try:
-        filme = Filme.objects.get(id=movie_id)
-    except Filme.DoesNotExist:
+    atividade = write_activity(user.id, movie_id, {'ver_mais_tarde': True})
+    if atividade is None:
         return Response(
             {"error": "Filme não encontrado"},
             status=status.HTTP_404_NOT_FOUND
         )
-    
-    atividade, created = AtividadeUsuario.objects.update_or_create(
-        usuario=user,
-        filme=filme,
-        defaults={'ver_mais_tarde': True}
-    )
+    created = atividade.criado
     
     return Response({
         "message": "Filme adicionado à lista Ver Mais Tarde" if created else "Lista Ver Mais Tarde atualizada",
-        "movie_id": filme.id,
-        "movie_title": filme.nome,
+        "movie_id": atividade.filme_id,
+        "movie_title": atividade.nome,
         "created": created
     }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
@@ -1662,30 +2375,26 @@ def remove_watch_later(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    try:
-        filme = Filme.objects.get(id=movie_id)
-    except Filme.DoesNotExist:
+    atividade = write_activity(
+        user.id, movie_id, {'ver_mais_tarde': False}, exigir='atividade'
+    )
+    if atividade is None:
         return Response(
             {"error": "Filme não encontrado"},
             status=status.HTTP_404_NOT_FOUND
         )
     
-    try:
-        atividade = AtividadeUsuario.objects.get(usuario=user, filme=filme)
-        atividade.ver_mais_tarde = False
-        atividade.save(update_fields=['ver_mais_tarde', 'updated_at'])
-        
-        return Response({
-            "message": "Filme removido da lista Ver Mais Tarde",
-            "movie_id": filme.id,
-            "movie_title": filme.nome
-        }, status=status.HTTP_200_OK)
-    
-    except AtividadeUsuario.DoesNotExist:
+    if not atividade.escrito:
         return Response(
             {"error": "Filme não está na lista Ver Mais Tarde"},
             status=status.HTTP_400_BAD_REQUEST
         )
+    
+    return Response({
+        "message": "Filme removido da lista Ver Mais Tarde",
+        "movie_id": atividade.filme_id,
+        "movie_title": atividade.nome
+    }, status=status.HTTP_200_OK)
 
 
 @api_view(['GET'])
@@ -1697,34 +2406,55 @@ def list_watch_later(request):
     Requisito RF-08: Watchlist
     
     GET /api/movies/watch_later/
+    
+    Query params (opcionais, paginação por cursor):
+        - limit: Filmes por página (1-100, default 20)
+        - cursor: Valor de "next_cursor" da página anterior
+    
+    Query params (opcionais, payload reduzido):
+        - fields: Campos a devolver, separados por vírgulas (CAMPOS_VER_MAIS_TARDE)
+        - overview_chars: Trunca a sinopse a este número de caracteres
     """
     user = request.user
     
+    try:
+        paginacao = _cursor_params(request)
+        campos, overview_chars = sparse_params(request, CAMPOS_VER_MAIS_TARDE)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
     try:
         atividades = (
             AtividadeUsuario.objects
             .filter(usuario=user, ver_mais_tarde=True)
-            .select_related('filme')
-            .prefetch_related('filme__generos')
             .order_by('-updated_at')
-        )
+            .values('id', 'filme_id', 'filme__updated_at', 'updated_at')
+        )
+        
+        next_cursor = None
+        if paginacao:
+            atividades, next_cursor = _cursor_page(atividades, 'updated_at', *paginacao)
+        
+        atividades = list(atividades)
+        cartoes = movie_cards(
+            (a['filme_id'] for a in atividades),
+            campos=card_fields(campos), overview_chars=overview_chars,
+            versoes={a['filme_id']: a['filme__updated_at'] for a in atividades}
+        )
+        results = [
+            select_fields({
+                **cartoes[atividade['filme_id']],
+                "added_at": atividade['updated_at'].isoformat() if atividade['updated_at'] else None
+            }, campos)
+            for atividade in atividades
+            if atividade['filme_id'] in cartoes
+        ]
         
-        results = []
-        for atividade in atividades:
-            try:
-                filme = atividade.filme
-                results.append({
-                    "id": filme.id,
-                    "title": filme.nome,
-                    "overview": filme.descricao,
-                    "genres": [g.nome for g in filme.generos.all()],
-                    "poster_path": filme.poster_path,
-                    "poster_url": f"https://image.tmdb.org/t/p/w500{filme.poster_path}" if filme.poster_path else None,
-                    "tmdb_rating": filme.rating_tmdb,
-                    "added_at": atividade.updated_at.isoformat() if atividade.updated_at else None
-                })
-            except Exception:
-                continue
+        if paginacao:
+            return Response({
+                "results": results,
+                "next_cursor": next_cursor
+            }, status=status.HTTP_200_OK)
         
         return Response({
             "total": len(results),
@@ -1789,30 +2519,27 @@ def add_review(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    try:
-        filme = Filme.objects.get(id=movie_id)
-    except Filme.DoesNotExist:
+    atividade = write_activity(user.id, movie_id, {'review': review_text})
+    if atividade is None:
         return Response(
             {"error": "Filme não encontrado"},
             status=status.HTTP_404_NOT_FOUND
         )
-    
-    atividade, created = AtividadeUsuario.objects.update_or_create(
-        usuario=user,
-        filme=filme,
-        defaults={'review': review_text}
-    )
+    created = atividade.criado
     
     return Response({
         "message": "Review adicionado com sucesso" if created else "Review atualizado com sucesso",
-        "movie_id": filme.id,
-        "movie_title": filme.nome,
+        "movie_id": atividade.filme_id,
+        "movie_title": atividade.nome,
         "review": review_text,
         "created": created
     }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
 
 @api_view(['GET'])
+@public_response_cache(
+    'reviews', geracoes=lambda request, movie_id: (f'filme:{movie_id}', f'reviews:{movie_id}', 'autores')
+)
 def list_reviews(request, movie_id):
     """
     Lista todos os reviews de um filme específico.
@@ -1820,44 +2547,88 @@ def list_reviews(request, movie_id):
     Requisito RF-04: Avaliações e Reviews
     
     GET /api/movies/<movie_id>/reviews/
+    
+    Query params (opcionais, paginação por cursor):
+        - limit: Reviews por página (1-100, default 20)
+        - cursor: Valor de "next_cursor" da página anterior
+    
+    Validadores (uma query): updated_at do filme, último updated_at e
+    número dos reviews e último updated_at dos autores; sem alterações
+    responde 304 Not Modified.
     """
     try:
-        filme = Filme.objects.get(id=movie_id)
-    except Filme.DoesNotExist:
+        paginacao = _cursor_params(request)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    com_review = Q(atividades_usuarios__review__isnull=False) & ~Q(atividades_usuarios__review='')
+    filme = (
+        Filme.objects
+        .filter(id=movie_id)
+        .values('id', 'nome', 'updated_at')
+        .annotate(
+            ultimo_review=Max('atividades_usuarios__updated_at', filter=com_review),
+            total_reviews=Count('atividades_usuarios', filter=com_review),
+            ultimo_autor=Max('atividades_usuarios__usuario__updated_at', filter=com_review),
+        )
+        .first()
+    )
+    if filme is None:
         return Response(
             {"error": "Filme não encontrado"},
             status=status.HTTP_404_NOT_FOUND
         )
     
+    etag = make_etag(
+        'reviews', filme['id'], filme['updated_at'], filme['ultimo_review'],
+        filme['total_reviews'], filme['ultimo_autor'], request.META.get('QUERY_STRING', '')
+    )
+    ultima = max(d for d in (filme['updated_at'], filme['ultimo_review'], filme['ultimo_autor']) if d)
+    resposta = not_modified(request, etag, ultima)
+    if resposta is not None:
+        return resposta
+    
     try:
         atividades = (
             AtividadeUsuario.objects
-            .filter(filme=filme, review__isnull=False)
+            .filter(filme_id=filme['id'], review__isnull=False)
             .exclude(review='')
-            .select_related('usuario')
             .order_by('-updated_at')
+            .values('id', 'usuario_id', 'usuario__nome', 'review', 'rating', 'created_at', 'updated_at')
         )
         
+        next_cursor = None
+        if paginacao:
+            atividades, next_cursor = _cursor_page(atividades, 'updated_at', *paginacao)
+        
         reviews = []
         for atividade in atividades:
             reviews.append({
-                "id": atividade.id,
+                "id": atividade['id'],
                 "user": {
-                    "id": atividade.usuario.id,
-                    "nome": atividade.usuario.nome
+                    "id": atividade['usuario_id'],
+                    "nome": atividade['usuario__nome']
                 },
-                "review": atividade.review,
-                "rating": atividade.rating,
-                "created_at": atividade.created_at.isoformat() if atividade.created_at else None,
-                "updated_at": atividade.updated_at.isoformat() if atividade.updated_at else None
+                "review": atividade['review'],
+                "rating": atividade['rating'],
+                "created_at": atividade['created_at'].isoformat() if atividade['created_at'] else None,
+                "updated_at": atividade['updated_at'].isoformat() if atividade['updated_at'] else None
             })
         
-        return Response({
-            "movie_id": filme.id,
-            "movie_title": filme.nome,
+        if paginacao:
+            return set_validators(Response({
+                "movie_id": filme['id'],
+                "movie_title": filme['nome'],
+                "reviews": reviews,
+                "next_cursor": next_cursor
+            }, status=status.HTTP_200_OK), etag, ultima)
+        
+        return set_validators(Response({
+            "movie_id": filme['id'],
+            "movie_title": filme['nome'],
             "total": len(reviews),
             "reviews": reviews
-        }, status=status.HTTP_200_OK)
+        }, status=status.HTTP_200_OK), etag, ultima)
     
     except Exception as e:
         return Response(
@@ -1878,39 +2649,25 @@ def delete_review(request, movie_id):
     """
     user = request.user
     
-    try:
-        filme = Filme.objects.get(id=movie_id)
-    except Filme.DoesNotExist:
+    atividade = write_activity(user.id, movie_id, {'review': None}, exigir='review')
+    if atividade is None:
         return Response(
             {"error": "Filme não encontrado"},
             status=status.HTTP_404_NOT_FOUND
         )
     
-    try:
-        atividade = AtividadeUsuario.objects.get(usuario=user, filme=filme)
-        
-        if not atividade.review:
-            return Response(
-                {"error": "Não existe review para este filme"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        old_review = atividade.review
-        atividade.review = None
-        atividade.save(update_fields=['review', 'updated_at'])
-        
-        return Response({
-            "message": "Review removido com sucesso",
-            "movie_id": filme.id,
-            "movie_title": filme.nome,
-            "removed_review": old_review
-        }, status=status.HTTP_200_OK)
-    
-    except AtividadeUsuario.DoesNotExist:
+    if not atividade.escrito:
         return Response(
             {"error": "Não existe review para este filme"},
             status=status.HTTP_400_BAD_REQUEST
         )
+    
+    return Response({
+        "message": "Review removido com sucesso",
+        "movie_id": atividade.filme_id,
+        "movie_title": atividade.nome,
+        "removed_review": atividade.review_anterior
+    }, status=status.HTTP_200_OK)
 
 
 # ============================================================================
@@ -1929,72 +2686,42 @@ def get_movie_recommendations(request):
     GET /api/movies/recommendations/
     
     Lógica:
-    - >= 3 avaliações positivas (>7.5): recomendações por género
-    - < 3 avaliações positivas: filmes populares (fallback)
+    - lista pré-calculada (RecomendacaoUsuario), recalculada após
+      RECOMMENDATION_CACHE_EVENT_THRESHOLD alterações ou ao expirar
+    - modelos offline (train_recommender / build_item_cf): fatores ALS ou
+      vizinhos item-item dos filmes do histórico
+    - perfil de gosto (afinidade por género/década, atualizado a cada
+      avaliação, favorito ou visto): candidatos pontuados pelo perfil
+    - sem atividade suficiente: filmes populares (fallback)
+    
+    Query params (opcionais, payload reduzido):
+        - fields: Campos a devolver, separados por vírgulas (CAMPOS_RECOMENDACOES)
+        - overview_chars: Trunca a sinopse a este número de caracteres
     """
     user = request.user
     
     try:
-        # Buscar avaliações positivas (rating > 7.5)
-        high_ratings = AtividadeUsuario.objects.filter(
-            usuario=user,
-            rating__gt=7.5
-        ).select_related('filme').prefetch_related('filme__generos')
-        
-        num_high_ratings = high_ratings.count()
-        
-        # Obter IDs de filmes já altamente avaliados (rating > 7.5 para exclusão)
-        # Nota: filmes com rating <= 7.5 podem aparecer nas recomendações
-        filmes_ja_avaliados_ids = high_ratings.values_list('filme_id', flat=True)
-        
-        if num_high_ratings >= 3:
-            # Extrair géneros dos filmes bem avaliados
-            generos_ids = set()
-            for atividade in high_ratings:
-                for genero in atividade.filme.generos.all():
-                    generos_ids.add(genero.nome)
-            
-            if generos_ids:
-                # Filmes com géneros similares, excluindo já altamente avaliados
-                # Ordenar por rating_tmdb e depois randomizar para variedade
-                filmes_recomendados = (
-                    Filme.objects
-                    .filter(generos__nome__in=generos_ids)
-                    .exclude(id__in=filmes_ja_avaliados_ids)
-                    .prefetch_related('generos')
-                    .distinct()
-                    .order_by('-rating_tmdb', '?')[:20]
-                )
-            else:
-                filmes_recomendados = Filme.objects.none()
-        else:
-            # Fallback: filmes populares
-            # Ordenar por rating_tmdb e depois randomizar para variedade
-            filmes_recomendados = (
-                Filme.objects
-                .exclude(id__in=filmes_ja_avaliados_ids)
-                .filter(rating_tmdb__isnull=False)
-                .prefetch_related('generos')
-                .order_by('-rating_tmdb', '?')[:20]
-            )
+        campos, overview_chars = sparse_params(request, CAMPOS_RECOMENDACOES)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        recomendacao = get_recommendations(user.id, limit=20)
+        motor = recomendacao.motor
+        num_high_ratings = recomendacao.num_avaliacoes_positivas
         
-        # Serializar resultados
-        results = []
-        for filme in filmes_recomendados:
-            results.append({
-                "id": filme.id,
-                "title": filme.nome,
-                "overview": filme.descricao,
-                "genres": [g.nome for g in filme.generos.all()],
-                "poster_path": filme.poster_path,
-                "poster_url": f"https://image.tmdb.org/t/p/w500{filme.poster_path}" if filme.poster_path else None,
-                "tmdb_rating": filme.rating_tmdb,
-                "user_rating_average": filme.get_rating_medio_usuarios()
-            })
+        # Cartões com géneros e média das avaliações em queries únicas
+        cartoes = movie_cards(
+            recomendacao.filme_ids, rating_medio=True,
+            campos=campos, overview_chars=overview_chars
+        )
+        results = [cartoes[i] for i in recomendacao.filme_ids if i in cartoes]
         
         return Response({
             "num_user_ratings": num_high_ratings,
-            "recommendation_type": "personalized" if num_high_ratings >= 3 else "popular",
+            "recommendation_type": "popular" if motor == "popular" else "personalized",
+            "engine": motor,
+            "computed_at": recomendacao.calculado_em.isoformat(),
             "total": len(results),
             "recommendations": results
         }, status=status.HTTP_200_OK)
@@ -2006,6 +2733,81 @@ def get_movie_recommendations(request):
         )
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def user_taste(request):
+    """
+    Retorna o perfil de gosto do utilizador autenticado.
+    
+    Requisito RF-10: Motor de Recomendação
+    
+    GET /api/user/taste/
+    
+    O perfil é mantido incrementalmente a cada avaliação, favorito ou visto,
+    pelo que a leitura é uma única query pela chave primária.
+    
+    Returns:
+        - genres: [{genre, affinity}] por afinidade descendente
+        - decades: [{decade, affinity}] por afinidade descendente
+        - num_interactions: número de filmes com interação relevante
+    """
+    perfil = PerfilGosto.objects.filter(usuario_id=request.user.id).first()
+    if perfil is None:
+        perfil = rebuild_profile(request.user.id)
+    
+    return Response({
+        "genres": [
+            {"genre": nome, "affinity": peso}
+            for nome, peso in sorted(perfil.generos.items(), key=lambda item: -item[1])
+        ],
+        "decades": [
+            {"decade": int(decada), "affinity": peso}
+            for decada, peso in sorted(perfil.decadas.items(), key=lambda item: -item[1])
+        ],
+        "num_interactions": perfil.num_interacoes,
+        "updated_at": perfil.atualizado_em.isoformat(),
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def user_similar_users(request):
+    """
+    Lista os utilizadores com gostos mais semelhantes ao utilizador autenticado.
+    
+    Requisito RF-10: Motor de Recomendação
+    Requisito RNF-01: Performance (índice MinHash/LSH, sem comparar todos os pares)
+    
+    GET /api/user/similar/?limit=10
+    
+    A semelhança é a estimativa de Jaccard entre os conjuntos de filmes
+    favoritos/vistos.
+    """
+    try:
+        limit = int(request.GET.get('limit', 10))
+    except (ValueError, TypeError):
+        limit = 10
+    limit = max(1, min(limit, 50))
+    
+    vizinhos = similar_users(request.user.id, limit=limit)
+    nomes = dict(
+        Usuario.objects
+        .filter(id__in=[usuario_id for usuario_id, _ in vizinhos])
+        .values_list('id', 'nome')
+    )
+    
+    results = [
+        {"id": usuario_id, "nome": nomes[usuario_id], "similarity": semelhanca}
+        for usuario_id, semelhanca in vizinhos
+        if usuario_id in nomes
+    ]
+    
+    return Response({
+        "total": len(results),
+        "results": results
+    }, status=status.HTTP_200_OK)
+
+
 # ============================================================================
 # FAVORITOS - Endpoints customizados para frontend
 # Usa AtividadeUsuario.favorito em vez de modelo Favorito
@@ -2036,7 +2838,24 @@ def list_user_favorites(request):
             }
         ]
     }
+    
+    Query params (opcionais, paginação por cursor):
+        - limit: Filmes por página (1-100, default 20)
+        - cursor: Valor de "next_cursor" da página anterior
+    
+    Com paginação a resposta tem "results" e "next_cursor" (sem "total").
+    
+    Query params (opcionais, payload reduzido):
+        - fields: Campos a devolver, separados por vírgulas (CAMPOS_FAVORITOS),
+          por exemplo fields=id,title,poster_path para grelhas
+        - overview_chars: Trunca a sinopse a este número de caracteres
     """
+    try:
+        paginacao = _cursor_params(request)
+        campos, overview_chars = sparse_params(request, CAMPOS_FAVORITOS)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
     try:
         user = request.user
         
@@ -2044,33 +2863,40 @@ def list_user_favorites(request):
         atividades = (
             AtividadeUsuario.objects
             .filter(usuario=user, favorito=True)
-            .select_related('filme')
-            .prefetch_related('filme__generos')
             .order_by('-data_adicao_favoritos')
+            .values('id', 'filme_id', 'filme__updated_at', 'data_adicao_favoritos', 'updated_at')
         )
         
+        next_cursor = None
+        if paginacao:
+            atividades, next_cursor = _cursor_page(
+                atividades.filter(data_adicao_favoritos__isnull=False), 'data_adicao_favoritos', *paginacao
+            )
+        
+        atividades = list(atividades)
+        cartoes = movie_cards(
+            (a['filme_id'] for a in atividades),
+            campos=card_fields(campos, ALIASES_FAVORITOS), overview_chars=overview_chars,
+            versoes={a['filme_id']: a['filme__updated_at'] for a in atividades}
+        )
         results = []
         for atividade in atividades:
-            try:
-                filme = atividade.filme
-                results.append({
-                    "id": filme.id,
-                    "movie_id": filme.id,
-                    "title": filme.nome,
-                    "overview": filme.descricao,
-                    "poster_path": filme.poster_path,
-                    "poster_url": f"https://image.tmdb.org/t/p/w500{filme.poster_path}" if filme.poster_path else None,
-                    "backdrop_path": filme.poster_path,  # Fallback
-                    "tmdb_rating": filme.rating_tmdb,
-                    "genres": [g.nome for g in filme.generos.all()],
-                    "genre_ids": list(filme.generos.all().values_list('nome', flat=True)),
-                    "release_date": filme.ano_lancamento,
-                    "vote_average": filme.rating_tmdb,
-                    "added_at": atividade.data_adicao_favoritos.isoformat() if atividade.data_adicao_favoritos else atividade.updated_at.isoformat()
-                })
-            except Exception as e:
-                print(f"Erro ao processar filme {atividade.filme_id}: {e}")
+            cartao = cartoes.get(atividade['filme_id'])
+            if cartao is None:
                 continue
+            adicionado = atividade['data_adicao_favoritos'] or atividade['updated_at']
+            item = {
+                **cartao,
+                **{alias: cartao.get(campo) for alias, campo in ALIASES_FAVORITOS.items()},
+                "added_at": adicionado.isoformat()
+            }
+            results.append(select_fields(item, campos))
+        
+        if paginacao:
+            return Response({
+                "results": results,
+                "next_cursor": next_cursor
+            }, status=status.HTTP_200_OK)
         
         return Response({
             "total": len(results),
@@ -2129,34 +2955,18 @@ def add_to_favorites(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Obter ou criar o filme
-        try:
-            filme = Filme.objects.get(id=movie_id)
-        except Filme.DoesNotExist:
+        # Criar a atividade ou marcar como favorito (a data de adição só é
+        # definida quando o filme ainda não era favorito)
+        atividade = write_activity(user.id, movie_id, {'favorito': True})
+        if atividade is None:
             return Response(
                 {"error": "Filme não encontrado"},
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Obter ou criar a atividade do utilizador
-        atividade, created = AtividadeUsuario.objects.get_or_create(
-            usuario=user,
-            filme=filme,
-            defaults={
-                'favorito': True,
-                'data_adicao_favoritos': timezone.now() if True else None
-            }
-        )
-        
-        # Se já existe, apenas marcar como favorito
-        if not created and not atividade.favorito:
-            atividade.favorito = True
-            atividade.data_adicao_favoritos = timezone.now()
-            atividade.save(update_fields=['favorito', 'data_adicao_favoritos', 'updated_at'])
-        
         return Response({
             "message": "Filme adicionado aos favoritos com sucesso",
-            "movie_id": filme.id,
+            "movie_id": atividade.filme_id,
             "added_at": atividade.data_adicao_favoritos.isoformat() if atividade.data_adicao_favoritos else None
         }, status=status.HTTP_201_CREATED)
     
@@ -2213,38 +3023,23 @@ def remove_from_favorites(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Obter o filme
-        try:
-            filme = Filme.objects.get(id=movie_id)
-        except Filme.DoesNotExist:
+        # Remover dos favoritos (só se for favorito; a data de adição é limpa)
+        atividade = write_activity(user.id, movie_id, {'favorito': False}, exigir='favorito')
+        if atividade is None:
             return Response(
                 {"error": "Filme não encontrado"},
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Obter a atividade do utilizador
-        try:
-            atividade = AtividadeUsuario.objects.get(usuario=user, filme=filme)
-        except AtividadeUsuario.DoesNotExist:
-            return Response(
-                {"error": "Filme não está nos favoritos"},
-                status=status.HTTP_404_NOT_FOUND
-            )
-        
-        # Remover do favoritos
-        if not atividade.favorito:
+        if not atividade.escrito:
             return Response(
                 {"error": "Filme não está nos favoritos"},
-                status=status.HTTP_400_BAD_REQUEST
+                status=status.HTTP_404_NOT_FOUND if atividade.antes is None else status.HTTP_400_BAD_REQUEST
             )
         
-        atividade.favorito = False
-        atividade.data_adicao_favoritos = None
-        atividade.save(update_fields=['favorito', 'data_adicao_favoritos', 'updated_at'])
-        
         return Response({
             "message": "Filme removido dos favoritos com sucesso",
-            "movie_id": filme.id
+            "movie_id": atividade.filme_id
         }, status=status.HTTP_200_OK)
     
     except Exception as e:
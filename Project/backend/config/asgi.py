@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
\ No newline at end of file
+application = get_asgi_application()
+
+# Um listener do barramento de invalidação por worker (api.invalidation)
+from api.invalidation import start_listener  # noqa: E402
+
+start_listener()
@@ -155,6 +155,14 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(minutes=15),
 }
 
+# Cache do utilizador autenticado por token (api.authentication): TTL
+# (segundos; 0 desativa) e número máximo de entradas por processo.
+# AUTH_STATELESS=1 constrói o utilizador a partir dos claims do token,
+# sem queries (alterações ao perfil só aparecem em tokens novos).
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', 30))
+AUTH_USER_CACHE_MAX_ENTRIES = int(os.getenv('AUTH_USER_CACHE_MAX_ENTRIES', 10000))
+AUTH_STATELESS = os.getenv('AUTH_STATELESS', '0') == '1'
+
 # Django REST Framework - Configuração básica
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
@@ -172,6 +180,105 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+
+# Motor de recomendações (RF-10) - artefactos treinados offline
+RECOMMENDER_ARTIFACTS_DIR = Path(os.getenv('RECOMMENDER_ARTIFACTS_DIR', BASE_DIR / 'recommender_artifacts'))
+RECOMMENDER_ITEM_CF_NEIGHBOURS = int(os.getenv('RECOMMENDER_ITEM_CF_NEIGHBOURS', 50))
+RECOMMENDER_CONTENT_NEIGHBOURS = int(os.getenv('RECOMMENDER_CONTENT_NEIGHBOURS', 20))
+# Ordem pela qual os motores offline são tentados ('als', 'item_cf')
+RECOMMENDER_ENGINES = os.getenv('RECOMMENDER_ENGINES', 'als,item_cf').split(',')
+
+# Instantâneo do catálogo em memória e pools de candidatos por género
+RECOMMENDER_CATALOGUE_TTL = int(os.getenv('RECOMMENDER_CATALOGUE_TTL', 300))
+RECOMMENDER_POOL_SIZE = int(os.getenv('RECOMMENDER_POOL_SIZE', 500))
+
+# Cache de recomendações por utilizador: recalcular após N alterações de
+# atividade ou quando a lista tiver mais de MAX_AGE segundos
+RECOMMENDATION_CACHE_EVENT_THRESHOLD = int(os.getenv('RECOMMENDATION_CACHE_EVENT_THRESHOLD', 3))
+RECOMMENDATION_CACHE_MAX_AGE = int(os.getenv('RECOMMENDATION_CACHE_MAX_AGE', 6 * 60 * 60))
+
+# Cache em dois níveis (api.tiered_cache): LRU por processo (L1) com
+# número máximo de entradas e TTL, tabela UNLOGGED partilhada (L2) limpa
+# de entradas expiradas no máximo a cada CULL_INTERVAL segundos, e
+# intervalo entre registos das métricas no logger "api.cache"
+TIERED_CACHE_L1_MAX_ENTRIES = int(os.getenv('TIERED_CACHE_L1_MAX_ENTRIES', 5000))
+TIERED_CACHE_L1_TTL = int(os.getenv('TIERED_CACHE_L1_TTL', 60))
+TIERED_CACHE_CULL_INTERVAL = int(os.getenv('TIERED_CACHE_CULL_INTERVAL', 300))
+TIERED_CACHE_STATS_INTERVAL = int(os.getenv('TIERED_CACHE_STATS_INTERVAL', 300))
+
+# Espera máxima (segundos) por um preenchimento em curso noutro pedido
+# antes de desistir (get_or_set levanta FillUnavailable)
+TIERED_CACHE_FILL_WAIT = float(os.getenv('TIERED_CACHE_FILL_WAIT', 2))
+
+# Respostas da TMDB em cache (segundos)
+TMDB_CACHE_TTL = int(os.getenv('TMDB_CACHE_TTL', 10 * 60))
+
+# Falhas da TMDB (timeout, ligação, HTTP 429/5xx) em cache (segundos)
+TMDB_FAILURE_CACHE_TTL = int(os.getenv('TMDB_FAILURE_CACHE_TTL', 30))
+
+# Cache de fragmentos dos cartões de filme (segundos; 0 desativa)
+MOVIE_CARD_CACHE_TTL = int(os.getenv('MOVIE_CARD_CACHE_TTL', 24 * 60 * 60))
+
+# Cache partilhada das respostas públicas (pedidos anónimos): tabela da
+# base de dados (cache_respostas, criada pela migração 0017) ou, com
+# RESPONSE_CACHE_BACKEND=file, ficheiros em RESPONSE_CACHE_DIR.
+# TTL no servidor e max-age enviado ao nginx/browser (segundos).
+RESPONSE_CACHE_ALIAS = 'respostas'
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 300))
+RESPONSE_CACHE_MAX_AGE = int(os.getenv('RESPONSE_CACHE_MAX_AGE', 60))
+
+if os.getenv('RESPONSE_CACHE_BACKEND', 'db') == 'file':
+    _RESPONSE_CACHE = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('RESPONSE_CACHE_DIR', str(BASE_DIR / 'cache' / 'respostas')),
+    }
+else:
+    _RESPONSE_CACHE = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cache_respostas',
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    RESPONSE_CACHE_ALIAS: {
+        **_RESPONSE_CACHE,
+        'TIMEOUT': RESPONSE_CACHE_TTL,
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 10000))},
+    },
+}
+
+# Barramento de invalidação entre workers (api.invalidation): listener
+# LISTEN/NOTIFY por worker (INVALIDATION_LISTENER=0 desativa), janela de
+# agrupamento das mensagens recebidas (segundos), intervalo da verificação
+# da ligação, espera máxima entre tentativas de religação (segundos) e
+# número de chaves a partir do qual se publica "invalida tudo"
+INVALIDATION_LISTENER = os.getenv('INVALIDATION_LISTENER', '1') == '1'
+INVALIDATION_BATCH_WINDOW = float(os.getenv('INVALIDATION_BATCH_WINDOW', 0.05))
+INVALIDATION_HEALTHCHECK_INTERVAL = int(os.getenv('INVALIDATION_HEALTHCHECK_INTERVAL', 30))
+INVALIDATION_RECONNECT_MAX_DELAY = int(os.getenv('INVALIDATION_RECONNECT_MAX_DELAY', 30))
+INVALIDATION_MAX_KEYS = int(os.getenv('INVALIDATION_MAX_KEYS', 500))
+
+# Tendências locais (RF-11): meia-vida do decaimento por período (horas),
+# tamanho do top-K em memória e intervalo de atualização (segundos)
+TRENDING_HALF_LIFE_HOURS = {
+    'day': float(os.getenv('TRENDING_DAY_HALF_LIFE_HOURS', 6)),
+    'week': float(os.getenv('TRENDING_WEEK_HALF_LIFE_HOURS', 48)),
+}
+TRENDING_TOP_K = int(os.getenv('TRENDING_TOP_K', 200))
+TRENDING_REFRESH_SECONDS = int(os.getenv('TRENDING_REFRESH_SECONDS', 60))
+
+# Grafo de coocorrência ("também gostaram de"): máximo de filmes do
+# utilizador emparelhados por evento e tamanho do top guardado por filme
+COWATCH_MAX_FAN_OUT = int(os.getenv('COWATCH_MAX_FAN_OUT', 200))
+COWATCH_TOP_N = int(os.getenv('COWATCH_TOP_N', 20))
+
+# Índice MinHash/LSH de utilizadores semelhantes: número de permutações e
+# de bandas (limiar de semelhança ≈ (1/bandas)^(bandas/permutações))
+MINHASH_PERMUTACOES = int(os.getenv('MINHASH_PERMUTACOES', 128))
+MINHASH_BANDAS = int(os.getenv('MINHASH_BANDAS', 32))
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Filmes API',
     'DESCRIPTION': 'Documentação da API do projeto ADS',
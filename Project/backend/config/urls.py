@@ -49,7 +49,11 @@ urlpatterns = [
     path('api/movies/search/', search_movies, name='search_movies'),
     path('api/movies/search/tmdb/', search_movies_tmdb, name='search_movies_tmdb'),
     path('api/movies/<int:movie_id>/', movie_details),
+    path('api/movies/<int:movie_id>/similar/', similar_movies, name='similar_movies'),
+    path('api/movies/<int:movie_id>/also-liked/', also_liked_movies, name='also_liked_movies'),
     path("api/movies/trending/", trending_movies, name="trending_movies"),
+    path("api/movies/state/", movies_state, name="movies_state"),
+    path("api/movies/batch/", batch_activity, name="batch_activity"),
     path("api/movies/rate/", rate_movie, name="rate_movie"),
     path("api/movies/update_rating/", update_rating, name="update_rating"),
     path("api/movies/delete_rating/", delete_rating, name="delete_rating"),
@@ -90,6 +94,9 @@ urlpatterns = [
     # Legacy routes for backwards compatibility
     path('api/user/info/', UserInfo, name='user_info'),
     path('api/user/update/', UpdateProfile, name='update_profile'),
+    path('api/user/taste/', user_taste, name='user_taste'),
+    path('api/user/similar/', user_similar_users, name='user_similar_users'),
+    path('api/user/library/', user_library, name='user_library'),
 ]
 
 if settings.DEBUG: